@@ -1,6 +1,12 @@
 import streamlit as st
 import sys
 import os
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Optional
+import altair as alt
+import pandas as pd
 
 # Proje kök dizinini path'e ekle
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,18 +20,57 @@ from config.findings_taxonomy import (
     ILA_FINDINGS,
     SEVERITY_OPTIONS,
     ALL_FINDING_GROUPS,
+    FINDING_KEYS,
+    ILA_FINDING_KEYS,
 )
 from config.turkish_templates import (
     PAGE_TITLES,
     PATIENT_FORM,
     FINDINGS_UI,
     ILA_UI,
+    BULK_UI,
+    DASHBOARD_UI,
     UI_TEXTS,
 )
-from config.pattern_definitions import PATTERN_CATEGORIES
+from config.pattern_definitions import PATTERN_CATEGORIES, RULESET_VERSION
 from modules.decision_engine import ILDDecisionEngine
 from modules.ila_classifier import ILAClassifier
 from modules.report_generator import ReportGenerator
+from modules.report_model import build_report_model
+from modules.report_export import render_fhir, render_hl7
+from modules.report_diff import with_comparison
+from modules.decision_engine import CONFIDENCE_LEVELS
+from modules.ila_classifier import ILA_RISK_LEVELS
+from modules.batch_engine import (
+    BatchDecisionEngine,
+    CONTEXT_DEFAULTS,
+    encode_case_frame,
+    finding_masks,
+)
+from modules.case_archive import CaseArchive, AGE_BANDS, StudyRecord, study_delta
+from modules.case_index import CaseIndex
+from modules.sensitivity import (
+    FindingPriors,
+    default_batch_engine,
+    finding_priors,
+    finding_sensitivity,
+    next_best_findings,
+    reader_uncertainty,
+)
+from modules.state_codec import (
+    decode_findings,
+    decode_ila_findings,
+    finding_bit,
+    ila_finding_bit,
+    encode_diagnostic_result,
+    decode_diagnostic_result,
+    encode_ila_result,
+    decode_ila_result,
+    compress_text,
+    decompress_text,
+    encode_case_token,
+    decode_case_token,
+)
 
 
 # =============================================
@@ -63,19 +108,40 @@ def init_session_state():
         "ctd": "Yok",
         "presentation": "Kronik (>3 ay)",
         "indication": "ILD değerlendirme",
-        # BT Bulguları
-        "selected_findings": [],
+        "study_date": date.today(),
+        # Önceki tetkik (hasta no + tarih ile önbelleğe alınır)
+        "prior_study_key": None,
+        "prior_study": None,
+        # BT Bulguları (bit maskesi, bkz. FINDING_KEYS)
+        "finding_mask": 0,
         "extent": "< %5",
         "progression": "İlk tetkik",
         # ILA
         "ila_present": False,
         "ila_subpleural": False,
         "ila_extent": 5,
-        "ila_findings": [],
-        # Sonuçlar
-        "diagnostic_result": None,
-        "ila_result": None,
-        "report_text": "",
+        "ila_finding_mask": 0,
+        # Sonuçlar (kompakt kayıtlar, bkz. modules/state_codec.py)
+        "diagnostic_record": None,
+        "ila_record": None,
+        "report_blob": b"",
+        "report_fhir_blob": b"",
+        "report_hl7_blob": b"",
+        # Girdi parmak izleri (yalnızca değişiklikte yeniden hesaplama)
+        "analysis_fingerprint": "",
+        "ila_fingerprint": "",
+        "report_fingerprint": "",
+        # URL'den en son geri yüklenen vaka belirteci
+        "restored_case_token": "",
+        # Toplu analiz
+        "bulk_file_id": "",
+        "bulk_results": None,
+        # Arşive en son kaydedilen rapor / toplu dosya
+        "archived_fingerprint": "",
+        "archived_analysis_id": None,
+        "bulk_archived_file_id": "",
+        # MDD / patoloji sonrası kesin tanı (arşive ve benzer vaka indeksine yazılır)
+        "final_diagnosis": "",
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -85,6 +151,152 @@ def init_session_state():
 init_session_state()
 
 
+@st.cache_resource
+def _get_report_generator() -> ReportGenerator:
+    """Bölüm önbelleği oturumlar arasında paylaşılan rapor üretici."""
+    return ReportGenerator()
+
+
+@st.cache_resource
+def _get_archive() -> CaseArchive:
+    """Süreç genelinde paylaşılan vaka arşivi."""
+    return CaseArchive()
+
+
+@st.cache_resource
+def _get_case_index() -> CaseIndex:
+    """Arşivden yüklenen benzer vaka indeksi (aramadan önce artımlı yenilenir)."""
+    return CaseIndex.from_archive(_get_archive())
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _get_finding_priors() -> FindingPriors:
+    """Arşivden bulgu olasılıkları (10 dakikada bir yenilenir)."""
+    return finding_priors(_get_archive().finding_counts(), default_batch_engine().ruleset.pattern_keys)
+
+
+_FINDING_LABELS = {
+    key: info["label"]
+    for group in ALL_FINDING_GROUPS.values()
+    for key, info in group.items()
+}
+
+
+def _load_prior_study() -> Optional[StudyRecord]:
+    """Hastanın güncel tetkik tarihinden önceki son tetkiki (oturumda önbellekli)."""
+    patient_id = st.session_state.patient_name.strip()
+    if not patient_id:
+        return None
+    key = (patient_id, str(st.session_state.study_date))
+    if key != st.session_state.prior_study_key:
+        st.session_state.prior_study = _get_archive().prior_study(
+            patient_id, before=st.session_state.study_date,
+        )
+        st.session_state.prior_study_key = key
+    return st.session_state.prior_study
+
+
+def _prior_report_model(prior: Optional[StudyRecord], patient_info: dict, clinical_context: dict):
+    """
+    Önceki tetkikin rapor modeli (karşılaştırma için). Arşiv klinik
+    bağlamı saklamadığından güncel bağlam kullanılır.
+    """
+    if prior is None:
+        return None
+    return build_report_model(
+        patient_info,
+        clinical_context,
+        prior.findings,
+        prior.diagnostic_result,
+        prior.ila_result,
+        report_time=datetime.fromisoformat(prior.study_date),
+    )
+
+
+def render_prior_study():
+    """Önceki tetkik özeti ve (bulgu girildiyse) güncel tetkikle farkı."""
+    prior = _load_prior_study()
+    if prior is None:
+        return
+
+    st.markdown("---")
+    st.subheader("🕑 Önceki Tetkik")
+    if prior.primary_pattern:
+        pattern = PATTERN_CATEGORIES.get(prior.primary_pattern, {}).get("name", prior.primary_pattern)
+        summary = f"{pattern.split('(')[0].strip()} — %{prior.primary_score:.0f}"
+    else:
+        summary = "Primer patern yok"
+    st.info(
+        f"**Tarih:** {prior.study_date}  \n"
+        f"**Primer patern:** {summary}  \n"
+        f"**Bulgu sayısı:** {prior.finding_mask.bit_count()}"
+    )
+
+    finding_mask = st.session_state.finding_mask
+    if not finding_mask:
+        return
+    # Sayfa 4'teki kayıt önceki bulgu setine ait olabilir; güncel maske analiz edilir
+    delta = study_delta(
+        prior,
+        finding_mask,
+        decode_diagnostic_result(
+            _analyze_cached(tuple(sorted(_clinical_context().items())), finding_mask)
+        ),
+    )
+    col_d1, col_d2, col_d3 = st.columns(3)
+    with col_d1:
+        st.metric("Yeni bulgu", len(delta.new_findings))
+    with col_d2:
+        st.metric("Kaybolan bulgu", len(delta.resolved_findings))
+    with col_d3:
+        st.metric(
+            "Primer skor farkı",
+            f"{delta.score_delta:+.0f}",
+            delta="Patern değişti" if delta.primary_changed else None,
+            delta_color="off",
+        )
+    if delta.new_findings:
+        st.markdown("**Yeni:** " + ", ".join(_FINDING_LABELS[k] for k in delta.new_findings))
+    if delta.resolved_findings:
+        st.markdown("**Kaybolan:** " + ", ".join(_FINDING_LABELS[k] for k in delta.resolved_findings))
+    if delta.suggested_progression != st.session_state.progression:
+        st.caption(f"Bulgu farkına göre önerilen değişim durumu: *{delta.suggested_progression}*")
+
+
+# =============================================
+# PAYLAŞILAN VAKA BAĞLANTISI
+# =============================================
+def restore_case_from_url():
+    """URL'deki ?case= belirtecinden vaka girdilerini geri yükle ve rapora geç."""
+    token = st.query_params.get("case")
+    if not token or token == st.session_state.restored_case_token:
+        return
+    st.session_state.restored_case_token = token
+    try:
+        values = decode_case_token(token)
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+
+    ruleset_version = values.pop("ruleset_version")
+    if ruleset_version != RULESET_VERSION:
+        st.warning(
+            f"Bu vaka kural seti v{ruleset_version} ile kaydedilmiştir; "
+            f"güncel kural seti (v{RULESET_VERSION}) ile yeniden değerlendirilmiştir."
+        )
+    for key, value in values.items():
+        st.session_state[key] = value
+    # Eski checkbox durumları maskeyi ezmesin
+    for key in FINDING_KEYS:
+        st.session_state.pop(f"finding_{key}", None)
+    for key in ILA_FINDING_KEYS:
+        st.session_state.pop(f"ila_{key}", None)
+    st.session_state.current_page = 4
+
+
+restore_case_from_url()
+
+
 # =============================================
 # SIDEBAR — NAVİGASYON
 # =============================================
@@ -98,6 +310,8 @@ with st.sidebar:
         2: "🔍 BT Bulguları",
         3: "🏥 ILA Tarama",
         4: "📄 Rapor & Karar Desteği",
+        5: "📦 Toplu Analiz",
+        6: "📊 Kohort Analizi",
     }
 
     for page_num, page_name in pages.items():
@@ -118,6 +332,7 @@ with st.sidebar:
 
     # Yeni rapor butonu
     if st.button("🔄 Yeni Rapor Başlat", use_container_width=True):
+        st.query_params.clear()
         for key in list(st.session_state.keys()):
             if key != "current_page":
                 del st.session_state[key]
@@ -142,6 +357,11 @@ def page_patient_info():
             PATIENT_FORM["name"],
             value=st.session_state.patient_name,
         )
+        st.session_state.study_date = st.date_input(
+            "Tetkik tarihi",
+            value=st.session_state.study_date,
+            format="DD.MM.YYYY",
+        )
         st.session_state.patient_age = st.number_input(
             PATIENT_FORM["age"],
             min_value=0, max_value=120,
@@ -201,6 +421,9 @@ def page_patient_info():
             if st.session_state.indication in PATIENT_FORM["indication_options"] else 0,
         )
 
+    # Önceki tetkik hasta numarası girilir girilmez getirilir
+    render_prior_study()
+
     # İleri butonu
     st.markdown("---")
     if st.button(UI_TEXTS["next_button"], type="primary", use_container_width=True):
@@ -222,18 +445,16 @@ def page_ct_findings():
         cols = st.columns(2)
         for i, (key, info) in enumerate(findings_dict.items()):
             with cols[i % 2]:
-                checked = key in st.session_state.selected_findings
+                bit = finding_bit(key)
                 if st.checkbox(
                     info["label"],
-                    value=checked,
+                    value=bool(st.session_state.finding_mask & bit),
                     key=f"finding_{key}",
                     help=info["description"],
                 ):
-                    if key not in st.session_state.selected_findings:
-                        st.session_state.selected_findings.append(key)
+                    st.session_state.finding_mask |= bit
                 else:
-                    if key in st.session_state.selected_findings:
-                        st.session_state.selected_findings.remove(key)
+                    st.session_state.finding_mask &= ~bit
 
     # Yaygınlık ve değişim
     st.markdown("---")
@@ -253,9 +474,10 @@ def page_ct_findings():
         )
 
     # Seçilen bulgular özeti
-    if st.session_state.selected_findings:
+    if st.session_state.finding_mask:
         st.markdown("---")
-        st.info(f"**Seçilen bulgu sayısı:** {len(st.session_state.selected_findings)}")
+        st.info(f"**Seçilen bulgu sayısı:** {st.session_state.finding_mask.bit_count()}")
+        render_next_best_findings()
 
     # Navigasyon
     st.markdown("---")
@@ -270,6 +492,29 @@ def page_ct_findings():
             st.rerun()
 
 
+def render_next_best_findings():
+    """İlk iki patern yakınsa, onları en iyi ayıracak değerlendirilmemiş bulgular."""
+    clinical_context = _clinical_context()
+    result = decode_diagnostic_result(
+        _analyze_cached(tuple(sorted(clinical_context.items())), st.session_state.finding_mask)
+    )
+    if result.mdd_reason_code != "close_scores":
+        return
+    suggestions = next_best_findings(
+        st.session_state.finding_mask, clinical_context, _get_finding_priors(),
+    )
+    if not suggestions:
+        return
+    first, second = (p.pattern_name.split("(")[0].strip() for p in result.ranked_patterns[:2])
+    st.markdown(f"**💡 {first} / {second} ayrımı için değerlendirilmesi önerilen bulgular:**")
+    for suggestion in suggestions:
+        outcome = suggestion.outcome
+        st.markdown(
+            f"- {suggestion.label} — varsa: {_short_pattern_name(outcome.primary_pattern)} "
+            f"%{outcome.primary_score:.0f} (beklenen kazanç {suggestion.expected_gain:.2f} bit)"
+        )
+
+
 # =============================================
 # SAYFA 3: ILA TARAMA
 # =============================================
@@ -302,27 +547,25 @@ def page_ila_screening():
         with col2:
             st.subheader(ILA_UI["ila_findings"])
             for key, info in ILA_FINDINGS.items():
-                checked = key in st.session_state.ila_findings
+                bit = ila_finding_bit(key)
                 if st.checkbox(
                     info["label"],
-                    value=checked,
+                    value=bool(st.session_state.ila_finding_mask & bit),
                     key=f"ila_{key}",
                     help=info["description"],
                 ):
-                    if key not in st.session_state.ila_findings:
-                        st.session_state.ila_findings.append(key)
+                    st.session_state.ila_finding_mask |= bit
                 else:
-                    if key in st.session_state.ila_findings:
-                        st.session_state.ila_findings.remove(key)
+                    st.session_state.ila_finding_mask &= ~bit
 
         # Anlık ILA sınıflandırma önizlemesi
-        if st.session_state.ila_findings:
+        if st.session_state.ila_finding_mask:
             classifier = ILAClassifier()
             preview = classifier.classify(
                 ila_present=True,
                 is_subpleural=st.session_state.ila_subpleural,
                 extent_percent=st.session_state.ila_extent,
-                selected_ila_findings=st.session_state.ila_findings,
+                selected_ila_findings=decode_ila_findings(st.session_state.ila_finding_mask),
             )
             st.markdown("---")
             risk_color = {"Düşük": "🟢", "Orta": "🟡", "Yüksek": "🔴"}.get(preview.risk_level, "⚪")
@@ -352,10 +595,14 @@ def page_ila_screening():
 # =============================================
 # ANALİZ ÇALIŞTIR
 # =============================================
-def _run_analysis():
-    """Karar destek motorunu ve rapor üreticiyi çalıştır."""
-    # Klinik bağlam
-    clinical_context = {
+def _fingerprint(*parts) -> str:
+    """Girdi değerlerinden kararlı bir parmak izi üret."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _clinical_context() -> dict:
+    """Session state'ten klinik bağlam dict'ini oluştur."""
+    return {
         "age": st.session_state.patient_age,
         "sex": st.session_state.patient_sex,
         "smoking": st.session_state.smoking,
@@ -366,26 +613,66 @@ def _run_analysis():
         "indication": st.session_state.indication,
     }
 
-    # Karar destek motoru
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def _analyze_cached(context_items: tuple, finding_mask: int) -> bytes:
+    """
+    Patern analizini çalıştır ve kompakt kaydını döndür.
+
+    Oturumlar arası paylaşılır: aynı vaka bağlantısını açan
+    kullanıcılar analizi önbellekten alır.
+    """
     engine = ILDDecisionEngine()
-    diagnostic_result = engine.analyze(
-        selected_findings=st.session_state.selected_findings,
-        clinical_context=clinical_context,
+    result = engine.analyze(
+        selected_findings=decode_findings(finding_mask),
+        clinical_context=dict(context_items),
     )
-    st.session_state.diagnostic_result = diagnostic_result
+    return encode_diagnostic_result(result)
+
+
+def _run_analysis():
+    """
+    Karar destek motorunu ve rapor üreticiyi çalıştır.
+
+    Her bölüm kendi girdilerinin parmak izi değiştiğinde yeniden hesaplanır:
+      - Patern analizi: klinik bağlam + seçilen BT bulguları
+      - ILA sınıflandırma: ILA girdileri
+      - Rapor metni: hasta bilgileri + iki analizin parmak izleri + önceki tetkik
+    """
+    clinical_context = _clinical_context()
+    selected_findings = decode_findings(st.session_state.finding_mask)
+    ila_result = None
+
+    # Karar destek motoru
+    context_items = tuple(sorted(clinical_context.items()))
+    analysis_fp = _fingerprint(context_items, st.session_state.finding_mask)
+    if analysis_fp != st.session_state.analysis_fingerprint:
+        st.session_state.diagnostic_record = _analyze_cached(
+            context_items, st.session_state.finding_mask,
+        )
+        st.session_state.analysis_fingerprint = analysis_fp
 
     # ILA sınıflandırma
     if st.session_state.ila_present:
-        classifier = ILAClassifier()
-        ila_result = classifier.classify(
-            ila_present=True,
-            is_subpleural=st.session_state.ila_subpleural,
-            extent_percent=st.session_state.ila_extent,
-            selected_ila_findings=st.session_state.ila_findings,
+        ila_fp = _fingerprint(
+            True,
+            st.session_state.ila_subpleural,
+            st.session_state.ila_extent,
+            st.session_state.ila_finding_mask,
         )
-        st.session_state.ila_result = ila_result
     else:
-        st.session_state.ila_result = None
+        ila_fp = _fingerprint(False)
+    if ila_fp != st.session_state.ila_fingerprint:
+        if st.session_state.ila_present:
+            classifier = ILAClassifier()
+            ila_result = classifier.classify(
+                ila_present=True,
+                is_subpleural=st.session_state.ila_subpleural,
+                extent_percent=st.session_state.ila_extent,
+                selected_ila_findings=decode_ila_findings(st.session_state.ila_finding_mask),
+            )
+        st.session_state.ila_record = encode_ila_result(ila_result)
+        st.session_state.ila_fingerprint = ila_fp
 
     # Rapor oluştur
     patient_info = {
@@ -393,15 +680,31 @@ def _run_analysis():
         "age": st.session_state.patient_age,
         "sex": st.session_state.patient_sex,
     }
-    generator = ReportGenerator()
-    report_text = generator.generate_full_report(
-        patient_info=patient_info,
-        clinical_context=clinical_context,
-        selected_findings=st.session_state.selected_findings,
-        diagnostic_result=diagnostic_result,
-        ila_result=st.session_state.ila_result,
+    prior = _load_prior_study()
+    report_fp = _fingerprint(
+        sorted(patient_info.items()), analysis_fp, ila_fp, prior.id if prior else None,
     )
-    st.session_state.report_text = report_text
+    if report_fp != st.session_state.report_fingerprint:
+        diagnostic_result = decode_diagnostic_result(st.session_state.diagnostic_record)
+        if ila_result is None:
+            ila_result = decode_ila_result(st.session_state.ila_record)
+        # Model bir kez oluşturulur; metin, FHIR ve HL7 aynı modelden
+        model = build_report_model(
+            patient_info=patient_info,
+            clinical_context=clinical_context,
+            selected_findings=selected_findings,
+            diagnostic_result=diagnostic_result,
+            ila_result=ila_result,
+        )
+        # Takip tetkikinde önceki raporla bölüm bölüm karşılaştırma
+        model = with_comparison(model, _prior_report_model(prior, patient_info, clinical_context))
+        report_text = _get_report_generator().render(model)
+        st.session_state.report_blob = compress_text(report_text)
+        st.session_state.report_fhir_blob = compress_text(
+            json.dumps(render_fhir(model, report_text), ensure_ascii=False, indent=2)
+        )
+        st.session_state.report_hl7_blob = compress_text(render_hl7(model, report_text, report_fp[:20]))
+        st.session_state.report_fingerprint = report_fp
 
 
 # =============================================
@@ -410,11 +713,11 @@ def _run_analysis():
 def page_report():
     st.title("📄 " + PAGE_TITLES["page4"])
 
-    # Eğer analiz henüz yapılmadıysa çalıştır
-    if st.session_state.diagnostic_result is None:
-        _run_analysis()
+    # Girdiler değiştiyse ilgili bölümleri yeniden hesapla
+    _run_analysis()
 
-    result = st.session_state.diagnostic_result
+    # Zengin nesneler yalnızca ekrana basılırken yeniden oluşturulur
+    result = decode_diagnostic_result(st.session_state.diagnostic_record)
 
     if not result or not result.primary_pattern:
         st.warning(UI_TEXTS["no_findings"])
@@ -449,6 +752,7 @@ def page_report():
             unsafe_allow_html=True,
         )
         st.markdown(f"*{conf_level['description']}*")
+        render_reader_uncertainty(primary.pattern_key)
 
     # ---- AYIRICI TANI SIRALAMASI ----
     st.markdown("---")
@@ -483,8 +787,11 @@ def page_report():
     else:
         st.success(f"**MDD rutin olarak gerekmemektedir** — {result.mdd_reason}")
 
+    # ---- KRİTİK BULGULAR ----
+    render_critical_findings()
+
     # ---- ILA SONUÇLARI ----
-    ila = st.session_state.ila_result
+    ila = decode_ila_result(st.session_state.ila_record)
     if ila and ila.ila_present:
         st.markdown("---")
         st.subheader("🔬 ILA Değerlendirmesi")
@@ -498,21 +805,84 @@ def page_report():
             st.metric("Tutulum", f"%{ila.extent_percent:.0f}")
         st.info(ila.follow_up)
 
+    # ---- ÖNCEKİ TETKİK ----
+    render_prior_study()
+
     # ---- RAPOR METNİ ----
     st.markdown("---")
     st.subheader("📝 " + UI_TEXTS["report_title"])
     st.markdown("Aşağıdaki rapor metni PACS/RIS'e kopyalanabilir formattadır:")
 
-    # Rapor kutusu
-    st.text_area(
-        "Rapor",
-        value=st.session_state.report_text,
-        height=500,
-        label_visibility="collapsed",
+    # Rapor kutusu — kopyala butonu (Streamlit native)
+    st.code(decompress_text(st.session_state.report_blob), language=None)
+
+    col_fhir, col_hl7 = st.columns(2)
+    with col_fhir:
+        st.download_button(
+            "⬇️ FHIR DiagnosticReport (JSON)",
+            data=decompress_text(st.session_state.report_fhir_blob).encode("utf-8"),
+            file_name="diagnostic_report.json",
+            mime="application/fhir+json",
+            use_container_width=True,
+        )
+    with col_hl7:
+        st.download_button(
+            "⬇️ HL7 v2 ORU",
+            data=decompress_text(st.session_state.report_hl7_blob).encode("utf-8"),
+            file_name="report.hl7",
+            mime="application/hl7-v2",
+            use_container_width=True,
+        )
+
+    # ---- PAYLAŞILABİLİR BAĞLANTI ----
+    token = encode_case_token(st.session_state)
+    st.session_state.restored_case_token = token
+    st.query_params["case"] = token
+    st.caption(
+        "🔗 Vaka bağlantısı (MDD için paylaşılabilir; hasta adı içermez). "
+        "Bu sayfanın adresi vakayı doğrudan geri yükler:"
     )
+    st.code(f"?case={token}", language=None)
+
+    # ---- ARŞİV ----
+    archive_fp = _fingerprint(st.session_state.report_fingerprint, str(st.session_state.study_date))
+    archived = st.session_state.archived_fingerprint == archive_fp
+    st.text_input(
+        "Kesin tanı (biliniyorsa)",
+        key="final_diagnosis",
+        help="MDD / patoloji sonrası kesin tanı; benzer vaka aramalarında gösterilir.",
+    )
+    if st.button("💾 Arşive Kaydet", use_container_width=True, disabled=archived):
+        archive = _get_archive()
+        st.session_state.archived_analysis_id = archive.store_analysis(
+            clinical_context=_clinical_context(),
+            finding_mask=st.session_state.finding_mask,
+            diagnostic_result=result,
+            ila_result=ila,
+            final_diagnosis=st.session_state.final_diagnosis.strip(),
+        )
+        # Hasta / protokol numarası varsa tetkik geçmişine de eklenir
+        if st.session_state.patient_name.strip():
+            archive.store_study(
+                patient_id=st.session_state.patient_name,
+                study_date=st.session_state.study_date,
+                finding_mask=st.session_state.finding_mask,
+                diagnostic_result=result,
+                ila_result=ila,
+                extent=st.session_state.extent,
+                progression=st.session_state.progression,
+            )
+        st.session_state.archived_fingerprint = archive_fp
+        st.success(f"Analiz arşive kaydedildi (arşiv no {st.session_state.archived_analysis_id}).")
+    if st.session_state.archived_fingerprint == archive_fp and st.session_state.archived_analysis_id:
+        # Kesin tanı çoğu zaman MDD / patoloji sonrası netleşir
+        if st.button("✏️ Kesin Tanıyı Güncelle", use_container_width=True):
+            _record_final_diagnosis(
+                st.session_state.archived_analysis_id, st.session_state.final_diagnosis,
+            )
 
-    # Kopyala butonu (Streamlit native)
-    st.code(st.session_state.report_text, language=None)
+    render_final_diagnosis_update()
+    render_similar_cases()
 
     # Navigasyon
     st.markdown("---")
@@ -523,6 +893,7 @@ def page_report():
             st.rerun()
     with col_nav2:
         if st.button("🔄 " + UI_TEXTS["new_report"], type="primary", use_container_width=True):
+            st.query_params.clear()
             for key in list(st.session_state.keys()):
                 if key != "current_page":
                     del st.session_state[key]
@@ -531,6 +902,370 @@ def page_report():
             st.rerun()
 
 
+def render_reader_uncertainty(primary_key: str):
+    """Okuyucular arası değişkenlik altında primer skor aralığı ve patern olasılığı."""
+    uncertainty = reader_uncertainty(st.session_state.finding_mask, _clinical_context())
+    lo, _, hi = uncertainty.primary_score_quantiles
+    n_samples = f"{uncertainty.n_samples:,}".replace(",", ".")
+    st.caption(
+        f"Okuyucu değişkenliği (%{uncertainty.interval * 100:.0f} aralık, "
+        f"{n_samples} örnek): skor %{lo:.0f}–%{hi:.0f} · "
+        f"bu paternin primer kalma olasılığı %{uncertainty.primary_probability.get(primary_key, 0) * 100:.0f} · "
+        f"MDD olasılığı %{uncertainty.mdd_probability * 100:.0f}"
+    )
+
+
+def _toggle_effect(toggle) -> str:
+    outcome = toggle.outcome
+    parts = []
+    if toggle.changes_primary or toggle.changes_confidence:
+        if outcome.primary_pattern:
+            parts.append(
+                f"{_short_pattern_name(outcome.primary_pattern)} %{outcome.primary_score:.0f} "
+                f"({outcome.confidence_label.split(' — ')[0]})"
+            )
+        else:
+            parts.append("primer patern yok")
+    if toggle.changes_mdd:
+        parts.append("MDD önerilir" if outcome.mdd_recommended else "MDD gerekmez")
+    return ", ".join(parts)
+
+
+def render_critical_findings():
+    """Tek başına değiştiğinde primer paterni, güveni veya MDD kararını değiştiren bulgular."""
+    sensitivity = finding_sensitivity(st.session_state.finding_mask, _clinical_context())
+    critical = sensitivity.critical
+    st.markdown("---")
+    st.subheader("⚖️ Karar Açısından Kritik Bulgular")
+    if not critical:
+        st.caption("Tek bir bulgunun eklenmesi veya çıkarılması sonucu değiştirmiyor.")
+        return
+    removed = [t for t in critical if not t.added]
+    added = [t for t in critical if t.added]
+    if removed:
+        st.markdown("**Seçili bulgu yoksa:**")
+        for toggle in removed:
+            st.markdown(f"- {toggle.label} → {_toggle_effect(toggle)}")
+    if added:
+        with st.expander(f"Eklenirse sonucu değiştiren bulgular ({len(added)})"):
+            for toggle in added:
+                st.markdown(f"- {toggle.label} → {_toggle_effect(toggle)}")
+
+
+def _record_final_diagnosis(analysis_id: int, final_diagnosis: str) -> None:
+    """Kesin tanıyı arşive ve paylaşılan benzer vaka indeksine yaz."""
+    final_diagnosis = final_diagnosis.strip()
+    if not _get_archive().set_final_diagnosis(analysis_id, final_diagnosis):
+        st.error(f"Arşivde {analysis_id} numaralı analiz bulunamadı.")
+        return
+    _get_case_index().set_final_diagnosis(analysis_id, final_diagnosis)
+    if final_diagnosis:
+        st.success(f"{analysis_id} numaralı analizin kesin tanısı kaydedildi.")
+    else:
+        st.success(f"{analysis_id} numaralı analizin kesin tanısı silindi.")
+
+
+def render_final_diagnosis_update():
+    """Daha önce arşivlenmiş bir analize (arşiv no ile) MDD sonrası kesin tanı ekle."""
+    with st.expander("🩺 Arşivdeki vakaya kesin tanı ekle"):
+        with st.form("final_diagnosis_update", clear_on_submit=True):
+            col_id, col_dx = st.columns([1, 3])
+            with col_id:
+                analysis_id = st.number_input("Arşiv no", min_value=1, step=1)
+            with col_dx:
+                final_diagnosis = st.text_input("Kesin tanı", help="Boş bırakılırsa kayıtlı tanı silinir.")
+            if st.form_submit_button("Kaydet"):
+                _record_final_diagnosis(int(analysis_id), final_diagnosis)
+
+
+def render_similar_cases():
+    """Arşivdeki en benzer vakalar (bulgu + CTD / maruziyet bit maskesi)."""
+    index = _get_case_index()
+    index.refresh(_get_archive())
+    exclude = [st.session_state.archived_analysis_id] if st.session_state.archived_analysis_id else []
+    hits = index.search(
+        st.session_state.finding_mask,
+        ctd=st.session_state.ctd,
+        exposure=st.session_state.exposure,
+        k=10,
+        exclude_ids=exclude,
+    )
+    hits = [hit for hit in hits if hit.similarity > 0]
+    st.subheader("🔍 Benzer Vakalar")
+    if not hits:
+        st.caption("Arşivde karşılaştırılabilir vaka yok.")
+        return
+    # Kesin tanılar indeks yüklendikten sonra eklenmiş olabilir
+    final = _get_archive().final_diagnoses([hit.analysis_id for hit in hits])
+    st.dataframe(
+        pd.DataFrame({
+            "Arşiv no": [hit.analysis_id for hit in hits],
+            "Benzerlik": [f"%{hit.similarity * 100:.0f}" for hit in hits],
+            "Primer patern": [_short_pattern_name(hit.primary_pattern) for hit in hits],
+            "Skor": [f"%{hit.primary_score:.0f}" for hit in hits],
+            "Kesin tanı": [final.get(hit.analysis_id) or "—" for hit in hits],
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
+# =============================================
+# SAYFA 5: TOPLU ANALİZ
+# =============================================
+_BULK_CHUNK_SIZE = 10_000
+
+
+def _read_case_table(uploaded_file) -> pd.DataFrame:
+    """Yüklenen CSV / Parquet dosyasını oku."""
+    if uploaded_file.name.lower().endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file)
+
+
+def _score_case_table(cases: pd.DataFrame) -> pd.DataFrame:
+    """Vaka tablosunu parçalar halinde toplu motorla skorla (ilerleme çubuğu ile)."""
+    X, C = encode_case_frame(cases)
+    engine = BatchDecisionEngine()
+    progress = st.progress(0.0)
+    frames = []
+    for start in range(0, len(cases), _BULK_CHUNK_SIZE):
+        stop = min(start + _BULK_CHUNK_SIZE, len(cases))
+        frames.append(engine.analyze(X[start:stop], C[start:stop]).to_frame())
+        progress.progress(stop / len(cases), text=f"{stop:,} / {len(cases):,} vaka analiz edildi")
+    progress.empty()
+
+    results = pd.concat(frames, ignore_index=True)
+    if "case_id" in cases.columns:
+        results.insert(0, "case_id", cases["case_id"].to_numpy())
+    # Arşivleme için klinik bağlam ve bulgu maskesi
+    for name, default in CONTEXT_DEFAULTS.items():
+        results[name] = cases[name].fillna(default).to_numpy() if name in cases.columns else default
+    results["finding_mask"] = finding_masks(X)
+    return results
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _results_csv(results: pd.DataFrame) -> bytes:
+    return results.to_csv(index=False).encode("utf-8")
+
+
+def page_bulk_upload():
+    st.title("📦 " + PAGE_TITLES["page5"])
+    st.markdown(BULK_UI["instruction"])
+    st.markdown("---")
+
+    uploaded = st.file_uploader(BULK_UI["upload"], type=["csv", "parquet"])
+    if uploaded is None:
+        st.info(BULK_UI["format_help"])
+        return
+
+    # Aynı dosya için yeniden skorlama yapılmaz
+    if uploaded.file_id != st.session_state.bulk_file_id:
+        try:
+            cases = _read_case_table(uploaded)
+            if cases.empty:
+                raise ValueError("Dosyada vaka bulunamadı.")
+            st.session_state.bulk_results = _score_case_table(cases)
+        except ValueError as exc:
+            st.error(f"Dosya işlenemedi: {exc}")
+            st.info(BULK_UI["format_help"])
+            return
+        st.session_state.bulk_file_id = uploaded.file_id
+
+    results = st.session_state.bulk_results
+
+    # ---- ÖZET ----
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.metric("Vaka sayısı", f"{len(results):,}")
+    with col_m2:
+        st.metric("MDD önerilen", f"%{100 * results['mdd_recommended'].mean():.1f}")
+    with col_m3:
+        st.metric("Primer patern saptanan", f"{results['primary_pattern'].notna().sum():,}")
+
+    # ---- FİLTRELER ----
+    st.markdown("---")
+    col_f1, col_f2 = st.columns([3, 1])
+    with col_f1:
+        pattern_filter = st.multiselect(
+            BULK_UI["pattern_filter"],
+            options=list(results["primary_pattern"].cat.categories),
+            format_func=lambda key: PATTERN_CATEGORIES[key]["name"],
+        )
+    with col_f2:
+        mdd_filter = st.selectbox(BULK_UI["mdd_filter"], BULK_UI["mdd_filter_options"])
+
+    keep = pd.Series(True, index=results.index)
+    if pattern_filter:
+        keep &= results["primary_pattern"].isin(pattern_filter)
+    if mdd_filter == BULK_UI["mdd_filter_options"][1]:
+        keep &= results["mdd_recommended"]
+    elif mdd_filter == BULK_UI["mdd_filter_options"][2]:
+        keep &= ~results["mdd_recommended"]
+    filtered = results[keep]
+    if filtered.empty:
+        st.info("Filtrelere uyan vaka bulunamadı.")
+        return
+
+    # ---- SAYFALANMIŞ TABLO ----
+    col_p1, col_p2 = st.columns(2)
+    with col_p1:
+        page_size = st.selectbox(BULK_UI["page_size"], [100, 500, 1000], index=1)
+    n_pages = max(1, -(-len(filtered) // page_size))
+    with col_p2:
+        page_no = st.number_input(
+            f"{BULK_UI['page_number']} (1-{n_pages})",
+            min_value=1, max_value=n_pages, value=1,
+        )
+    start = (page_no - 1) * page_size
+    st.dataframe(
+        filtered.iloc[start:start + page_size],
+        use_container_width=True,
+        hide_index=True,
+        column_config={"finding_mask": None},
+    )
+    st.caption(f"{len(filtered):,} satırdan {start + 1:,}-{min(start + page_size, len(filtered)):,} gösteriliyor")
+
+    st.download_button(
+        BULK_UI["download"],
+        data=_results_csv(filtered),
+        file_name="ild_toplu_analiz.csv",
+        mime="text/csv",
+        use_container_width=True,
+    )
+
+    archived = st.session_state.bulk_archived_file_id == st.session_state.bulk_file_id
+    if st.button(BULK_UI["archive"], use_container_width=True, disabled=archived):
+        with st.spinner("Arşive kaydediliyor..."):
+            _get_archive().store_batch_results(results)
+        st.session_state.bulk_archived_file_id = st.session_state.bulk_file_id
+        st.success(f"{len(results):,} analiz arşive kaydedildi.")
+
+
+# =============================================
+# SAYFA 6: KOHORT ANALİZİ
+# =============================================
+def _short_pattern_name(key: str) -> str:
+    return PATTERN_CATEGORIES.get(key, {}).get("name", key).split("(")[0].strip()
+
+
+def page_cohort_dashboard():
+    st.title("📊 " + PAGE_TITLES["page6"])
+    st.markdown(DASHBOARD_UI["instruction"])
+    st.markdown("---")
+
+    archive = _get_archive()
+    values = archive.slice_values()
+    if not values["age_band"]:
+        st.info(DASHBOARD_UI["empty"])
+        return
+
+    # ---- DİLİMLER ----
+    col_f1, col_f2, col_f3 = st.columns(3)
+    with col_f1:
+        ctd_filter = st.multiselect(DASHBOARD_UI["ctd_filter"], values["ctd"])
+    with col_f2:
+        exposure_filter = st.multiselect(DASHBOARD_UI["exposure_filter"], values["exposure"])
+    with col_f3:
+        age_filter = st.multiselect(
+            DASHBOARD_UI["age_filter"],
+            [label for _, label in AGE_BANDS if label in values["age_band"]],
+        )
+    filters = {"ctd": ctd_filter, "exposure": exposure_filter, "age_band": age_filter}
+
+    patterns = archive.pattern_summary(filters)
+    if patterns.empty:
+        st.info("Seçilen dilimde analiz bulunamadı.")
+        return
+    ila = archive.ila_summary(filters)
+
+    total = int(patterns["n"].sum())
+    with_primary = patterns[patterns["primary_pattern"] != ""]
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.metric("Analiz sayısı", f"{total:,}")
+    with col_m2:
+        st.metric("MDD oranı", f"%{100 * patterns['mdd_n'].sum() / total:.1f}")
+    with col_m3:
+        n_primary = with_primary["n"].sum()
+        mean_score = with_primary["score_sum"].sum() / n_primary if n_primary else 0
+        st.metric("Ortalama primer skor", f"%{mean_score:.0f}")
+
+    by_pattern = with_primary.groupby("primary_pattern", as_index=False)[["n", "mdd_n"]].sum()
+    by_pattern["pattern"] = by_pattern["primary_pattern"].map(_short_pattern_name)
+    by_pattern["mdd_rate"] = by_pattern["mdd_n"] / by_pattern["n"]
+
+    bands = with_primary.groupby(["primary_pattern", "confidence_band"], as_index=False)["n"].sum()
+    bands["pattern"] = bands["primary_pattern"].map(_short_pattern_name)
+    band_labels = [level["label"] for _, level in CONFIDENCE_LEVELS]
+    bands["confidence"] = bands["confidence_band"].map(lambda b: band_labels[b])
+
+    st.markdown("---")
+    col_c1, col_c2 = st.columns(2)
+    with col_c1:
+        st.subheader(DASHBOARD_UI["pattern_chart"])
+        st.altair_chart(
+            alt.Chart(by_pattern).mark_bar().encode(
+                x=alt.X("n:Q", title="Vaka"),
+                y=alt.Y("pattern:N", sort="-x", title=None),
+                tooltip=["pattern", "n"],
+            ),
+            use_container_width=True,
+        )
+    with col_c2:
+        st.subheader(DASHBOARD_UI["confidence_chart"])
+        st.altair_chart(
+            alt.Chart(bands).mark_bar().encode(
+                x=alt.X("n:Q", stack="normalize", title="Oran"),
+                y=alt.Y("pattern:N", title=None),
+                color=alt.Color(
+                    "confidence:N",
+                    sort=band_labels,
+                    scale=alt.Scale(domain=band_labels, scheme="redyellowgreen", reverse=True),
+                    legend=alt.Legend(orient="bottom", columns=2, title=None),
+                ),
+                order=alt.Order("confidence_band:Q"),
+                tooltip=["pattern", "confidence", "n"],
+            ),
+            use_container_width=True,
+        )
+
+    col_c3, col_c4 = st.columns(2)
+    with col_c3:
+        st.subheader(DASHBOARD_UI["mdd_chart"])
+        st.altair_chart(
+            alt.Chart(by_pattern).mark_bar(color="#e67e22").encode(
+                x=alt.X("mdd_rate:Q", axis=alt.Axis(format="%"), title="MDD oranı"),
+                y=alt.Y("pattern:N", sort="-x", title=None),
+                tooltip=["pattern", alt.Tooltip("mdd_rate:Q", format=".1%"), "n"],
+            ),
+            use_container_width=True,
+        )
+    with col_c4:
+        st.subheader(DASHBOARD_UI["ila_chart"])
+        ila_risk = (
+            ila[ila["ila_category"] != "none"]
+            .groupby("ila_risk", as_index=False)["n"].sum()
+        )
+        if ila_risk.empty:
+            st.info("Seçilen dilimde ILA saptanan analiz bulunmamaktadır.")
+        else:
+            st.altair_chart(
+                alt.Chart(ila_risk).mark_bar().encode(
+                    x=alt.X("ila_risk:N", sort=list(ILA_RISK_LEVELS), title=None),
+                    y=alt.Y("n:Q", title="Vaka"),
+                    color=alt.Color(
+                        "ila_risk:N",
+                        scale=alt.Scale(domain=list(ILA_RISK_LEVELS), range=["#2ecc71", "#f1c40f", "#e74c3c"]),
+                        legend=None,
+                    ),
+                    tooltip=["ila_risk", "n"],
+                ),
+                use_container_width=True,
+            )
+
+
 # =============================================
 # SAYFA YÖNLENDİRME
 # =============================================
@@ -539,6 +1274,8 @@ page_map = {
     2: page_ct_findings,
     3: page_ila_screening,
     4: page_report,
+    5: page_bulk_upload,
+    6: page_cohort_dashboard,
 }
 
 current_page = st.session_state.get("current_page", 1)
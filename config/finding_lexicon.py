@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Serbest Metin Rapor Sözlüğü
+
+Eski (anlatı biçimindeki) YÇBT raporlarından bulgu anahtarı çıkarmak
+için eş anlamlılar, İngilizce terimler ve olumsuzlama / onaylama
+ifadeleri. Bulgu etiketlerinin parantez dışındaki kısmı
+(findings_taxonomy) ayrıca otomatik olarak eklenir.
+
+Tüm ifadeler Türkçe büyük/küçük harf ve aksan katlamasından sonra
+eşleştirilir (İ/I → i, ı → i, ç → c, ğ → g, ö → o, ş → s, ü → u);
+burada doğal yazımla yazılabilir. İfadeler kelime başında eşleşir ve
+devamında ek alabilir ("bal peteği" → "bal peteğinin").
+"""
+
+# Sözlük sürümü — eş anlamlılar veya ipuçları değiştiğinde artırılır
+LEXICON_VERSION = 1
+
+# =============================================
+# BULGU EŞ ANLAMLILARI (Türkçe varyantlar + İngilizce)
+# =============================================
+FINDING_SYNONYMS = {
+    # --- Dağılım ---
+    "basal_predominant": [
+        "bazal predominant", "bazal ağırlıklı", "bazal kesimlerde belirgin",
+        "alt lob predominant", "alt lob ağırlıklı", "alt zon ağırlıklı",
+        "basal predominant", "lower lobe predominant", "lower zone predominant",
+    ],
+    "peripheral_predominant": [
+        "periferik predominant", "periferik ağırlıklı", "subplevral predominant",
+        "subplevral ağırlıklı", "peripheral predominant", "subpleural predominant",
+    ],
+    "upper_predominant": [
+        "üst lob predominant", "üst lob ağırlıklı", "üst zon ağırlıklı",
+        "upper lobe predominant", "upper zone predominant",
+    ],
+    "peribronchovascular": [
+        "peribronkovasküler", "peribronovasküler", "bronkovasküler demet çevresinde",
+        "peribronchovascular",
+    ],
+    "diffuse": ["diffüz tutulum", "yaygın tutulum", "diffuse distribution"],
+    "random": ["random dağılım", "random distribution"],
+    "unilateral": ["asimetrik tutulum", "tek taraflı tutulum", "asymmetric distribution"],
+    # --- Fibrotik ---
+    "honeycombing": ["bal peteği", "honeycombing", "honeycomb"],
+    "traction_bronchiectasis": [
+        "traksiyon bronşektazi", "traksiyon bronşiektazi", "traction bronchiectasis",
+    ],
+    "traction_bronchiolectasis": [
+        "traksiyon bronşiolektazi", "traksiyon bronşiyolektazi", "traction bronchiolectasis",
+    ],
+    "reticulation": [
+        "retikülasyon", "retiküler opasite", "retiküler dansite", "retiküler görünüm",
+        "reticulation", "reticular pattern", "reticular opacit",
+    ],
+    "architectural_distortion": ["mimari distorsiyon", "architectural distortion"],
+    "volume_loss": ["hacim kaybı", "volume loss"],
+    "irregular_interfaces": [
+        "irregüler arayüz", "düzensiz arayüz", "düzensiz plevral arayüz", "irregular interface",
+    ],
+    # --- Non-fibrotik ---
+    "ground_glass": ["buzlu cam", "ggo", "ground glass", "ground-glass"],
+    "consolidation": ["konsolidasyon", "consolidation"],
+    "centrilobular_nodules": [
+        "sentrilobüler buzlu cam nodül", "buzlu cam dansiteli sentrilobüler nodül",
+        "sentrilobüler nodül", "centrilobular ground glass nodule", "centrilobular nodule",
+    ],
+    "centrilobular_nodules_solid": [
+        "solid sentrilobüler nodül", "sentrilobüler solid nodül", "solid centrilobular nodule",
+    ],
+    "mosaic_attenuation": [
+        "mozaik atenüasyon", "mozaik perfüzyon", "mozaik patern", "mosaic attenuation",
+    ],
+    "air_trapping": ["hava hapsi", "hava hapsedilme", "air trapping", "air-trapping"],
+    "crazy_paving": ["kaldırım taşı", "crazy paving", "crazy-paving"],
+    "tree_in_bud": ["tomurcuklanan ağaç", "ağaçta tomurcuk", "tree-in-bud", "tree in bud"],
+    "septal_thickening": [
+        "septal kalınlaşma", "interlobular septal thickening", "septal thickening",
+    ],
+    "cysts": ["kist", "cyst"],
+    "lymphadenopathy": [
+        "lenfadenopati", "lenf nodu büyümesi", "büyümüş lenf nod", "lymphadenopathy",
+    ],
+    "pleural_thickening": ["plevral kalınlaşma", "plevral kalınlık artışı", "pleural thickening"],
+    "pleural_effusion": ["plevral efüzyon", "plevral sıvı", "pleural effusion"],
+    # --- Spesifik ---
+    "perilobular_pattern": ["perilobüler", "perilobular"],
+    "reversed_halo": ["ters halo", "atoll", "reversed halo"],
+    "subpleural_sparing": [
+        "subplevral koruma", "subplevral alanların korunduğu", "subplevral sparing",
+        "subpleural sparing",
+    ],
+    "head_cheese_sign": ["head-cheese", "head cheese", "üç dansite", "three-density", "three density"],
+    "pleuroparenchymal_fibroelastosis": [
+        "plöroparankimal fibroelastoz", "ppfe", "pleuroparenchymal fibroelastosis",
+    ],
+    "esophageal_dilatation": [
+        "özofagus dilatasyon", "özofageal dilatasyon", "dilate özofagus",
+        "esophageal dilatation", "oesophageal dilatation",
+    ],
+}
+
+# =============================================
+# OLUMSUZLAMA / ONAYLAMA İPUÇLARI
+# =============================================
+# Türkçede yüklem cümle sonundadır: bulgudan SONRA gelen ilk yüklem
+# ipucu bulgunun olumlu / olumsuz olduğunu belirler.
+POST_NEGATION_CUES = [
+    "saptanmamış", "saptanmadı", "saptanmamakta",
+    "izlenmemiş", "izlenmedi", "izlenmemekte",
+    "görülmemiş", "görülmedi", "görülmemekte",
+    "gözlenmemiş", "gözlenmedi", "rastlanmamış", "rastlanmadı",
+    "dikkati çekmemiş", "bulunmamakta", "bulunmamış",
+    "mevcut değil", "yok",
+    "ekarte edil", "lehine değil",
+    "not seen", "not identified", "not present", "is absent", "are absent",
+]
+
+# İngilizce raporlarda olumsuzlama bulgudan ÖNCE gelir; cümlenin
+# sonraki bulgularını da kapsar ("no honeycombing or effusion")
+PRE_NEGATION_CUES = [
+    "no ", "without ", "absence of", "negative for", "free of",
+]
+
+AFFIRMATION_CUES = [
+    "saptandı", "saptanmış", "saptanmakta",
+    "izlendi", "izlenmiş", "izlenmekte",
+    "görüldü", "görülmüş", "görülmekte",
+    "gözlendi", "gözlenmiş", "gözlenmekte",
+    "dikkati çekmekte", "dikkati çekti", "mevcut", "bulunmakta", "vardır",
+]
+
+# Olumsuzlama kapsamını kesen bağlaçlar (noktalama ayrıca keser)
+CLAUSE_BREAKS = ["ancak", "fakat", "ama ", "olup", "bununla birlikte", "however", "but "]
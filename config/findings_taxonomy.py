@@ -4,6 +4,10 @@ ILD BT Bulguları Taksonomisi
 2025 ERS/ATS Kılavuzu Uyumlu (Ryerson CJ et al. Eur Respir J 2025)
 """
 
+# Taksonomi sürümü — bulgu etiketleri, kategorileri veya sırası
+# değiştiğinde artırılır. Önceden derlenmiş etiket tabloları bu sürüme bağlıdır.
+TAXONOMY_VERSION = 1
+
 # =============================================
 # DAĞILIM BULGULARI
 # =============================================
@@ -253,3 +257,13 @@ ALL_FINDING_GROUPS = {
     "☁️ Non-Fibrotik Bulgular": NON_FIBROTIC_FINDINGS,
     "🔬 Spesifik Bulgular": SPECIFIC_FINDINGS,
 }
+
+# =============================================
+# BULGU SIRALAMASI (bit maskesi kodlaması için)
+# =============================================
+# Sıra değiştirilmemelidir: kayıtlı maskeler ve paylaşılan bağlantılar
+# bu sıradaki bit konumlarına dayanır. Yeni bulgular sona eklenir.
+FINDING_KEYS = tuple(
+    key for group in ALL_FINDING_GROUPS.values() for key in group
+)
+ILA_FINDING_KEYS = tuple(ILA_FINDINGS)
@@ -30,6 +30,10 @@ Her patern:
   - category_2025: 2025 sınıflama kategorisi
 """
 
+# Kural seti sürümü — patern tanımları, skor ağırlıkları veya kurallar
+# değiştiğinde artırılır. Paylaşılan vaka bağlantıları bu sürümü taşır.
+RULESET_VERSION = 1
+
 PATTERN_CATEGORIES = {
     # ====================================================
     # İNTERSTİSYEL BOZUKLUKLAR — FİBROTİK
@@ -518,6 +522,27 @@ PATTERN_CATEGORIES = {
 }
 
 
+# ====================================================
+# SKOR AĞIRLIKLARI (Scoring Weights)
+# ====================================================
+# Tüm paternlerde ortak bulgu puanları. Patern başına temel skor
+# (base_score) ve klinik modifiyerler PATTERN_CATEGORIES içindedir.
+SCORING_WEIGHTS = {
+    "supportive_per_finding": 3,   # Her destekleyici bulgu +3
+    "supportive_cap": 15,          # Destek bonusu üst sınırı
+    "distribution_bonus": 5,       # Tipik dağılım eşleşmesi
+    "against_per_finding": 8,      # Her karşıt bulgu -8
+}
+
+# MDD önerisi eşikleri (bkz. ILDDecisionEngine._mdd_reason_code)
+MDD_THRESHOLDS = {
+    "close_gap": 15,               # İlk iki skor farkı bunun altındaysa...
+    "close_second_min": 20,        # ...ve ikinci skor bunun üstündeyse MDD
+    "low_confidence": 70,          # Primer skor bunun altındaysa MDD
+    "uip_definite_high": 90,       # Kesin UIP bu skor ve üstünde MDD gerektirmez
+}
+
+
 # ====================================================
 # 2025 NOMENKLATUR UYUMLULUK HARİTASI
 # ====================================================
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Okuyucular Arası Değişkenlik Parametreleri
+
+Monte Carlo belirsizlik analizinde (modules/sensitivity.py) her örnek
+vaka, seçilen bulgu kümesinin başka bir okuyucu tarafından nasıl
+raporlanabileceğini taklit eder:
+
+  - Seçili bulgu başka okuyucuda raporlanmayabilir (drop)
+  - Seçilmemiş bulgu başka okuyucuda raporlanabilir (add)
+  - Sık karıştırılan bulgu çiftlerinde bulgu diğeriyle yer değiştirebilir
+
+Olasılıklar kabaca okuyucular arası uyum (kappa) çalışmalarındaki
+düzeyleri yansıtır; yerel verilerle ayarlanmalıdır.
+"""
+
+# Tanımlanmamış bulgular için varsayılan olasılıklar
+DEFAULT_DROP_PROBABILITY = 0.10
+DEFAULT_ADD_PROBABILITY = 0.02
+
+# Bulgu → (drop, add) olasılıkları
+FLIP_PROBABILITIES = {
+    # Dağılım tanımları okuyucular arasında en az tutarlı olanlardır
+    "basal_predominant": (0.10, 0.05),
+    "peripheral_predominant": (0.10, 0.05),
+    "upper_predominant": (0.15, 0.03),
+    "peribronchovascular": (0.20, 0.04),
+    "diffuse": (0.20, 0.03),
+    "random": (0.25, 0.02),
+    "unilateral": (0.15, 0.02),
+    # Fibrotik
+    "honeycombing": (0.20, 0.05),
+    "traction_bronchiectasis": (0.15, 0.06),
+    "traction_bronchiolectasis": (0.25, 0.05),
+    "reticulation": (0.10, 0.06),
+    "architectural_distortion": (0.20, 0.04),
+    "volume_loss": (0.20, 0.04),
+    "irregular_interfaces": (0.25, 0.04),
+    # Non-fibrotik
+    "ground_glass": (0.10, 0.06),
+    "mosaic_attenuation": (0.25, 0.04),
+    "air_trapping": (0.20, 0.03),
+    "centrilobular_nodules": (0.15, 0.03),
+    "perilobular_pattern": (0.30, 0.02),
+    "subpleural_sparing": (0.25, 0.03),
+    "head_cheese_sign": (0.25, 0.02),
+}
+
+# Sık karıştırılan bulgu çiftleri: (seçili bulgu, yerine raporlanabilen, olasılık)
+CONFUSION_PAIRS = [
+    ("honeycombing", "traction_bronchiolectasis", 0.15),
+    ("traction_bronchiolectasis", "honeycombing", 0.10),
+    ("honeycombing", "cysts", 0.05),
+    ("ground_glass", "mosaic_attenuation", 0.05),
+    ("mosaic_attenuation", "ground_glass", 0.05),
+]
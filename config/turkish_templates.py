@@ -8,6 +8,8 @@ PAGE_TITLES = {
     "page2": "BT Bulguları",
     "page3": "ILA Tarama",
     "page4": "Rapor & Karar Desteği",
+    "page5": "Toplu Analiz",
+    "page6": "Kohort Analizi",
 }
 
 PATIENT_FORM = {
@@ -82,6 +84,35 @@ ILA_UI = {
     "ila_findings": "ILA Bulguları",
 }
 
+BULK_UI = {
+    "instruction": "Çok sayıda vakayı CSV veya Parquet dosyası olarak yükleyip toplu analiz edebilirsiniz.",
+    "upload": "Vaka tablosu (CSV / Parquet)",
+    "format_help": (
+        "**Beklenen sütunlar:** `findings` (bulgu anahtarları `;` ile ayrılmış) "
+        "veya her bulgu anahtarı için 0/1 sütunu. İsteğe bağlı: `case_id`, `age`, "
+        "`sex`, `smoking`, `ctd`, `exposure`, `presentation` (arayüzdeki seçenek metinleri)."
+    ),
+    "pattern_filter": "Primer patern",
+    "mdd_filter": "MDD",
+    "mdd_filter_options": ["Tümü", "MDD önerilen", "MDD gerekmeyen"],
+    "page_size": "Sayfa başına satır",
+    "page_number": "Sayfa",
+    "download": "Sonuçları indir (CSV)",
+    "archive": "💾 Sonuçları arşive ekle",
+}
+
+DASHBOARD_UI = {
+    "instruction": "Arşivlenmiş analizlerin ön-hesaplanmış özet tablolarından kohort dağılımları.",
+    "empty": "Arşivde henüz analiz bulunmamaktadır. Rapor veya Toplu Analiz sayfasından analiz kaydediniz.",
+    "ctd_filter": "CTD",
+    "exposure_filter": "Maruziyet",
+    "age_filter": "Yaş grubu",
+    "pattern_chart": "Primer Patern Dağılımı",
+    "confidence_chart": "Güven Düzeyleri",
+    "mdd_chart": "Paterne Göre MDD Oranı",
+    "ila_chart": "ILA Risk Düzeyleri",
+}
+
 UI_TEXTS = {
     "sidebar_info": "2025 ERS/ATS kılavuzuna uyumlu interstisyel akciğer hastalığı yapısal raporlama ve karar destek sistemi.",
     "next_button": "İleri ➡️",
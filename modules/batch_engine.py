@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+"""
+Vektörize Toplu Karar Destek Motoru
+
+ILDDecisionEngine ile birebir aynı skorlama mantığını NumPy matris
+işlemleriyle çok sayıda vaka için tek geçişte uygular.
+
+  - Bulgular: (N, F) boolean matris (sütun sırası = FINDING_KEYS)
+  - Klinik bağlam: (N, K) boolean matris (sütun sırası = CONTEXT_FEATURES)
+  - Patern tanımları bir kez CompiledRuleset'e derlenir
+    (required / supportive / against / dağılım maskeleri, alternatif
+    setler, klinik modifiyer matrisi, çıkarım ve birlikte-görülme kuralları)
+
+Tek vaka için sonuçlar BatchResult.diagnostic_result(i) ile
+DiagnosticResult objesine geri dönüştürülebilir.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config.findings_taxonomy import FINDING_KEYS
+from config.pattern_definitions import (
+    PATTERN_CATEGORIES,
+    FINDING_IMPLICATIONS,
+    COOCCURRENCE_RULES,
+    SCORING_WEIGHTS,
+    MDD_THRESHOLDS,
+)
+from modules.decision_engine import (
+    CONFIDENCE_LEVELS,
+    DiagnosticResult,
+    ILDDecisionEngine,
+    MDD_REASON_CODES,
+    PatternResult,
+)
+
+
+# Klinik bağlam özellikleri (clinical_modifiers anahtarları)
+CONTEXT_FEATURES = (
+    "age_over_60",
+    "age_under_50",
+    "male",
+    "female",
+    "smoking_history",
+    "ctd_present",
+    "exposure_present",
+    "subacute_presentation",
+    "acute_presentation",
+)
+
+# ILDDecisionEngine ile aynı varsayılan klinik bağlam
+CONTEXT_DEFAULTS = {
+    "age": 55,
+    "sex": "Erkek",
+    "smoking": "Hiç içmemiş",
+    "ctd": "Yok",
+    "exposure": "Yok",
+    "presentation": "Kronik (>3 ay)",
+}
+
+MDD_CODES = tuple(MDD_REASON_CODES)
+_MDD_CODE_INDEX = {code: i for i, code in enumerate(MDD_CODES)}
+_MDD_FLAGS = np.array([MDD_REASON_CODES[c] for c in MDD_CODES], dtype=bool)
+
+_FINDING_INDEX = {key: i for i, key in enumerate(FINDING_KEYS)}
+# Bulgu listesi ayırıcıları ";" e normalize edilir, boşluklar atılır
+_FINDING_SEPARATORS = str.maketrans({
+    ",": ";", "|": ";", " ": None, "\t": None, "\r": None, "\n": None,
+})
+_ROW_BOUNDARY = "\x1f"
+
+
+# =============================================
+# KURAL SETİ DERLEME
+# =============================================
+@dataclass
+class CompiledRuleset:
+    """Patern tanımlarının matris formu."""
+    pattern_keys: tuple
+    pattern_names: tuple
+    base_score: np.ndarray          # (P,)
+    required: np.ndarray            # (P, F)
+    n_required: np.ndarray          # (P,)
+    supportive: np.ndarray          # (P, F)
+    against: np.ndarray             # (P, F)
+    distribution: np.ndarray        # (P, F)
+    alt_sets: np.ndarray            # (A, F)
+    alt_pattern: np.ndarray         # (A,) ait olduğu patern indeksi
+    alt_len: np.ndarray             # (A,)
+    alt_supportive_overlap: np.ndarray  # (A,) set ∩ supportive eleman sayısı
+    clinical_modifiers: np.ndarray  # (P, K)
+    implications: np.ndarray        # (F, F) satır bulgusu → sütun bulgusu
+    cooc_triggers: np.ndarray       # (R, F)
+    cooc_size: np.ndarray           # (R,)
+    cooc_modifiers: np.ndarray      # (R, P)
+    scoring_weights: Dict
+    mdd_thresholds: Dict
+    patterns: Dict
+
+    @property
+    def pattern_index(self) -> Dict[str, int]:
+        return {key: i for i, key in enumerate(self.pattern_keys)}
+
+
+def _finding_row(keys: Sequence[str]) -> np.ndarray:
+    row = np.zeros(len(FINDING_KEYS), dtype=np.float64)
+    for key in keys:
+        row[_FINDING_INDEX[key]] = 1
+    return row
+
+
+def compile_ruleset(
+    patterns: Optional[Dict] = None,
+    implications: Optional[Dict] = None,
+    cooccurrence_rules: Optional[List[Dict]] = None,
+    scoring_weights: Optional[Dict] = None,
+    mdd_thresholds: Optional[Dict] = None,
+) -> CompiledRuleset:
+    """Patern tanımlarını toplu skorlama için matrislere derle."""
+    patterns = PATTERN_CATEGORIES if patterns is None else patterns
+    implications = FINDING_IMPLICATIONS if implications is None else implications
+    cooccurrence_rules = COOCCURRENCE_RULES if cooccurrence_rules is None else cooccurrence_rules
+
+    keys = tuple(patterns)
+    index = {key: i for i, key in enumerate(keys)}
+    alt_rows, alt_pattern, alt_overlap = [], [], []
+    for p, key in enumerate(keys):
+        supportive = set(patterns[key].get("supportive_findings", []))
+        for alt_set in patterns[key].get("alternative_required_sets", []):
+            alt_rows.append(_finding_row(alt_set))
+            alt_pattern.append(p)
+            alt_overlap.append(len(supportive.intersection(alt_set)))
+
+    F = len(FINDING_KEYS)
+    implication_matrix = np.zeros((F, F), dtype=np.float64)
+    for source, implied in implications.items():
+        implication_matrix[_FINDING_INDEX[source]] = _finding_row(implied)
+
+    cooc_modifiers = np.zeros((len(cooccurrence_rules), len(keys)), dtype=np.float64)
+    for r, rule in enumerate(cooccurrence_rules):
+        for key, value in rule["pattern_modifiers"].items():
+            cooc_modifiers[r, index[key]] += value
+
+    def stack(field_name):
+        return np.array([_finding_row(patterns[k].get(field_name, [])) for k in keys])
+
+    alt_sets = np.array(alt_rows) if alt_rows else np.zeros((0, F))
+    return CompiledRuleset(
+        pattern_keys=keys,
+        pattern_names=tuple(patterns[k]["name"] for k in keys),
+        base_score=np.array([patterns[k].get("base_score", 50) for k in keys], dtype=np.float64),
+        required=stack("required_findings"),
+        n_required=np.array([len(patterns[k].get("required_findings", [])) for k in keys]),
+        supportive=stack("supportive_findings"),
+        against=stack("against_findings"),
+        distribution=stack("distribution"),
+        alt_sets=alt_sets,
+        alt_pattern=np.array(alt_pattern, dtype=np.intp),
+        alt_len=alt_sets.sum(axis=1),
+        alt_supportive_overlap=np.array(alt_overlap, dtype=np.float64),
+        clinical_modifiers=np.array([
+            [patterns[k].get("clinical_modifiers", {}).get(feat, 0) for feat in CONTEXT_FEATURES]
+            for k in keys
+        ], dtype=np.float64),
+        implications=implication_matrix,
+        cooc_triggers=np.array([_finding_row(r["trigger_findings"]) for r in cooccurrence_rules]).reshape(-1, F),
+        cooc_size=np.array([len(r["trigger_findings"]) for r in cooccurrence_rules], dtype=np.float64),
+        cooc_modifiers=cooc_modifiers,
+        scoring_weights={**SCORING_WEIGHTS, **(scoring_weights or {})},
+        mdd_thresholds={**MDD_THRESHOLDS, **(mdd_thresholds or {})},
+        patterns=patterns,
+    )
+
+
+# =============================================
+# GİRDİ KODLAMA
+# =============================================
+def _flag(values, predicate) -> np.ndarray:
+    """Metin sütununda koşulu yalnızca benzersiz değerler üzerinde değerlendir."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    flags = np.array([predicate(str(u)) for u in uniques], dtype=bool)
+    return flags[codes] if len(flags) else np.zeros(len(codes), dtype=bool)
+
+
+def encode_context(
+    age,
+    sex,
+    smoking,
+    ctd,
+    exposure,
+    presentation,
+) -> np.ndarray:
+    """Klinik bağlam sütunlarını (N, K) boolean özellik matrisine çevir."""
+    age = np.asarray(age, dtype=np.float64)
+    return np.column_stack([
+        age > 60,
+        age < 50,
+        _flag(sex, lambda v: v == "Erkek"),
+        _flag(sex, lambda v: v == "Kadın"),
+        _flag(smoking, lambda v: v != "Hiç içmemiş"),
+        _flag(ctd, lambda v: v != "Yok"),
+        _flag(exposure, lambda v: v != "Yok"),
+        _flag(presentation, lambda v: "Subakut" in v),
+        _flag(presentation, lambda v: "Akut" in v),
+    ])
+
+
+def encode_context_dicts(contexts: Sequence[Dict]) -> np.ndarray:
+    """Klinik bağlam dict listesini (N, K) özellik matrisine çevir."""
+    columns = {
+        name: [ctx.get(name, default) for ctx in contexts]
+        for name, default in CONTEXT_DEFAULTS.items()
+    }
+    return encode_context(**columns)
+
+
+def encode_finding_lists(findings: Sequence[Sequence[str]]) -> np.ndarray:
+    """Bulgu anahtarı listelerini (N, F) boolean matrise çevir."""
+    X = np.zeros((len(findings), len(FINDING_KEYS)), dtype=bool)
+    for i, keys in enumerate(findings):
+        for key in keys:
+            X[i, _FINDING_INDEX[key]] = True
+    return X
+
+
+def encode_finding_masks(masks) -> np.ndarray:
+    """Bulgu bit maskelerini (bkz. state_codec) (N, F) boolean matrise çevir."""
+    masks = np.asarray(masks, dtype=np.uint64)
+    bits = np.arange(len(FINDING_KEYS), dtype=np.uint64)
+    return ((masks[:, None] >> bits) & np.uint64(1)).astype(bool)
+
+
+def finding_masks(X: np.ndarray) -> np.ndarray:
+    """(N, F) boolean bulgu matrisini bit maskelerine çevir (encode_finding_masks tersi)."""
+    bits = np.uint64(1) << np.arange(X.shape[1], dtype=np.uint64)
+    return (np.asarray(X, dtype=np.uint64) * bits).sum(axis=1, dtype=np.uint64)
+
+
+def encode_key_column(values: pd.Series, keys: Sequence[str]) -> np.ndarray:
+    """
+    Ayırıcılı anahtar listesi sütununu (";", "," veya "|") (N, len(keys))
+    boolean matrise çevir.
+
+    Raises:
+        ValueError: Bilinmeyen anahtar varsa
+    """
+    # Tüm hücreler tek metinde birleştirilip tek seferde bölünür
+    values = values.fillna("").astype(str).to_numpy()
+    text = f";{_ROW_BOUNDARY};".join(values).translate(_FINDING_SEPARATORS)
+    tokens = np.array(text.split(";"), dtype=object)
+    boundary = tokens == _ROW_BOUNDARY
+    rows = np.cumsum(boundary)
+    present = ~boundary & (tokens != "")
+    codes = pd.Categorical(tokens[present], categories=list(keys)).codes
+    if (codes < 0).any():
+        unknown = sorted(set(tokens[present][codes < 0]))
+        raise ValueError(f"Bilinmeyen bulgu anahtarları: {', '.join(unknown)}")
+    X = np.zeros((len(values), len(keys)), dtype=bool)
+    X[rows[present], codes] = True
+    return X
+
+
+def encode_case_frame(df: pd.DataFrame):
+    """
+    Vaka tablosunu motor girdilerine çevir.
+
+    Bulgular üç biçimde verilebilir:
+      - Her bulgu anahtarı için ayrı 0/1 sütunu (ör. "honeycombing")
+      - Tek bir "findings" sütunu: ";", "," veya "|" ile ayrılmış anahtarlar
+      - Tek bir "finding_mask" sütunu: bulgu bit maskesi (arşiv kayıtları)
+
+    Klinik bağlam sütunları (age, sex, smoking, ctd, exposure, presentation)
+    arayüzdeki seçenek metinlerini kullanır; eksik sütunlar için motorun
+    varsayılanları geçerlidir.
+
+    Returns:
+        (X, C): (N, F) bulgu matrisi ve (N, K) bağlam özellik matrisi
+
+    Raises:
+        ValueError: Bulgu sütunu yoksa veya bilinmeyen bulgu anahtarı varsa
+    """
+    n = len(df)
+    finding_columns = [key for key in FINDING_KEYS if key in df.columns]
+    if finding_columns:
+        X = np.zeros((n, len(FINDING_KEYS)), dtype=bool)
+        for key in finding_columns:
+            X[:, _FINDING_INDEX[key]] = df[key].fillna(0).astype(bool).to_numpy()
+    elif "findings" in df.columns:
+        X = encode_key_column(df["findings"], FINDING_KEYS)
+    elif "finding_mask" in df.columns:
+        X = encode_finding_masks(df["finding_mask"].to_numpy(dtype=np.int64))
+    else:
+        raise ValueError(
+            "Bulgu sütunu bulunamadı: 'findings' sütunu veya bulgu anahtarı "
+            "adlı 0/1 sütunları gereklidir."
+        )
+
+    columns = {
+        name: df[name].fillna(default).to_numpy() if name in df.columns else np.full(n, default, dtype=object)
+        for name, default in CONTEXT_DEFAULTS.items()
+    }
+    return X, encode_context(**columns)
+
+
+# =============================================
+# SONUÇ
+# =============================================
+@dataclass
+class BatchResult:
+    """
+    Toplu analiz sonucu. Skor dizileri (N, P) boyutunda ve
+    kural setindeki patern sırasındadır (sıralı değil).
+    """
+    ruleset: CompiledRuleset
+    selected: np.ndarray            # (N, F) seçilen bulgular
+    expanded: np.ndarray            # (N, F) çıkarımlarla genişletilmiş bulgular
+    triggered: np.ndarray           # (N, P)
+    best_alt: np.ndarray            # (N, P) kullanılan alternatif set, -1 = yok
+    finding_score: np.ndarray       # (N, P)
+    distribution_score: np.ndarray  # (N, P)
+    clinical_modifier_score: np.ndarray  # (N, P)
+    penalty_score: np.ndarray       # (N, P)
+    final_score: np.ndarray         # (N, P)
+    order: np.ndarray               # (N, P) azalan skor sıralaması
+    primary: np.ndarray             # (N,) patern indeksi, -1 = yok
+    mdd_code: np.ndarray            # (N,) MDD_CODES indeksi
+
+    def __len__(self) -> int:
+        return len(self.primary)
+
+    @property
+    def mdd_recommended(self) -> np.ndarray:
+        return mdd_recommended(self.mdd_code)
+
+    @property
+    def primary_score(self) -> np.ndarray:
+        rows = np.arange(len(self.primary))
+        return np.where(self.primary >= 0, self.final_score[rows, self.order[:, 0]], 0.0)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vaka başına özet tablo (primer/ikincil patern, güven, MDD)."""
+        rs = self.ruleset
+        rows = np.arange(len(self.primary))
+        primary_score = self.primary_score
+        if self.order.shape[1] > 1:
+            second = np.where(self.primary >= 0, self.order[:, 1], -1)
+        else:
+            second = np.full(len(self.primary), -1)
+        second_score = np.where(second >= 0, self.final_score[rows, np.maximum(second, 0)], 0.0)
+        return pd.DataFrame({
+            "primary_pattern": pd.Categorical.from_codes(self.primary, categories=list(rs.pattern_keys)),
+            "primary_name": pd.Categorical.from_codes(self.primary, categories=list(rs.pattern_names)),
+            "primary_score": primary_score.round(1),
+            "confidence": pd.Categorical.from_codes(
+                np.where(self.primary >= 0, confidence_band(primary_score), -1),
+                categories=[level["label"] for _, level in CONFIDENCE_LEVELS],
+            ),
+            "second_pattern": pd.Categorical.from_codes(second, categories=list(rs.pattern_keys)),
+            "second_score": second_score.round(1),
+            "mdd_recommended": self.mdd_recommended,
+            "mdd_reason_code": pd.Categorical.from_codes(self.mdd_code, categories=list(MDD_CODES)),
+        })
+
+    def diagnostic_result(self, i: int) -> DiagnosticResult:
+        """i. vakanın sonucunu DiagnosticResult objesine çevir."""
+        rs = self.ruleset
+        selected = [k for k, on in zip(FINDING_KEYS, self.selected[i]) if on]
+        code = MDD_CODES[self.mdd_code[i]]
+        if not selected:
+            return DiagnosticResult(
+                primary_pattern=None,
+                ranked_patterns=[],
+                mdd_recommended=False,
+                mdd_reason=ILDDecisionEngine.format_mdd_reason(code, None, []),
+                selected_findings=[],
+                mdd_reason_code=code,
+            )
+        present = {k for k, on in zip(FINDING_KEYS, self.expanded[i]) if on}
+        ranked = []
+        for p in self.order[i]:
+            key = rs.pattern_keys[p]
+            pdef = rs.patterns[key]
+            if self.triggered[i, p]:
+                alt = self.best_alt[i, p]
+                if alt >= 0:
+                    alt_sets = pdef.get("alternative_required_sets", [])
+                    local = alt - int(np.flatnonzero(rs.alt_pattern == p)[0])
+                    matched_required = list(alt_sets[local])
+                else:
+                    matched_required = [f for f in pdef.get("required_findings", []) if f in present]
+                counted = set(matched_required) if alt >= 0 else set()
+                matched_supportive = [
+                    f for f in pdef.get("supportive_findings", [])
+                    if f in present and f not in counted
+                ]
+                matched_against = [f for f in pdef.get("against_findings", []) if f in present]
+            else:
+                matched_required, matched_supportive, matched_against = [], [], []
+            ranked.append(PatternResult(
+                pattern_key=key,
+                pattern_name=pdef["name"],
+                base_score=pdef.get("base_score", 50),
+                finding_score=float(self.finding_score[i, p]),
+                distribution_score=float(self.distribution_score[i, p]),
+                clinical_modifier_score=float(self.clinical_modifier_score[i, p]),
+                penalty_score=float(self.penalty_score[i, p]),
+                final_score=float(self.final_score[i, p]),
+                matched_required=matched_required,
+                matched_supportive=matched_supportive,
+                matched_against=matched_against,
+                associated_diagnoses=pdef.get("associated_diagnoses", []),
+            ))
+        primary = ranked[0] if self.primary[i] >= 0 else None
+        return DiagnosticResult(
+            primary_pattern=primary,
+            ranked_patterns=ranked,
+            mdd_recommended=bool(_MDD_FLAGS[self.mdd_code[i]]),
+            mdd_reason=ILDDecisionEngine.format_mdd_reason(code, primary, ranked),
+            selected_findings=selected,
+            mdd_reason_code=code,
+        )
+
+
+def mdd_recommended(mdd_code) -> np.ndarray:
+    """MDD_CODES indekslerini MDD önerisi bayraklarına çevir."""
+    return _MDD_FLAGS[mdd_code]
+
+
+# Eşiklerden bağımsız erken gerekçeler; diğer vakalarda -1
+_EARLY_MDD_CODES = ("no_findings", "no_primary", "against_findings")
+
+
+def mdd_reason_codes(
+    early: np.ndarray,
+    top_score: np.ndarray,
+    second_score: np.ndarray,
+    top_uip_definite: np.ndarray,
+    top_uip_probable: np.ndarray,
+    thresholds: Optional[Dict] = None,
+) -> np.ndarray:
+    """
+    _mdd_reason_code mantığının vektörize hali (aynı öncelik sırası).
+
+    Girdiler BatchDecisionEngine.mdd_inputs çıktısıdır. Eşik değerleri
+    dizi olabilir: (N, 1) girdiler ve (G,) eşiklerle (N, G) kod matrisi
+    üretilir (eşik taraması).
+
+    Returns:
+        MDD_CODES indeksleri (int8)
+    """
+    t = MDD_THRESHOLDS if thresholds is None else thresholds
+    conditions = [
+        early >= 0,
+        top_uip_definite & (top_score >= t["uip_definite_high"]),
+        ((top_score - second_score) < t["close_gap"]) & (second_score > t["close_second_min"]),
+        top_score < t["low_confidence"],
+        top_uip_probable,
+    ]
+    choices = [
+        early,
+        _MDD_CODE_INDEX["uip_definite_high"],
+        _MDD_CODE_INDEX["close_scores"],
+        _MDD_CODE_INDEX["low_confidence"],
+        _MDD_CODE_INDEX["uip_probable"],
+    ]
+    return np.select(conditions, choices, _MDD_CODE_INDEX["confident"]).astype(np.int8)
+
+
+def confidence_band(scores) -> np.ndarray:
+    """Skorları CONFIDENCE_LEVELS indeksine çevir (0 = en yüksek güven)."""
+    thresholds = np.array([t for t, _ in CONFIDENCE_LEVELS[:-1]], dtype=np.float64)
+    # thresholds azalan sırada: kaç eşiğin altında kalındığı = düzey indeksi
+    return (np.asarray(scores, dtype=np.float64)[:, None] < thresholds).sum(axis=1)
+
+
+# =============================================
+# MOTOR
+# =============================================
+class BatchDecisionEngine:
+    """
+    ILDDecisionEngine'in vektörize karşılığı.
+
+    Aynı girdiler için skorlar, sıralama ve MDD kararı
+    ILDDecisionEngine.analyze ile birebir aynıdır.
+    """
+
+    def __init__(self, ruleset: Optional[CompiledRuleset] = None):
+        self.ruleset = ruleset or compile_ruleset()
+        rs = self.ruleset
+        # Skorlama matrisleri (F, P) — sütun başına patern
+        self._required_t = rs.required.T
+        self._supportive_t = rs.supportive.T
+        self._against_t = rs.against.T
+        self._distribution_t = rs.distribution.T
+        self._alt_t = rs.alt_sets.T
+        self._cooc_t = rs.cooc_triggers.T
+        self._modifiers_t = rs.clinical_modifiers.T
+        idx = rs.pattern_index
+        self._uip_definite = idx.get("uip_definite", -1)
+        self._uip_probable = idx.get("uip_probable", -1)
+        self._count_matrix = None
+
+    def expand(self, X: np.ndarray) -> np.ndarray:
+        """Kompozit bulgulardan bileşenleri çıkar (bkz. _expand_findings)."""
+        X = np.asarray(X, dtype=bool)
+        return X | (X.astype(np.float64) @ self.ruleset.implications > 0)
+
+    def analyze(self, X: np.ndarray, C: np.ndarray) -> BatchResult:
+        """
+        Toplu analiz.
+
+        Args:
+            X: (N, F) seçilen bulgu matrisi
+            C: (N, K) klinik bağlam özellik matrisi
+
+        Returns:
+            BatchResult objesi
+        """
+        X = np.asarray(X, dtype=bool)
+        E = self.expand(X)
+        scores = self.score_counts(self.count_features(E), X.any(axis=1), C)
+        return BatchResult(ruleset=self.ruleset, selected=X, expanded=E, **scores)
+
+    @property
+    def count_matrix(self) -> np.ndarray:
+        """
+        (F, W) sayım matrisi: genişletilmiş bulgu satırı × matris = tüm
+        doğrusal sayımlar (required | supportive | against | distribution
+        | alternatif setler | birlikte-görülme tetikleyicileri).
+        """
+        if self._count_matrix is None:
+            self._count_matrix = np.hstack([
+                self._required_t, self._supportive_t, self._against_t,
+                self._distribution_t, self._alt_t, self._cooc_t,
+            ])
+        return self._count_matrix
+
+    def count_features(self, E: np.ndarray) -> np.ndarray:
+        """Genişletilmiş bulgu matrisinden (N, W) sayımlar."""
+        return np.asarray(E, dtype=np.float64) @ self.count_matrix
+
+    def score_counts(self, counts: np.ndarray, has_findings: np.ndarray, C: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Sayımlardan skorlar, sıralama ve MDD kodu (analyze'ın doğrusal
+        olmayan kısmı). C tek satır (1, K) ise tüm vakalara yayınlanır.
+
+        Returns:
+            BatchResult alanları (selected / expanded hariç)
+        """
+        rs = self.ruleset
+        n_patterns = len(rs.pattern_keys)
+        n_alt = len(rs.alt_len)
+        req_count, sup_count, against_count, dist_count = (
+            counts[:, i * n_patterns:(i + 1) * n_patterns] for i in range(4)
+        )
+        n = len(counts)
+
+        # En uzun tam eşleşen alternatif set (eşitlikte tanım sırası)
+        best_len = np.zeros((n, n_patterns))
+        best_overlap = np.zeros((n, n_patterns))
+        best_alt = np.full((n, n_patterns), -1, dtype=np.intp)
+        if n_alt:
+            alt_full = counts[:, 4 * n_patterns:4 * n_patterns + n_alt] == rs.alt_len
+            for a, p in enumerate(rs.alt_pattern):
+                take = alt_full[:, a] & (rs.alt_len[a] > best_len[:, p])
+                best_len[take, p] = rs.alt_len[a]
+                best_overlap[take, p] = rs.alt_supportive_overlap[a]
+                best_alt[take, p] = a
+
+        direct = req_count > 0
+        alt_used = ~direct & (best_len > 0)
+        triggered = direct | alt_used
+        best_alt[~alt_used] = -1
+
+        base = rs.base_score
+        req_ratio = req_count / np.maximum(rs.n_required, 1)
+        finding = np.where(
+            direct,
+            base * (0.6 + 0.4 * req_ratio),
+            base * (0.6 + 0.4 * 1.0) * 0.90,
+        )
+        weights = rs.scoring_weights
+        support_bonus = np.minimum(
+            np.where(alt_used, sup_count - best_overlap, sup_count) * weights["supportive_per_finding"],
+            weights["supportive_cap"],
+        )
+        finding = finding + support_bonus
+        distribution = np.where(dist_count > 0, float(weights["distribution_bonus"]), 0.0)
+        finding = finding + distribution
+        penalty = against_count * weights["against_per_finding"]
+        finding = finding - penalty
+        clinical = np.asarray(C, dtype=np.float64) @ self._modifiers_t
+        final = np.clip(finding + clinical, 0, 100)
+
+        # Tetiklenmeyen paternler
+        finding = np.where(triggered, finding, 0.0)
+        distribution = np.where(triggered, distribution, 0.0)
+        penalty = np.where(triggered, penalty, 0.0)
+        clinical = np.where(triggered, clinical, 0.0)
+        final = np.where(triggered, final, 0.0)
+
+        # Birlikte-görülme kuralları
+        if len(rs.cooc_size):
+            fired = (counts[:, 4 * n_patterns + n_alt:] == rs.cooc_size).astype(np.float64)
+            cooc = fired @ rs.cooc_modifiers
+            final = np.clip(final + cooc, 0, 100)
+            clinical = clinical + cooc
+
+        order = np.argsort(-final, axis=1, kind="stable")
+        rows = np.arange(n)
+        top = order[:, 0]
+        top_score = final[rows, top]
+        has_primary = has_findings & (top_score > 0)
+        primary = np.where(has_primary, top, -1)
+
+        inputs = self._mdd_inputs(has_findings, primary, order, final, against_count)
+        mdd_code = mdd_reason_codes(**inputs, thresholds=rs.mdd_thresholds)
+        return {
+            "triggered": triggered,
+            "best_alt": best_alt,
+            "finding_score": finding,
+            "distribution_score": distribution,
+            "clinical_modifier_score": clinical,
+            "penalty_score": penalty,
+            "final_score": final,
+            "order": order,
+            "primary": primary,
+            "mdd_code": mdd_code,
+        }
+
+    def mdd_inputs(self, counts: np.ndarray, has_findings: np.ndarray, scores: Dict) -> Dict[str, np.ndarray]:
+        """
+        MDD kararının eşiklerden bağımsız girdileri (mdd_reason_codes argümanları).
+
+        Args:
+            counts: count_features çıktısı
+            has_findings: (N,) bulgu seçilmiş mi
+            scores: score_counts çıktısı
+        """
+        n_patterns = len(self.ruleset.pattern_keys)
+        against_count = counts[:, 2 * n_patterns:3 * n_patterns]
+        return self._mdd_inputs(has_findings, scores["primary"], scores["order"], scores["final_score"], against_count)
+
+    def _mdd_inputs(self, has_findings, primary, order, final, against_count) -> Dict[str, np.ndarray]:
+        rows = np.arange(len(order))
+        top = order[:, 0]
+        if order.shape[1] > 1:
+            second_score = final[rows, order[:, 1]]
+        else:
+            second_score = np.full(len(order), -np.inf)
+        early = np.select(
+            [~has_findings, primary < 0, against_count[rows, top] > 0],
+            [_MDD_CODE_INDEX[c] for c in _EARLY_MDD_CODES],
+            -1,
+        ).astype(np.int8)
+        return {
+            "early": early,
+            "top_score": final[rows, top],
+            "second_score": second_score,
+            "top_uip_definite": top == self._uip_definite,
+            "top_uip_probable": top == self._uip_probable,
+        }
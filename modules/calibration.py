@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+Kural Seti Kalibrasyonu
+
+Patern base_score değerleri, klinik modifiyerler ve ortak skor
+ağırlıkları (SCORING_WEIGHTS) elle seçilmiş sayılardır. Bu modül aday
+parametre vektörlerini MDD ile doğrulanmış etiketli bir kohort üzerinde
+toplu motorla değerlendirir ve en iyi kural setini dışa aktarır.
+
+  - Parametre uzayı: Parameter listesi (tür, hedef, alt / üst sınır, adım)
+  - Arama: "grid" (tüm kombinasyonlar), "random" (adım ızgarasına
+    yuvarlanmış rastgele örnekler), "coordinate" (parametreler sırayla,
+    diğerleri sabitken ızgara boyunca iyileştirilir)
+  - Metrikler: primer patern doğruluğu ve ilk 3'te yer alma oranı
+    (toplam ve patern başına)
+
+Kalibre edilen parametreler sayımları etkilemez: bulgu genişletmesi ve
+doğrusal sayımlar kohort için bir kez hesaplanır, her aday yalnızca
+BatchDecisionEngine.score_counts adımını çalıştırır. Aynı bulgu + bağlam +
+etiket satırları tekilleştirilip ağırlıklandırılır. Adaylar süreç
+havuzunda paralel değerlendirilir.
+
+Kohort tablosu encode_case_frame biçimindedir; etiket sütunu
+(varsayılan "label") patern anahtarlarını içerir (eski anahtarlar
+2025 nomenklaturuna çevrilir).
+
+Dışa aktarılan paket ruleset_compare.load_ruleset ile yüklenebilir.
+"""
+
+import dataclasses
+import itertools
+import json
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.pattern_definitions import SCORING_WEIGHTS
+from modules.batch_engine import (
+    CONTEXT_FEATURES,
+    BatchDecisionEngine,
+    CompiledRuleset,
+    compile_ruleset,
+    encode_case_frame,
+)
+from modules.nomenclature import resolve_pattern_keys
+
+
+PARAMETER_KINDS = ("base_score", "clinical_modifier", "scoring_weight")
+SEARCH_METHODS = ("grid", "random", "coordinate")
+
+# Grid aramasında izin verilen en fazla kombinasyon
+MAX_GRID_SIZE = 200_000
+
+
+# =============================================
+# PARAMETRE UZAYI
+# =============================================
+@dataclass(frozen=True)
+class Parameter:
+    """
+    Kalibre edilen tek parametre.
+
+    kind:
+      - "base_score": target = patern anahtarı
+      - "clinical_modifier": target = patern anahtarı, feature = CONTEXT_FEATURES öğesi
+      - "scoring_weight": target = SCORING_WEIGHTS anahtarı
+    """
+    kind: str
+    target: str
+    low: float
+    high: float
+    step: float = 1.0
+    feature: Optional[str] = None
+
+    def __post_init__(self):
+        if self.kind not in PARAMETER_KINDS:
+            raise ValueError(f"Bilinmeyen parametre türü: {self.kind}")
+        if self.kind == "clinical_modifier" and self.feature not in CONTEXT_FEATURES:
+            raise ValueError(f"Bilinmeyen klinik özellik: {self.feature}")
+        if self.kind == "scoring_weight" and self.target not in SCORING_WEIGHTS:
+            raise ValueError(f"Bilinmeyen skor ağırlığı: {self.target}")
+        if self.step <= 0 or self.high < self.low:
+            raise ValueError(f"Geçersiz aralık: {self.label}")
+
+    @property
+    def label(self) -> str:
+        if self.kind == "clinical_modifier":
+            return f"{self.target}.{self.feature}"
+        if self.kind == "scoring_weight":
+            return f"weights.{self.target}"
+        return f"{self.target}.base_score"
+
+    @property
+    def grid(self) -> np.ndarray:
+        n = int(np.floor((self.high - self.low) / self.step + 1e-9)) + 1
+        return self.low + self.step * np.arange(n)
+
+    def snap(self, values: np.ndarray) -> np.ndarray:
+        """Değerleri aralığa kırp ve adım ızgarasına yuvarla."""
+        steps = np.round((np.clip(values, self.low, self.high) - self.low) / self.step)
+        return np.minimum(self.low + steps * self.step, self.grid[-1])
+
+
+def default_parameter_space(
+    ruleset: Optional[CompiledRuleset] = None,
+    kinds: Sequence[str] = PARAMETER_KINDS,
+    base_score_range: float = 15,
+    modifier_range: float = 5,
+) -> List[Parameter]:
+    """
+    Güncel değerler etrafında parametre uzayı.
+
+    base_score: ±base_score_range (5'lik adım, 0–100); klinik modifiyerler:
+    yalnızca tanımlı (sıfır olmayan) olanlar, ±modifier_range; skor
+    ağırlıkları: sabit makul aralıklar.
+    """
+    rs = ruleset or compile_ruleset()
+    space = []
+    if "base_score" in kinds:
+        for key, base in zip(rs.pattern_keys, rs.base_score):
+            space.append(Parameter(
+                "base_score", key,
+                low=max(0.0, base - base_score_range),
+                high=min(100.0, base + base_score_range),
+                step=5,
+            ))
+    if "clinical_modifier" in kinds:
+        for p, key in enumerate(rs.pattern_keys):
+            for k, feature in enumerate(CONTEXT_FEATURES):
+                value = rs.clinical_modifiers[p, k]
+                if value:
+                    space.append(Parameter(
+                        "clinical_modifier", key,
+                        low=value - modifier_range, high=value + modifier_range,
+                        step=max(1.0, modifier_range / 2), feature=feature,
+                    ))
+    if "scoring_weight" in kinds:
+        space += [
+            Parameter("scoring_weight", "supportive_per_finding", 1, 6),
+            Parameter("scoring_weight", "supportive_cap", 5, 25, step=5),
+            Parameter("scoring_weight", "distribution_bonus", 0, 10),
+            Parameter("scoring_weight", "against_per_finding", 2, 16, step=2),
+        ]
+    return space
+
+
+def current_values(space: Sequence[Parameter], ruleset: Optional[CompiledRuleset] = None) -> np.ndarray:
+    """Kural setindeki güncel parametre değerleri (uzay sırasında)."""
+    rs = ruleset or compile_ruleset()
+    index = rs.pattern_index
+    values = []
+    for param in space:
+        if param.kind == "base_score":
+            values.append(rs.base_score[index[param.target]])
+        elif param.kind == "clinical_modifier":
+            values.append(rs.clinical_modifiers[index[param.target], CONTEXT_FEATURES.index(param.feature)])
+        else:
+            values.append(rs.scoring_weights[param.target])
+    return np.array(values, dtype=np.float64)
+
+
+def _number(value: float):
+    """JSON / tanım sözlüğü için tam sayıları int olarak yaz."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def ruleset_overrides(space: Sequence[Parameter], vector: Sequence[float]) -> Dict:
+    """Parametre vektörü → merge_ruleset / load_ruleset değişiklik sözlüğü."""
+    overrides: Dict = {}
+    for param, value in zip(space, vector):
+        if param.kind == "scoring_weight":
+            overrides.setdefault("scoring_weights", {})[param.target] = _number(value)
+            continue
+        fields = overrides.setdefault("patterns", {}).setdefault(param.target, {})
+        if param.kind == "base_score":
+            fields["base_score"] = _number(value)
+        else:
+            fields.setdefault("clinical_modifiers", {})[param.feature] = _number(value)
+    return overrides
+
+
+def apply_parameters(
+    ruleset: CompiledRuleset,
+    space: Sequence[Parameter],
+    vector: Sequence[float],
+) -> CompiledRuleset:
+    """
+    Parametre vektörünü derlenmiş kural setine uygula (yeniden derlemeden).
+
+    Değişen paternlerin tanım sözlükleri de kopyalanıp güncellenir;
+    BatchResult.diagnostic_result tanımlardaki base_score'u okur.
+    """
+    base_score = ruleset.base_score.copy()
+    modifiers = ruleset.clinical_modifiers.copy()
+    weights = dict(ruleset.scoring_weights)
+    index = ruleset.pattern_index
+    for param, value in zip(space, vector):
+        if param.kind == "base_score":
+            base_score[index[param.target]] = value
+        elif param.kind == "clinical_modifier":
+            modifiers[index[param.target], CONTEXT_FEATURES.index(param.feature)] = value
+        else:
+            weights[param.target] = value
+
+    patterns = dict(ruleset.patterns)
+    for key, fields in ruleset_overrides(space, vector).get("patterns", {}).items():
+        pdef = dict(patterns[key])
+        if "base_score" in fields:
+            pdef["base_score"] = fields["base_score"]
+        if "clinical_modifiers" in fields:
+            pdef["clinical_modifiers"] = {**pdef.get("clinical_modifiers", {}), **fields["clinical_modifiers"]}
+        patterns[key] = pdef
+    return dataclasses.replace(
+        ruleset,
+        base_score=base_score,
+        clinical_modifiers=modifiers,
+        scoring_weights=weights,
+        patterns=patterns,
+    )
+
+
+# =============================================
+# DEĞERLENDİRME
+# =============================================
+@dataclass
+class CalibrationScore:
+    """Tek parametre vektörünün kohort metrikleri."""
+    accuracy: float                 # primer patern = etiket
+    top_k_recall: float             # etiket ilk k tetiklenen patern arasında
+    per_pattern: pd.DataFrame       # index = etiket paterni; cases, accuracy, top_k_recall
+
+    @property
+    def objective(self) -> Tuple[float, float]:
+        """Karşılaştırma anahtarı: önce doğruluk, eşitlikte top-k."""
+        return (round(self.accuracy, 12), round(self.top_k_recall, 12))
+
+
+class _CohortScorer:
+    """Sayımları bir kez hesaplanmış kohortta aday vektörleri skorlar."""
+
+    def __init__(self, ruleset, space, counts, has_findings, C, labels, weights, top_k):
+        self.ruleset = ruleset
+        self.space = space
+        self.counts = counts
+        self.has_findings = has_findings
+        self.C = C
+        self.labels = labels
+        self.weights = weights
+        self.top_k = top_k
+        self.n_patterns = len(ruleset.pattern_keys)
+
+    def score(self, vector: np.ndarray):
+        engine = BatchDecisionEngine(apply_parameters(self.ruleset, self.space, vector))
+        result = engine.score_counts(self.counts, self.has_findings, self.C)
+        rows = np.arange(len(self.labels))
+        hit = result["primary"] == self.labels
+        # Etiketin sıradaki yeri; tetiklenmemiş patern ilk k'ya sayılmaz
+        rank = np.argmax(result["order"] == self.labels[:, None], axis=1)
+        in_top = (rank < self.top_k) & (result["final_score"][rows, self.labels] > 0)
+        in_top &= result["primary"] >= 0
+        return self._by_label(hit), self._by_label(in_top)
+
+    def _by_label(self, mask: np.ndarray) -> np.ndarray:
+        return np.bincount(self.labels, weights=self.weights * mask, minlength=self.n_patterns)
+
+
+_worker_scorer: Optional[_CohortScorer] = None
+
+
+def _init_worker(*args) -> None:
+    global _worker_scorer
+    _worker_scorer = _CohortScorer(*args)
+
+
+def _score_in_worker(vector: np.ndarray):
+    return _worker_scorer.score(vector)
+
+
+# =============================================
+# KALİBRASYON
+# =============================================
+@dataclass
+class CalibrationResult:
+    """Arama sonucu; best_vector space sırasındadır."""
+    method: str
+    space: List[Parameter]
+    baseline_vector: np.ndarray
+    baseline: CalibrationScore
+    best_vector: np.ndarray
+    best: CalibrationScore
+    history: pd.DataFrame           # değerlendirilen vektörler + accuracy / top_k_recall
+    evaluations: int
+    seconds: float
+
+    def parameters(self) -> Dict[str, float]:
+        return {p.label: _number(v) for p, v in zip(self.space, self.best_vector)}
+
+    def changed_parameters(self) -> pd.DataFrame:
+        """Güncel değerden farklı olan parametreler."""
+        rows = [
+            {"parameter": p.label, "current": _number(a), "calibrated": _number(b)}
+            for p, a, b in zip(self.space, self.baseline_vector, self.best_vector)
+            if a != b
+        ]
+        return pd.DataFrame(rows, columns=["parameter", "current", "calibrated"])
+
+    def overrides(self) -> Dict:
+        return ruleset_overrides(self.space, self.best_vector)
+
+    def export(self, path: str) -> None:
+        """En iyi kural setini load_ruleset biçiminde JSON paketine yaz."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.overrides(), f, ensure_ascii=False, indent=2)
+
+
+class RulesetCalibrator:
+    """
+    Etiketli kohortta parametre araması.
+
+    Args:
+        cohort: encode_case_frame biçiminde vaka tablosu + etiket sütunu
+        space: Kalibre edilecek parametreler (varsayılan default_parameter_space)
+        ruleset: Başlangıç kural seti (varsayılan güncel tanımlar)
+        label_column: Doğrulanmış patern anahtarı sütunu
+        top_k: Top-k recall için k
+    """
+
+    def __init__(
+        self,
+        cohort: pd.DataFrame,
+        space: Optional[Sequence[Parameter]] = None,
+        ruleset: Optional[CompiledRuleset] = None,
+        label_column: str = "label",
+        top_k: int = 3,
+    ):
+        engine = BatchDecisionEngine(ruleset)
+        self.ruleset = engine.ruleset
+        self.space = list(space) if space is not None else default_parameter_space(self.ruleset)
+        self.top_k = top_k
+        self.baseline_vector = current_values(self.space, self.ruleset)
+
+        index = self.ruleset.pattern_index
+        raw = resolve_pattern_keys(cohort[label_column].astype(object))
+        unknown = sorted(set(raw) - set(index))
+        if unknown:
+            raise ValueError(f"Bilinmeyen etiket paterni: {unknown}")
+        labels = raw.map(index).to_numpy(dtype=np.intp)
+
+        # Aynı bulgu + bağlam + etiket satırları tek satırda ağırlıklandırılır
+        X, C = encode_case_frame(cohort)
+        rows = np.hstack([X, C.astype(bool), labels[:, None]]).astype(np.int16)
+        unique, counts = np.unique(rows, axis=0, return_counts=True)
+        F = X.shape[1]
+        X_u = unique[:, :F].astype(bool)
+        self.n_cases = len(cohort)
+        self.n_unique = len(unique)
+        self._scorer_args = (
+            self.ruleset,
+            self.space,
+            engine.count_features(engine.expand(X_u)),
+            X_u.any(axis=1),
+            unique[:, F:-1].astype(bool),
+            unique[:, -1].astype(np.intp),
+            counts.astype(np.float64),
+            top_k,
+        )
+        self._label_weights = np.bincount(
+            unique[:, -1].astype(np.intp), weights=counts, minlength=len(self.ruleset.pattern_keys)
+        )
+
+    def _summarize(self, hits: np.ndarray, in_top: np.ndarray) -> CalibrationScore:
+        total = self._label_weights.sum()
+        present = self._label_weights > 0
+        cases = self._label_weights[present]
+        per_pattern = pd.DataFrame(
+            {
+                "cases": cases.astype(np.int64),
+                "accuracy": hits[present] / cases,
+                "top_k_recall": in_top[present] / cases,
+            },
+            index=[k for k, p in zip(self.ruleset.pattern_keys, present) if p],
+        )
+        return CalibrationScore(
+            accuracy=float(hits.sum() / total) if total else 0.0,
+            top_k_recall=float(in_top.sum() / total) if total else 0.0,
+            per_pattern=per_pattern,
+        )
+
+    def evaluate(self, vector: Optional[Sequence[float]] = None) -> CalibrationScore:
+        """Tek vektörü değerlendir (varsayılan güncel değerler)."""
+        vector = self.baseline_vector if vector is None else np.asarray(vector, dtype=np.float64)
+        return self._summarize(*_CohortScorer(*self._scorer_args).score(vector))
+
+    # --- Aday üretimi ---
+    def _grid_candidates(self) -> np.ndarray:
+        grids = [p.grid for p in self.space]
+        size = int(np.prod([len(g) for g in grids], dtype=np.float64))
+        if size > MAX_GRID_SIZE:
+            raise ValueError(
+                f"Grid çok büyük ({size:,} kombinasyon > {MAX_GRID_SIZE:,}); "
+                "parametre sayısını azaltın veya random / coordinate arama kullanın."
+            )
+        return np.array(list(itertools.product(*grids)), dtype=np.float64).reshape(-1, len(self.space))
+
+    def _random_candidates(self, n_samples: int, seed: int) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        columns = [p.snap(rng.uniform(p.low, p.high, n_samples)) for p in self.space]
+        return np.column_stack(columns) if columns else np.zeros((n_samples, 0))
+
+    def search(
+        self,
+        method: str = "coordinate",
+        n_samples: int = 500,
+        rounds: int = 3,
+        seed: int = 0,
+        processes: Optional[int] = None,
+    ) -> CalibrationResult:
+        """
+        Parametre araması.
+
+        Args:
+            method: "grid", "random" veya "coordinate"
+            n_samples: random aramada örnek sayısı
+            rounds: coordinate aramada en fazla tur (iyileşme yoksa durur)
+            seed: random arama tohumu
+            processes: Süreç sayısı (varsayılan CPU sayısı); 1 = aynı süreçte
+
+        Returns:
+            CalibrationResult (güncel değerler her zaman aday olarak dahil)
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Bilinmeyen arama yöntemi: {method}")
+        start = time.perf_counter()
+        history_vectors, history_scores = [], []
+
+        if processes == 1:
+            scorer, pool = _CohortScorer(*self._scorer_args), None
+        else:
+            scorer, pool = None, Pool(processes, initializer=_init_worker, initargs=self._scorer_args)
+
+        def evaluate_many(vectors: np.ndarray) -> List[CalibrationScore]:
+            if pool is None:
+                raw = [scorer.score(v) for v in vectors]
+            else:
+                raw = pool.map(_score_in_worker, list(vectors), chunksize=8)
+            scores = [self._summarize(*r) for r in raw]
+            history_vectors.extend(vectors)
+            history_scores.extend(scores)
+            return scores
+
+        try:
+            best_vector = self.baseline_vector.copy()
+            baseline = best = evaluate_many(best_vector[None, :])[0]
+            if method == "coordinate":
+                for _ in range(rounds):
+                    improved = False
+                    for j, param in enumerate(self.space):
+                        candidates = np.repeat(best_vector[None, :], len(param.grid), axis=0)
+                        candidates[:, j] = param.grid
+                        candidates = candidates[param.grid != best_vector[j]]
+                        if not len(candidates):
+                            continue
+                        scores = evaluate_many(candidates)
+                        i = max(range(len(scores)), key=lambda i: scores[i].objective)
+                        if scores[i].objective > best.objective:
+                            best, best_vector, improved = scores[i], candidates[i].copy(), True
+                    if not improved:
+                        break
+            else:
+                candidates = (
+                    self._grid_candidates() if method == "grid"
+                    else self._random_candidates(n_samples, seed)
+                )
+                scores = evaluate_many(candidates)
+                for vector, score in zip(candidates, scores):
+                    if score.objective > best.objective:
+                        best, best_vector = score, vector.copy()
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        history = pd.DataFrame(np.array(history_vectors).reshape(-1, len(self.space)),
+                               columns=[p.label for p in self.space])
+        history["accuracy"] = [s.accuracy for s in history_scores]
+        history[f"top_{self.top_k}_recall"] = [s.top_k_recall for s in history_scores]
+        return CalibrationResult(
+            method=method,
+            space=self.space,
+            baseline_vector=self.baseline_vector,
+            baseline=baseline,
+            best_vector=best_vector,
+            best=best,
+            history=history,
+            evaluations=len(history_scores),
+            seconds=time.perf_counter() - start,
+        )
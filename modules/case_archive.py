@@ -0,0 +1,693 @@
+# -*- coding: utf-8 -*-
+"""
+Yerel Vaka Arşivi (SQLite)
+
+Kaydedilen her analiz ham kayıt olarak saklanır ve aynı işlemde
+ön-hesaplanmış özet tablolarına (materialized view) artımlı olarak
+eklenir. Kohort paneli yalnızca bu küçük özet tablolarını okur;
+ham kayıtlar üzerinde yeniden toplama yapılmaz.
+
+Özet tabloları (dilim: CTD × maruziyet × yaş grubu):
+  - agg_pattern: primer patern × güven düzeyi → vaka sayısı, MDD sayısı, skor toplamı
+  - agg_ila: ILA kategorisi × risk düzeyi → vaka sayısı
+
+Hasta bazlı tetkik geçmişi (studies) hasta / protokol numarası ile
+tutulur; (patient_id, study_date, id) indeksi sayesinde önceki tetkik
+milyonlarca kayıtta da tek B-ağacı aramasıyla (O(log n)) bulunur.
+Tetkik sonuçları diskte uzun süre kalır: bulgu ve patern anahtarları
+metin olarak, sürümlü bir JSON kaydında tutulur (taksonomi / kural seti
+sırası değişse de eski tetkikler doğru çözülür).
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from config.findings_taxonomy import FINDING_KEYS, ILA_FINDING_KEYS, SEVERITY_OPTIONS, TAXONOMY_VERSION
+from config.pattern_definitions import RULESET_VERSION
+from modules.batch_engine import confidence_band
+from modules.decision_engine import DiagnosticResult, PatternResult
+from modules.ila_classifier import ILAResult
+from modules.nomenclature import resolve_pattern_key, resolve_pattern_keys
+from modules.state_codec import (
+    decode_diagnostic_result,
+    decode_findings,
+    decode_ila_result,
+    encode_findings,
+    encode_ila_findings,
+)
+
+
+DEFAULT_ARCHIVE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "ild_archive.sqlite3",
+)
+
+# Yaş grupları: (alt sınır, etiket) — artan sırada
+AGE_BANDS = [
+    (0, "<50"),
+    (50, "50-59"),
+    (60, "60-69"),
+    (70, "70-79"),
+    (80, "≥80"),
+]
+
+# Şema göçleri: indeks + 1 = PRAGMA user_version
+_MIGRATIONS = [
+    """
+    CREATE TABLE analyses (
+        id INTEGER PRIMARY KEY,
+        stored_at TEXT NOT NULL,
+        age INTEGER,
+        sex TEXT,
+        ctd TEXT NOT NULL,
+        exposure TEXT NOT NULL,
+        age_band TEXT NOT NULL,
+        finding_mask INTEGER NOT NULL,
+        primary_pattern TEXT NOT NULL,
+        primary_score REAL NOT NULL,
+        confidence_band INTEGER NOT NULL,
+        mdd_recommended INTEGER NOT NULL,
+        mdd_reason_code TEXT NOT NULL,
+        ila_category TEXT NOT NULL,
+        ila_risk TEXT NOT NULL,
+        ila_extent REAL
+    );
+    CREATE TABLE agg_pattern (
+        ctd TEXT NOT NULL,
+        exposure TEXT NOT NULL,
+        age_band TEXT NOT NULL,
+        primary_pattern TEXT NOT NULL,
+        confidence_band INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        mdd_n INTEGER NOT NULL,
+        score_sum REAL NOT NULL,
+        PRIMARY KEY (ctd, exposure, age_band, primary_pattern, confidence_band)
+    ) WITHOUT ROWID;
+    CREATE TABLE agg_ila (
+        ctd TEXT NOT NULL,
+        exposure TEXT NOT NULL,
+        age_band TEXT NOT NULL,
+        ila_category TEXT NOT NULL,
+        ila_risk TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (ctd, exposure, age_band, ila_category, ila_risk)
+    ) WITHOUT ROWID;
+    """,
+    """
+    CREATE TABLE studies (
+        id INTEGER PRIMARY KEY,
+        patient_id TEXT NOT NULL,
+        study_date TEXT NOT NULL,
+        stored_at TEXT NOT NULL,
+        finding_mask INTEGER NOT NULL,
+        ila_finding_mask INTEGER NOT NULL,
+        primary_pattern TEXT NOT NULL,
+        primary_score REAL NOT NULL,
+        extent TEXT,
+        progression TEXT,
+        diagnostic_record BLOB,
+        ila_record BLOB
+    );
+    CREATE INDEX idx_studies_patient_date ON studies (patient_id, study_date, id);
+    """,
+    """
+    ALTER TABLE analyses ADD COLUMN final_diagnosis TEXT;
+    """,
+    # Tetkik sonuçları: paketli bayt kayıtları → sürümlü JSON kaydı
+    lambda conn: _migrate_study_records(conn),
+]
+
+_AGG_PATTERN_UPSERT = """
+    INSERT INTO agg_pattern
+        (ctd, exposure, age_band, primary_pattern, confidence_band, n, mdd_n, score_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (ctd, exposure, age_band, primary_pattern, confidence_band) DO UPDATE SET
+        n = n + excluded.n,
+        mdd_n = mdd_n + excluded.mdd_n,
+        score_sum = score_sum + excluded.score_sum
+"""
+_AGG_ILA_UPSERT = """
+    INSERT INTO agg_ila (ctd, exposure, age_band, ila_category, ila_risk, n)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (ctd, exposure, age_band, ila_category, ila_risk) DO UPDATE SET
+        n = n + excluded.n
+"""
+
+_ANALYSIS_COLUMNS = (
+    "stored_at", "age", "sex", "ctd", "exposure", "age_band", "finding_mask",
+    "primary_pattern", "primary_score", "confidence_band", "mdd_recommended",
+    "mdd_reason_code", "ila_category", "ila_risk", "ila_extent", "final_diagnosis",
+)
+_SLICES = ("ctd", "exposure", "age_band")
+
+_STUDY_COLUMNS = (
+    "id", "patient_id", "study_date", "primary_pattern", "primary_score",
+    "extent", "progression", "record",
+)
+
+# Tetkik kaydı biçimi (studies.record JSON'undaki "format")
+STUDY_RECORD_FORMAT = 1
+# Sürümsüz bayt kayıtlarının yazıldığı (kural seti, taksonomi) sürümleri
+_LEGACY_STUDY_VERSIONS = (1, 1)
+
+# SEVERITY_OPTIONS["progression"] seçenekleri: ilk, stabil, progresif, regresif
+_PROGRESSION_OPTIONS = SEVERITY_OPTIONS["progression"]["options"]
+
+
+def age_band(age) -> np.ndarray:
+    """Yaşları AGE_BANDS etiketlerine çevir."""
+    edges = np.array([lower for lower, _ in AGE_BANDS[1:]], dtype=np.float64)
+    labels = np.array([label for _, label in AGE_BANDS], dtype=object)
+    return labels[np.searchsorted(edges, np.asarray(age, dtype=np.float64), side="right")]
+
+
+# =============================================
+# TETKİK KAYDI (JSON)
+# =============================================
+def _diagnostic_dict(result: Optional[DiagnosticResult]) -> Optional[Dict]:
+    if result is None:
+        return None
+    return {
+        "has_primary": result.primary_pattern is not None,
+        "ranked_patterns": [asdict(p) for p in result.ranked_patterns],
+        "mdd_recommended": result.mdd_recommended,
+        "mdd_reason": result.mdd_reason,
+        "mdd_reason_code": result.mdd_reason_code,
+        "selected_findings": list(result.selected_findings),
+    }
+
+
+def _diagnostic_from_dict(data: Optional[Dict]) -> Optional[DiagnosticResult]:
+    if data is None:
+        return None
+    ranked = [
+        PatternResult(**{**p, "pattern_key": resolve_pattern_key(p["pattern_key"])})
+        for p in data["ranked_patterns"]
+    ]
+    return DiagnosticResult(
+        primary_pattern=ranked[0] if data["has_primary"] and ranked else None,
+        ranked_patterns=ranked,
+        mdd_recommended=data["mdd_recommended"],
+        mdd_reason=data["mdd_reason"],
+        selected_findings=data["selected_findings"],
+        mdd_reason_code=data["mdd_reason_code"],
+    )
+
+
+def encode_study_record(
+    findings: Sequence[str],
+    diagnostic_result: Optional[DiagnosticResult],
+    ila_result: Optional[ILAResult],
+) -> str:
+    """Tetkik sonucunu sürümlü JSON kaydına çevir (anahtarlar metin olarak)."""
+    return json.dumps({
+        "format": STUDY_RECORD_FORMAT,
+        "ruleset_version": RULESET_VERSION,
+        "taxonomy_version": TAXONOMY_VERSION,
+        "findings": list(findings),
+        "ila_findings": list(ila_result.selected_findings) if ila_result else [],
+        "diagnostic_result": _diagnostic_dict(diagnostic_result),
+        "ila_result": asdict(ila_result) if ila_result else None,
+    }, ensure_ascii=False)
+
+
+def decode_study_record(record: str) -> Dict:
+    """
+    JSON tetkik kaydını çöz.
+
+    Raises:
+        ValueError: Kayıt biçimi desteklenmiyorsa
+    """
+    data = json.loads(record)
+    if data.get("format") != STUDY_RECORD_FORMAT:
+        raise ValueError(f"Desteklenmeyen tetkik kaydı biçimi: {data.get('format')}")
+    return data
+
+
+def _migrate_study_records(conn: sqlite3.Connection) -> None:
+    """
+    Sürümsüz bayt kayıtlarını (bulgu maskeleri, patern / MDD indeksleri)
+    JSON kaydına çevir ve eski sütunları kaldır.
+
+    Bayt kayıtları yalnızca kural seti v1 / taksonomi v1 sırasıyla
+    yazılmıştır; sıra değiştikten sonra çözülemezler.
+    """
+    conn.execute("ALTER TABLE studies ADD COLUMN record TEXT")
+    rows = conn.execute(
+        "SELECT id, finding_mask, diagnostic_record, ila_record FROM studies"
+    ).fetchall()
+    if rows and (RULESET_VERSION, TAXONOMY_VERSION) != _LEGACY_STUDY_VERSIONS:
+        raise ValueError(
+            "Arşivde sürümsüz tetkik kayıtları var; bunlar yalnızca kural seti "
+            f"v{_LEGACY_STUDY_VERSIONS[0]} / taksonomi v{_LEGACY_STUDY_VERSIONS[1]} "
+            "ile çevrilebilir."
+        )
+    conn.executemany(
+        "UPDATE studies SET record = ? WHERE id = ?",
+        [
+            (encode_study_record(
+                decode_findings(finding_mask),
+                decode_diagnostic_result(diagnostic_record),
+                decode_ila_result(ila_record),
+            ), study_id)
+            for study_id, finding_mask, diagnostic_record, ila_record in rows
+        ],
+    )
+    for column in ("finding_mask", "ila_finding_mask", "diagnostic_record", "ila_record"):
+        conn.execute(f"ALTER TABLE studies DROP COLUMN {column}")
+
+
+@dataclass
+class StudyRecord:
+    """Hastanın arşivlenmiş tek bir tetkiki."""
+    id: int
+    patient_id: str
+    study_date: str
+    primary_pattern: str
+    primary_score: float
+    extent: Optional[str]
+    progression: Optional[str]
+    record: str = field(repr=False)
+
+    def __post_init__(self):
+        # 2025 öncesi kayıtlar eski patern anahtarlarını taşıyabilir
+        self.primary_pattern = resolve_pattern_key(self.primary_pattern)
+        self._data = decode_study_record(self.record)
+
+    @property
+    def findings(self) -> List[str]:
+        """Güncel taksonomide bulunan bulgular (taksonomi sırasında)."""
+        stored = set(self._data["findings"])
+        return [key for key in FINDING_KEYS if key in stored]
+
+    @property
+    def finding_mask(self) -> int:
+        return encode_findings(self.findings)
+
+    @property
+    def ila_finding_mask(self) -> int:
+        return encode_ila_findings(key for key in self._data["ila_findings"] if key in ILA_FINDING_KEYS)
+
+    @property
+    def diagnostic_result(self) -> Optional[DiagnosticResult]:
+        return _diagnostic_from_dict(self._data["diagnostic_result"])
+
+    @property
+    def ila_result(self) -> Optional[ILAResult]:
+        data = self._data["ila_result"]
+        return ILAResult(**data) if data else None
+
+
+@dataclass
+class StudyDelta:
+    """Güncel tetkikin önceki tetkikle karşılaştırması."""
+    prior: StudyRecord
+    new_findings: List[str]
+    resolved_findings: List[str]
+    primary_changed: bool
+    score_delta: float      # güncel primer skor − önceki primer skor
+
+    @property
+    def suggested_progression(self) -> str:
+        """Bulgu farkına göre önerilen 'Değişim durumu' seçeneği."""
+        if self.new_findings:
+            return _PROGRESSION_OPTIONS[2]
+        if self.resolved_findings:
+            return _PROGRESSION_OPTIONS[3]
+        return _PROGRESSION_OPTIONS[1]
+
+
+def study_delta(
+    prior: StudyRecord,
+    finding_mask: int,
+    diagnostic_result: Optional[DiagnosticResult] = None,
+) -> StudyDelta:
+    """Güncel bulgu maskesi / analiz sonucunu önceki tetkikle karşılaştır."""
+    primary = diagnostic_result.primary_pattern if diagnostic_result else None
+    return StudyDelta(
+        prior=prior,
+        new_findings=decode_findings(finding_mask & ~prior.finding_mask),
+        resolved_findings=decode_findings(prior.finding_mask & ~finding_mask),
+        primary_changed=bool(primary) and primary.pattern_key != prior.primary_pattern,
+        score_delta=(primary.final_score if primary else 0.0) - prior.primary_score,
+    )
+
+
+class CaseArchive:
+    """
+    SQLite tabanlı vaka arşivi.
+
+    Her işlem kendi bağlantısını açar; Streamlit oturumları (thread'ler)
+    arasında güvenle paylaşılabilir.
+    """
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._memory_conn = sqlite3.connect(path) if path == ":memory:" else None
+        with self._connect() as conn:
+            self._migrate(conn)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = self._memory_conn or sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            if conn is not self._memory_conn:
+                conn.close()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            conn.execute("PRAGMA journal_mode=WAL")
+        for i, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+            if callable(script):
+                script(conn)
+            else:
+                conn.executescript(script)
+            conn.execute(f"PRAGMA user_version = {i}")
+
+    # =============================================
+    # KAYIT
+    # =============================================
+    def store_analysis(
+        self,
+        clinical_context: Dict,
+        finding_mask: int,
+        diagnostic_result,
+        ila_result=None,
+        final_diagnosis: Optional[str] = None,
+    ) -> int:
+        """
+        Tek bir analizi arşive kaydet ve özet tablolarını güncelle.
+
+        final_diagnosis: MDD / patoloji sonrası kesin tanı (biliniyorsa)
+
+        Returns:
+            Kaydın arşiv kimliği
+        """
+        primary = diagnostic_result.primary_pattern if diagnostic_result else None
+        score = primary.final_score if primary else 0.0
+        row = {
+            "age": clinical_context.get("age", 55),
+            "sex": clinical_context.get("sex", "Erkek"),
+            "ctd": clinical_context.get("ctd", "Yok"),
+            "exposure": clinical_context.get("exposure", "Yok"),
+            "finding_mask": finding_mask,
+            "primary_pattern": primary.pattern_key if primary else "",
+            "primary_score": score,
+            "confidence_band": int(confidence_band([score])[0]) if primary else -1,
+            "mdd_recommended": bool(diagnostic_result and diagnostic_result.mdd_recommended),
+            "mdd_reason_code": diagnostic_result.mdd_reason_code if diagnostic_result else "no_findings",
+            "ila_category": ila_result.category if ila_result else "none",
+            "ila_risk": ila_result.risk_level if ila_result and ila_result.ila_present else "",
+            "ila_extent": ila_result.extent_percent if ila_result else None,
+            "final_diagnosis": final_diagnosis or None,
+        }
+        return self.store_frame(pd.DataFrame([row]))[0]
+
+    def store_frame(self, frame: pd.DataFrame) -> List[int]:
+        """
+        Analiz tablosunu toplu olarak arşive kaydet.
+
+        Beklenen sütunlar: age, sex, ctd, exposure, finding_mask,
+        primary_pattern, primary_score, confidence_band, mdd_recommended,
+        mdd_reason_code, ila_category, ila_risk, ila_extent; isteğe bağlı
+        final_diagnosis. Özet tabloları kayıtlarla aynı işlemde artımlı güncellenir.
+
+        Returns:
+            Eklenen kayıtların arşiv kimlikleri
+        """
+        if frame.empty:
+            return []
+        rows = frame.copy()
+        rows["stored_at"] = datetime.now().isoformat(timespec="seconds")
+        rows["age_band"] = age_band(rows["age"])
+        rows["mdd_recommended"] = rows["mdd_recommended"].astype(int)
+        if "final_diagnosis" not in rows.columns:
+            rows["final_diagnosis"] = None
+        rows = rows[list(_ANALYSIS_COLUMNS)].astype(object)
+        rows = rows.where(rows.notna(), None)
+
+        pattern_agg = (
+            frame.assign(age_band=rows["age_band"].to_numpy(), mdd=frame["mdd_recommended"].astype(int))
+            .groupby(list(_SLICES) + ["primary_pattern", "confidence_band"], observed=True)
+            .agg(n=("mdd", "size"), mdd_n=("mdd", "sum"), score_sum=("primary_score", "sum"))
+            .reset_index()
+        )
+        ila_agg = (
+            frame.assign(age_band=rows["age_band"].to_numpy())
+            .groupby(list(_SLICES) + ["ila_category", "ila_risk"], observed=True)
+            .size().reset_index(name="n")
+        )
+
+        placeholders = ", ".join("?" * len(_ANALYSIS_COLUMNS))
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT INTO analyses ({', '.join(_ANALYSIS_COLUMNS)}) VALUES ({placeholders})",
+                rows.itertuples(index=False, name=None),
+            )
+            # Yazma kilidi işlem sonuna kadar tutulur → kimlikler ardışıktır
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            conn.executemany(_AGG_PATTERN_UPSERT, _python_rows(pattern_agg))
+            conn.executemany(_AGG_ILA_UPSERT, _python_rows(ila_agg))
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+
+    def store_batch_results(self, results: pd.DataFrame) -> List[int]:
+        """
+        Toplu analiz tablosunu (BatchResult.to_frame + bağlam sütunları
+        age, sex, ctd, exposure, finding_mask) arşive kaydet.
+        """
+        frame = results.assign(
+            primary_pattern=results["primary_pattern"].astype(object).fillna(""),
+            confidence_band=results["confidence"].cat.codes.astype(int),
+            mdd_reason_code=results["mdd_reason_code"].astype(str),
+            ila_category="none",
+            ila_risk="",
+            ila_extent=None,
+        )
+        return self.store_frame(frame)
+
+    def set_final_diagnosis(self, analysis_id: int, final_diagnosis: Optional[str]) -> bool:
+        """
+        Kayıtlı analize sonradan kesin tanı ekle / güncelle.
+
+        Returns:
+            Analiz arşivde bulunduysa True
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE analyses SET final_diagnosis = ? WHERE id = ?",
+                (final_diagnosis or None, int(analysis_id)),
+            )
+        return cursor.rowcount > 0
+
+    def index_rows(self, after_id: int = 0) -> pd.DataFrame:
+        """
+        Benzer vaka indeksi için analiz satırları (kimliği after_id'den büyük olanlar).
+
+        Sütunlar: id, finding_mask, ctd, exposure, primary_pattern,
+        primary_score, final_diagnosis.
+        """
+        with self._connect() as conn:
+            return _resolve_patterns(pd.read_sql_query(
+                "SELECT id, finding_mask, ctd, exposure, primary_pattern, primary_score, final_diagnosis "
+                "FROM analyses WHERE id > ? ORDER BY id",
+                conn,
+                params=(after_id,),
+            ))
+
+    def iter_cases(self, chunk_size: int = 200_000) -> Iterator[pd.DataFrame]:
+        """
+        Tüm analizleri kimlik sırasında parça parça oku (yeniden skorlama için).
+
+        Sütunlar: id, finding_mask, age, sex, ctd, exposure, primary_pattern,
+        mdd_recommended. Parçalar kimlik aralığıyla (id > son kimlik) alınır;
+        büyük arşivlerde OFFSET taraması yapılmaz.
+        """
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                chunk = pd.read_sql_query(
+                    "SELECT id, finding_mask, age, sex, ctd, exposure, primary_pattern, mdd_recommended "
+                    "FROM analyses WHERE id > ? ORDER BY id LIMIT ?",
+                    conn,
+                    params=(last_id, chunk_size),
+                )
+            if chunk.empty:
+                return
+            yield _resolve_patterns(chunk)
+            last_id = int(chunk["id"].iloc[-1])
+
+    def final_diagnoses(self, analysis_ids: Sequence[int]) -> Dict[int, Optional[str]]:
+        """Verilen analizlerin güncel kesin tanıları."""
+        if not analysis_ids:
+            return {}
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, final_diagnosis FROM analyses WHERE id IN ({', '.join('?' * len(analysis_ids))})",
+                [int(i) for i in analysis_ids],
+            ).fetchall()
+        return dict(rows)
+
+    # =============================================
+    # TETKİK GEÇMİŞİ
+    # =============================================
+    def store_study(
+        self,
+        patient_id: str,
+        study_date: Union[date, str],
+        finding_mask: int,
+        diagnostic_result: Optional[DiagnosticResult],
+        ila_result: Optional[ILAResult] = None,
+        extent: Optional[str] = None,
+        progression: Optional[str] = None,
+    ) -> int:
+        """
+        Hastanın bir tetkikini geçmişe ekle.
+
+        Returns:
+            Tetkikin arşiv kimliği
+        """
+        primary = diagnostic_result.primary_pattern if diagnostic_result else None
+        row = {
+            "patient_id": patient_id.strip(),
+            "study_date": str(study_date),
+            "stored_at": datetime.now().isoformat(timespec="seconds"),
+            "primary_pattern": primary.pattern_key if primary else "",
+            "primary_score": primary.final_score if primary else 0.0,
+            "extent": extent,
+            "progression": progression,
+            "record": encode_study_record(decode_findings(finding_mask), diagnostic_result, ila_result),
+        }
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO studies ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                tuple(row.values()),
+            )
+            return cursor.lastrowid
+
+    def prior_study(
+        self,
+        patient_id: str,
+        before: Optional[Union[date, str]] = None,
+    ) -> Optional[StudyRecord]:
+        """
+        Hastanın verilen tarihten önceki son tetkiki (tarih verilmezse en son tetkik).
+
+        idx_studies_patient_date üzerinde ters yönde tek arama yapılır.
+        """
+        sql = f"SELECT {', '.join(_STUDY_COLUMNS)} FROM studies WHERE patient_id = ?"
+        params = [patient_id.strip()]
+        if before is not None:
+            sql += " AND study_date < ?"
+            params.append(str(before))
+        sql += " ORDER BY study_date DESC, id DESC LIMIT 1"
+        with self._connect() as conn:
+            row = conn.execute(sql, params).fetchone()
+        return StudyRecord(*row) if row else None
+
+    def study_history(self, patient_id: str) -> List[StudyRecord]:
+        """Hastanın tüm tetkikleri (eskiden yeniye)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_STUDY_COLUMNS)} FROM studies "
+                "WHERE patient_id = ? ORDER BY study_date, id",
+                (patient_id.strip(),),
+            ).fetchall()
+        return [StudyRecord(*row) for row in rows]
+
+    # =============================================
+    # SORGULAR
+    # =============================================
+    def _aggregate(self, table: str, filters: Optional[Dict[str, Sequence[str]]]) -> pd.DataFrame:
+        clauses, params = [], []
+        for column, values in (filters or {}).items():
+            if column not in _SLICES:
+                raise ValueError(f"Geçersiz dilim: {column}")
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._connect() as conn:
+            frame = pd.read_sql_query(f"SELECT * FROM {table}{where}", conn, params=params)
+        if table == "agg_pattern":
+            frame = _resolve_patterns(frame, group_by=list(_SLICES) + ["primary_pattern", "confidence_band"])
+        return frame
+
+    def pattern_summary(self, filters: Optional[Dict[str, Sequence[str]]] = None) -> pd.DataFrame:
+        """agg_pattern satırları (isteğe bağlı dilim filtreleriyle)."""
+        return self._aggregate("agg_pattern", filters)
+
+    def ila_summary(self, filters: Optional[Dict[str, Sequence[str]]] = None) -> pd.DataFrame:
+        """agg_ila satırları (isteğe bağlı dilim filtreleriyle)."""
+        return self._aggregate("agg_ila", filters)
+
+    def slice_values(self) -> Dict[str, List[str]]:
+        """Özet tablosunda bulunan dilim değerleri."""
+        with self._connect() as conn:
+            return {
+                column: [
+                    r[0] for r in conn.execute(
+                        f"SELECT DISTINCT {column} FROM agg_pattern ORDER BY {column}"
+                    )
+                ]
+                for column in _SLICES
+            }
+
+    def finding_counts(self) -> pd.DataFrame:
+        """
+        Primer patern başına vaka sayısı ve bulgu sıklıkları.
+
+        Sütunlar: primary_pattern, cases ve FINDING_KEYS sırasında her bulgunun
+        görüldüğü vaka sayısı (bit toplamları SQLite içinde tek geçişte alınır).
+        """
+        bit_sums = ", ".join(
+            f"SUM((finding_mask >> {i}) & 1) AS {key}" for i, key in enumerate(FINDING_KEYS)
+        )
+        with self._connect() as conn:
+            frame = pd.read_sql_query(
+                f"SELECT primary_pattern, COUNT(*) AS cases, {bit_sums} "
+                "FROM analyses GROUP BY primary_pattern",
+                conn,
+            )
+        return _resolve_patterns(frame, group_by=["primary_pattern"])
+
+    def count(self) -> int:
+        """Arşivdeki analiz sayısı."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(n), 0) FROM agg_pattern").fetchone()[0]
+
+
+def _resolve_patterns(frame: pd.DataFrame, group_by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    primary_pattern sütununu 2025 anahtarlarına çevir.
+
+    group_by verilirse eski ve yeni anahtarın ayrı özet satırları
+    birleştirilir (sayısal sütunlar toplanır).
+    """
+    resolved = resolve_pattern_keys(frame["primary_pattern"])
+    if resolved.equals(frame["primary_pattern"].astype(object)):
+        return frame
+    frame = frame.assign(primary_pattern=resolved)
+    if group_by:
+        frame = frame.groupby(group_by, sort=False, as_index=False).sum()
+    return frame
+
+
+def _python_rows(frame: pd.DataFrame):
+    """DataFrame satırlarını sqlite3'ün kabul ettiği Python tiplerine çevir."""
+    return frame.astype(object).itertuples(index=False, name=None)
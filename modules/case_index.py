@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+Benzer Vaka İndeksi
+
+MDD'de "buna benzeyen önceki vakalar" sorusu için arşivlenmiş
+analizlerin bulgu maskeleri ve klinik bağlam kodları tek bir uint64
+dizisinde tutulur:
+
+  bit 0-32   : BT bulguları (FINDING_KEYS sırası, state_codec ile aynı)
+  sonraki    : CTD seçeneği (bir bit; "Yok" bit almaz)
+  sonraki    : maruziyet seçeneği (bir bit; "Yok" bit almaz)
+
+Kesin arama (exact): sorgu maskesi tüm diziyle AND / OR / XOR'lanır,
+np.bitwise_count ile popcount alınır; Jaccard veya Hamming'e göre ilk k
+vaka np.argpartition ile seçilir. Milyon satırda birkaç milisaniyedir.
+
+MinHash / LSH (lsh): çok milyonluk arşivlerde her maske için 64 bitlik
+evrende H permütasyonla MinHash imzası bayt tablolarıyla vektörel
+hesaplanır; imza b banda bölünür, her bant sıralı anahtar dizisinde
+searchsorted ile aranır. Yalnızca aday vakalar kesin Jaccard ile
+sıralanır. Bant tabloları yenileme sırasında yalnızca yeni satırlar
+imzalanıp sıralı anahtarlara katılarak güncellenir; arama yolunda
+yeniden kurulmaz.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.findings_taxonomy import FINDING_KEYS
+from config.turkish_templates import PATIENT_FORM
+
+
+# Klinik bağlam bitleri ("Yok" = ilk seçenek, bit almaz)
+_CTD_BITS = {
+    option: len(FINDING_KEYS) + i
+    for i, option in enumerate(PATIENT_FORM["ctd_options"][1:])
+}
+_EXPOSURE_BITS = {
+    option: len(FINDING_KEYS) + len(_CTD_BITS) + i
+    for i, option in enumerate(PATIENT_FORM["exposure_options"][1:])
+}
+INDEX_BITS = len(FINDING_KEYS) + len(_CTD_BITS) + len(_EXPOSURE_BITS)
+assert INDEX_BITS <= 64, "İndeks maskesi 64 bite sığmalıdır"
+
+FINDING_BITS_MASK = np.uint64((1 << len(FINDING_KEYS)) - 1)
+
+# Bu satır sayısının üzerinde "auto" arama LSH kullanır
+LSH_AUTO_THRESHOLD = 1_000_000
+
+# Aday oranı bunun üzerindeyse LSH yerine tam tarama yapılır
+LSH_MAX_CANDIDATE_FRACTION = 0.1
+
+_EMPTY_MINHASH = 64
+
+
+def context_mask(ctd, exposure) -> np.ndarray:
+    """CTD / maruziyet seçeneklerini bağlam bitlerine çevir (vektörel)."""
+    ctd_bits = pd.Series(np.asarray(ctd, dtype=object)).map(_CTD_BITS)
+    exp_bits = pd.Series(np.asarray(exposure, dtype=object)).map(_EXPOSURE_BITS)
+    mask = np.zeros(len(ctd_bits), dtype=np.uint64)
+    for bits in (ctd_bits, exp_bits):
+        known = bits.notna().to_numpy()
+        mask[known] |= np.left_shift(np.uint64(1), bits[known].to_numpy(dtype=np.uint64))
+    return mask
+
+
+def index_masks(finding_mask, ctd, exposure) -> np.ndarray:
+    """Bulgu maskesi + bağlam bitleri → indeks maskeleri (uint64)."""
+    findings = np.asarray(finding_mask, dtype=np.int64).astype(np.uint64) & FINDING_BITS_MASK
+    return findings | context_mask(ctd, exposure)
+
+
+class _LshTables(NamedTuple):
+    """MinHash bayt tablosu ve bant başına sıralı anahtarlar."""
+    table: np.ndarray               # (H, 8, 256) uint8
+    bands: int
+    rows_per_band: int
+    shifts: np.ndarray
+    sorted_keys: np.ndarray         # (bands, N) uint32
+    order: np.ndarray               # (bands, N) sıralı anahtarın satır konumu
+
+
+class _IndexSnapshot(NamedTuple):
+    """
+    İndeksin değişmez görünümü. Ekleme / güncelleme yeni bir görünüm
+    oluşturup tek atamayla yayımlar; arama tek bir görünümü okur.
+    """
+    ids: np.ndarray                 # artan sırada, tekil
+    masks: np.ndarray
+    primary_pattern: np.ndarray
+    primary_score: np.ndarray
+    final_diagnosis: np.ndarray
+    lsh: Optional[_LshTables] = None
+
+
+_EMPTY_SNAPSHOT = _IndexSnapshot(
+    ids=np.empty(0, dtype=np.int64),
+    masks=np.empty(0, dtype=np.uint64),
+    primary_pattern=np.empty(0, dtype=object),
+    primary_score=np.empty(0, dtype=np.float64),
+    final_diagnosis=np.empty(0, dtype=object),
+)
+
+
+@dataclass
+class SimilarCase:
+    """Benzer vaka araması sonucu."""
+    analysis_id: int
+    similarity: float       # Jaccard (0-1)
+    distance: int           # Hamming (farklı bit sayısı)
+    primary_pattern: str
+    primary_score: float
+    final_diagnosis: Optional[str]
+
+
+class CaseIndex:
+    """
+    Arşivlenmiş analizler üzerinde benzer vaka indeksi.
+
+    Args:
+        use_context: CTD / maruziyet bitleri benzerliğe katılsın mı
+    """
+
+    def __init__(self, use_context: bool = True):
+        self.use_context = use_context
+        self._snapshot = _EMPTY_SNAPSHOT
+        # Oturumlar arasında paylaşılır: yenileme / ekleme / güncelleme kilit
+        # altında; arama kilit almadan o anki görünümü okur
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._snapshot.ids
+
+    @property
+    def masks(self) -> np.ndarray:
+        return self._snapshot.masks
+
+    @property
+    def primary_pattern(self) -> np.ndarray:
+        return self._snapshot.primary_pattern
+
+    @property
+    def primary_score(self) -> np.ndarray:
+        return self._snapshot.primary_score
+
+    @property
+    def final_diagnosis(self) -> np.ndarray:
+        return self._snapshot.final_diagnosis
+
+    # =============================================
+    # YÜKLEME
+    # =============================================
+    @classmethod
+    def from_archive(cls, archive, use_context: bool = True) -> "CaseIndex":
+        index = cls(use_context=use_context)
+        index.refresh(archive)
+        return index
+
+    def refresh(self, archive) -> int:
+        """
+        Arşive son yüklemeden sonra eklenen analizleri indekse ekle.
+
+        Son kimlik okunması, arşiv sorgusu ve ekleme tek kilit altındadır;
+        eşzamanlı yenilemeler aynı satırları iki kez eklemez. LSH tabloları
+        varsa yeni satırlarla genişletilir; indeks LSH_AUTO_THRESHOLD'u
+        ilk kez aştığında burada kurulur.
+        """
+        with self._lock:
+            ids = self._snapshot.ids
+            last_id = int(ids[-1]) if len(ids) else 0
+            return self._append(archive.index_rows(after_id=last_id))
+
+    def add_frame(self, frame: pd.DataFrame) -> int:
+        """
+        Analiz satırlarını ekle (bkz. CaseArchive.index_rows).
+
+        Kimliği indeksteki son kimlikten büyük olmayan satırlar atlanır.
+
+        Returns:
+            Eklenen satır sayısı
+        """
+        with self._lock:
+            return self._append(frame)
+
+    def _append(self, frame: pd.DataFrame) -> int:
+        current = self._snapshot
+        if len(current.ids):
+            frame = frame[frame["id"].to_numpy(dtype=np.int64) > current.ids[-1]]
+        frame = frame.sort_values("id").drop_duplicates("id")
+        if frame.empty:
+            return 0
+        if self.use_context:
+            masks = index_masks(frame["finding_mask"], frame["ctd"], frame["exposure"])
+        else:
+            masks = np.asarray(frame["finding_mask"], dtype=np.int64).astype(np.uint64)
+        all_masks = np.concatenate([current.masks, masks])
+        if current.lsh is not None:
+            lsh = _extend_lsh(current.lsh, masks, len(current.masks))
+        elif len(all_masks) > LSH_AUTO_THRESHOLD:
+            lsh = _build_lsh(all_masks)
+        else:
+            lsh = None
+        self._snapshot = _IndexSnapshot(
+            ids=np.concatenate([current.ids, frame["id"].to_numpy(dtype=np.int64)]),
+            masks=all_masks,
+            primary_pattern=np.concatenate([current.primary_pattern, frame["primary_pattern"].to_numpy(dtype=object)]),
+            primary_score=np.concatenate([current.primary_score, frame["primary_score"].to_numpy(dtype=np.float64)]),
+            final_diagnosis=np.concatenate([current.final_diagnosis, frame["final_diagnosis"].to_numpy(dtype=object)]),
+            lsh=lsh,
+        )
+        return len(frame)
+
+    def set_final_diagnosis(self, analysis_id: int, final_diagnosis: Optional[str]) -> None:
+        """Bellekteki kesin tanıyı güncelle (arşive yazıldıktan sonra)."""
+        with self._lock:
+            current = self._snapshot
+            pos = np.searchsorted(current.ids, analysis_id)
+            if pos < len(current.ids) and current.ids[pos] == analysis_id:
+                diagnoses = current.final_diagnosis.copy()
+                diagnoses[pos] = final_diagnosis or None
+                # Maskeler değişmez; LSH tabloları görünümle birlikte taşınır
+                self._snapshot = current._replace(final_diagnosis=diagnoses)
+
+    # =============================================
+    # ARAMA
+    # =============================================
+    def query_mask(self, finding_mask: int, ctd: str = "Yok", exposure: str = "Yok") -> np.uint64:
+        mask = int(finding_mask) & int(FINDING_BITS_MASK)
+        if self.use_context:
+            for bit in (_CTD_BITS.get(ctd), _EXPOSURE_BITS.get(exposure)):
+                if bit is not None:
+                    mask |= 1 << bit
+        return np.uint64(mask)
+
+    def search(
+        self,
+        finding_mask: int,
+        ctd: str = "Yok",
+        exposure: str = "Yok",
+        k: int = 10,
+        metric: str = "jaccard",
+        mode: str = "auto",
+        exclude_ids: Iterable[int] = (),
+    ) -> List[SimilarCase]:
+        """
+        En benzer k vaka.
+
+        Args:
+            finding_mask: Sorgu bulgu maskesi (state_codec.encode_findings)
+            ctd, exposure: Sorgu klinik bağlamı (arayüz seçenek metinleri)
+            metric: "jaccard" (yüksek = benzer) veya "hamming" (düşük = benzer)
+            mode: "exact", "lsh" veya "auto" (LSH_AUTO_THRESHOLD üzerinde LSH; yalnızca Jaccard)
+            exclude_ids: Sonuçtan çıkarılacak analiz kimlikleri (ör. güncel vaka)
+        """
+        if metric not in ("jaccard", "hamming"):
+            raise ValueError(f"Geçersiz benzerlik ölçütü: {metric}")
+        snapshot = self._snapshot
+        if mode == "auto":
+            mode = "lsh" if metric == "jaccard" and len(snapshot.ids) > LSH_AUTO_THRESHOLD else "exact"
+
+        query = self.query_mask(finding_mask, ctd, exposure)
+        exclude = np.fromiter(exclude_ids, dtype=np.int64)
+        if mode == "lsh":
+            if snapshot.lsh is None:
+                snapshot = self._ensure_lsh()
+            rows = _lsh_candidates(snapshot, query)
+            if rows is not None and len(rows) < k + len(exclude):
+                rows = None
+        elif mode == "exact":
+            rows = None
+        else:
+            raise ValueError(f"Geçersiz arama kipi: {mode}")
+
+        masks = snapshot.masks if rows is None else snapshot.masks[rows]
+        inter = np.bitwise_count(masks & query).astype(np.int64)
+        union = np.bitwise_count(masks | query).astype(np.int64)
+        distance = union - inter
+        if metric == "jaccard":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                score = np.where(union > 0, inter / union, 1.0)
+            order_key = -score
+        else:
+            order_key = distance.astype(np.float64)
+
+        if len(exclude):
+            ids = snapshot.ids if rows is None else snapshot.ids[rows]
+            order_key = np.where(np.isin(ids, exclude), np.inf, order_key)
+
+        k = min(k, int(np.isfinite(order_key).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(order_key, k - 1)[:k]
+        # Seçilenler içinde eşit skorda daha yeni vaka önce
+        top = top[np.lexsort((-top, order_key[top]))]
+
+        positions = top if rows is None else rows[top]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity = np.where(union[top] > 0, inter[top] / union[top], 1.0)
+        return [
+            SimilarCase(
+                analysis_id=int(snapshot.ids[p]),
+                similarity=float(sim),
+                distance=int(d),
+                primary_pattern=snapshot.primary_pattern[p],
+                primary_score=float(snapshot.primary_score[p]),
+                final_diagnosis=snapshot.final_diagnosis[p],
+            )
+            for p, sim, d in zip(positions, similarity, distance[top])
+        ]
+
+    # =============================================
+    # MinHash / LSH
+    # =============================================
+    def build_lsh(self, bands: int = 8, rows_per_band: int = 4, seed: int = 0, chunk_size: int = 1 << 20):
+        """
+        MinHash imzalarını ve bant tablolarını (yeniden) kur.
+
+        bands × rows_per_band permütasyon kullanılır; iki vakanın aday
+        olma olasılığı 1 − (1 − J^r)^b (J = Jaccard benzerliği).
+        Sonraki eklemeler aynı tablolarla artımlı olarak imzalanır.
+        """
+        with self._lock:
+            current = self._snapshot
+            self._snapshot = current._replace(
+                lsh=_build_lsh(current.masks, bands, rows_per_band, seed, chunk_size),
+            )
+
+    def _ensure_lsh(self) -> _IndexSnapshot:
+        """LSH tabloları olmayan (küçük) indekste açık "lsh" araması için kur."""
+        with self._lock:
+            if self._snapshot.lsh is None:
+                current = self._snapshot
+                self._snapshot = current._replace(lsh=_build_lsh(current.masks))
+            return self._snapshot
+
+
+def _band_keys(masks: np.ndarray, table: np.ndarray, bands: int, rows_per_band: int,
+               shifts: np.ndarray, chunk_size: int = 1 << 20) -> np.ndarray:
+    """(N,) maskeler → (bands, N) bant anahtarları."""
+    n = len(masks)
+    keys = np.empty((bands, n), dtype=np.uint32)
+    for start in range(0, n, chunk_size):
+        chunk = _minhash(masks[start:start + chunk_size], table)         # (m, H)
+        for b in range(bands):
+            band = chunk[:, b * rows_per_band:(b + 1) * rows_per_band].astype(np.uint32)
+            keys[b, start:start + len(chunk)] = (band << shifts).sum(axis=1, dtype=np.uint32)
+    return keys
+
+
+def _build_lsh(masks: np.ndarray, bands: int = 8, rows_per_band: int = 4,
+               seed: int = 0, chunk_size: int = 1 << 20) -> _LshTables:
+    rng = np.random.default_rng(seed)
+    n_hashes = bands * rows_per_band
+    # ranks[h, bit]: h. permütasyonda bitin sırası
+    ranks = np.stack([rng.permutation(64) for _ in range(n_hashes)]).astype(np.uint8)
+    # Bayt tablosu: table[h, j, v] = j. bayttaki v değerinin en küçük sırası
+    values = np.arange(256)
+    bit_set = ((values[:, None] >> np.arange(8)) & 1).astype(bool)          # (256, 8)
+    table = np.full((n_hashes, 8, 256), _EMPTY_MINHASH, dtype=np.uint8)
+    for j in range(8):
+        byte_ranks = ranks[:, 8 * j:8 * j + 8]                                # (H, 8)
+        masked = np.where(bit_set[None, :, :], byte_ranks[:, None, :], _EMPTY_MINHASH)
+        table[:, j, :] = masked.min(axis=2)
+
+    shifts = (np.arange(rows_per_band) * 7).astype(np.uint32)
+    keys = _band_keys(masks, table, bands, rows_per_band, shifts, chunk_size)
+    order = np.argsort(keys, axis=1, kind="stable").astype(np.int64)
+    sorted_keys = np.take_along_axis(keys, order, axis=1)
+    return _LshTables(table, bands, rows_per_band, shifts, sorted_keys, order)
+
+
+def _extend_lsh(lsh: _LshTables, masks: np.ndarray, offset: int) -> _LshTables:
+    """
+    Yeni satırları (konum offset'ten itibaren) bant tablolarına kat.
+
+    Yalnızca yeni maskeler imzalanır; sıralı anahtarlara searchsorted ile
+    yerleştirilir (eşit anahtarda eski satırlar önce — tam kurulumla aynı sıra).
+    """
+    keys = _band_keys(masks, lsh.table, lsh.bands, lsh.rows_per_band, lsh.shifts)
+    new_order = np.argsort(keys, axis=1, kind="stable")
+    new_keys = np.take_along_axis(keys, new_order, axis=1)
+    n = lsh.sorted_keys.shape[1] + len(masks)
+    sorted_keys = np.empty((lsh.bands, n), dtype=np.uint32)
+    order = np.empty((lsh.bands, n), dtype=np.int64)
+    for b in range(lsh.bands):
+        at = np.searchsorted(lsh.sorted_keys[b], new_keys[b], side="right")
+        sorted_keys[b] = np.insert(lsh.sorted_keys[b], at, new_keys[b])
+        order[b] = np.insert(lsh.order[b], at, new_order[b] + offset)
+    return lsh._replace(sorted_keys=sorted_keys, order=order)
+
+
+def _lsh_candidates(snapshot: _IndexSnapshot, query: np.uint64) -> Optional[np.ndarray]:
+    """Bant eşleşmelerinin birleşimi; aday çok fazlaysa None (tam tarama)."""
+    table, bands, rows_per_band, shifts, sorted_keys, order = snapshot.lsh
+    signature = _minhash(np.array([query], dtype=np.uint64), table)[0]
+    spans = []
+    for b in range(bands):
+        band = signature[b * rows_per_band:(b + 1) * rows_per_band].astype(np.uint32)
+        key = (band << shifts).sum(dtype=np.uint32)
+        spans.append(np.searchsorted(sorted_keys[b], [key, key + 1]))
+    # Çok kalabalık kovada (yinelenen bulgu kümeleri) tam tarama daha ucuzdur
+    if sum(hi - lo for lo, hi in spans) > len(snapshot.ids) * LSH_MAX_CANDIDATE_FRACTION:
+        return None
+    return np.unique(np.concatenate([order[b, lo:hi] for b, (lo, hi) in enumerate(spans)]))
+
+
+def _minhash(masks: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """(N,) uint64 maskeler → (N, H) uint8 MinHash imzaları (boş küme = 64)."""
+    octets = masks.astype("<u8").view(np.uint8).reshape(-1, 8)
+    signature = table[:, 0, :][:, octets[:, 0]]
+    for j in range(1, 8):
+        np.minimum(signature, table[:, j, :][:, octets[:, j]], out=signature)
+    return signature.T
@@ -12,10 +12,55 @@ from dataclasses import dataclass, field
 from typing import List, Dict, Optional
 from config.pattern_definitions import (
     PATTERN_CATEGORIES,
-    NOMENCLATURE_2025_MAP,
+    SCORING_WEIGHTS,
+    MDD_THRESHOLDS,
     FINDING_IMPLICATIONS,
     COOCCURRENCE_RULES,
 )
+from modules import nomenclature
+
+
+# MDD gerekçe kodları → MDD önerilir mi
+MDD_REASON_CODES = {
+    "no_findings": False,
+    "no_primary": False,
+    "against_findings": True,
+    "uip_definite_high": False,
+    "close_scores": True,
+    "low_confidence": True,
+    "uip_probable": True,
+    "confident": False,
+}
+
+
+# Güven düzeyleri: (alt sınır, düzey) — azalan sırada
+CONFIDENCE_LEVELS = [
+    (90, {
+        "label": "Yüksek Güven — Tipik Patern",
+        "color": "green",
+        "description": "BT bulguları bu patern için yüksek güvenle uyumludur. Uygun klinik bağlamda tek başına tanısal olabilir.",
+    }),
+    (70, {
+        "label": "Orta-Yüksek Güven — Olası Patern",
+        "color": "green",
+        "description": "BT bulguları bu paterni kuvvetle düşündürmektedir. Klinik korelasyon önerilir.",
+    }),
+    (51, {
+        "label": "Orta Güven — Uyumlu Patern",
+        "color": "orange",
+        "description": "BT bulguları bu paternle uyumlu olmakla birlikte ayırıcı tanılar mevcuttur. MDD önerilir.",
+    }),
+    (30, {
+        "label": "Düşük-Orta Güven — Belirsiz",
+        "color": "orange",
+        "description": "BT bulguları birden fazla paternle örtüşmektedir. Biyopsi veya ileri tetkik gerekebilir.",
+    }),
+    (float("-inf"), {
+        "label": "Düşük Güven — Alternatif Tanı",
+        "color": "red",
+        "description": "BT bulguları bu patern için yeterli değildir. Alternatif tanılar değerlendirilmelidir.",
+    }),
+]
 
 
 @dataclass
@@ -37,36 +82,9 @@ class PatternResult:
     @property
     def confidence_level(self) -> Dict[str, str]:
         """Güven düzeyini renk kodu ile döndür."""
-        if self.final_score >= 90:
-            return {
-                "label": "Yüksek Güven — Tipik Patern",
-                "color": "green",
-                "description": "BT bulguları bu patern için yüksek güvenle uyumludur. Uygun klinik bağlamda tek başına tanısal olabilir.",
-            }
-        elif self.final_score >= 70:
-            return {
-                "label": "Orta-Yüksek Güven — Olası Patern",
-                "color": "green",
-                "description": "BT bulguları bu paterni kuvvetle düşündürmektedir. Klinik korelasyon önerilir.",
-            }
-        elif self.final_score >= 51:
-            return {
-                "label": "Orta Güven — Uyumlu Patern",
-                "color": "orange",
-                "description": "BT bulguları bu paternle uyumlu olmakla birlikte ayırıcı tanılar mevcuttur. MDD önerilir.",
-            }
-        elif self.final_score >= 30:
-            return {
-                "label": "Düşük-Orta Güven — Belirsiz",
-                "color": "orange",
-                "description": "BT bulguları birden fazla paternle örtüşmektedir. Biyopsi veya ileri tetkik gerekebilir.",
-            }
-        else:
-            return {
-                "label": "Düşük Güven — Alternatif Tanı",
-                "color": "red",
-                "description": "BT bulguları bu patern için yeterli değildir. Alternatif tanılar değerlendirilmelidir.",
-            }
+        for threshold, level in CONFIDENCE_LEVELS:
+            if self.final_score >= threshold:
+                return dict(level)
 
 
 @dataclass
@@ -77,6 +95,7 @@ class DiagnosticResult:
     mdd_recommended: bool
     mdd_reason: str
     selected_findings: List[str] = field(default_factory=list)
+    mdd_reason_code: str = ""
 
 
 class ILDDecisionEngine:
@@ -88,13 +107,27 @@ class ILDDecisionEngine:
     2025 Nomenklatur uyumlu: DIP→AMP, HP→BIP, AIP→DAD
     """
 
-    def __init__(self):
-        self.patterns = PATTERN_CATEGORIES
-        self._legacy_map = NOMENCLATURE_2025_MAP
+    def __init__(
+        self,
+        patterns: Optional[Dict] = None,
+        scoring_weights: Optional[Dict] = None,
+        mdd_thresholds: Optional[Dict] = None,
+    ):
+        """
+        Args:
+            patterns: Patern tanımları (varsayılan PATTERN_CATEGORIES);
+                base_score ve clinical_modifiers buradan okunur
+            scoring_weights: SCORING_WEIGHTS alanlarının değişiklikleri
+            mdd_thresholds: MDD_THRESHOLDS alanlarının değişiklikleri
+        """
+        self.patterns = PATTERN_CATEGORIES if patterns is None else patterns
+        self.scoring_weights = {**SCORING_WEIGHTS, **(scoring_weights or {})}
+        self.mdd_thresholds = {**MDD_THRESHOLDS, **(mdd_thresholds or {})}
 
-    def resolve_pattern_key(self, key: str) -> str:
-        """Eski patern anahtarını 2025 nomenklaturuna çevir."""
-        return self._legacy_map.get(key, key)
+    @staticmethod
+    def resolve_pattern_key(key: str) -> str:
+        """Eski patern anahtarını 2025 nomenklaturuna çevir (bkz. modules.nomenclature)."""
+        return nomenclature.resolve_pattern_key(key)
 
     @staticmethod
     def _calculate_cooccurrence_modifiers(
@@ -156,8 +189,9 @@ class ILDDecisionEngine:
                 primary_pattern=None,
                 ranked_patterns=[],
                 mdd_recommended=False,
-                mdd_reason="Bulgu seçilmediği için değerlendirme yapılamadı.",
+                mdd_reason=self.format_mdd_reason("no_findings", None, []),
                 selected_findings=[],
+                mdd_reason_code="no_findings",
             )
 
         # Kompozit bulgulardan bileşenleri çıkar
@@ -186,14 +220,15 @@ class ILDDecisionEngine:
         primary = results[0] if results and results[0].final_score > 0 else None
 
         # MDD kararı
-        mdd_recommended, mdd_reason = self._evaluate_mdd(primary, results)
+        mdd_code = self._mdd_reason_code(primary, results, self.mdd_thresholds)
 
         return DiagnosticResult(
             primary_pattern=primary,
             ranked_patterns=results,
-            mdd_recommended=mdd_recommended,
-            mdd_reason=mdd_reason,
+            mdd_recommended=MDD_REASON_CODES[mdd_code],
+            mdd_reason=self.format_mdd_reason(mdd_code, primary, results),
             selected_findings=selected_findings,
+            mdd_reason_code=mdd_code,
         )
 
     def _score_pattern(
@@ -280,17 +315,21 @@ class ILDDecisionEngine:
         else:
             matched_supportive = [f for f in supportive if f in selected_findings]
 
-        support_bonus = min(len(matched_supportive) * 3, 15)  # Max +15
+        weights = self.scoring_weights
+        support_bonus = min(
+            len(matched_supportive) * weights["supportive_per_finding"],
+            weights["supportive_cap"],
+        )
         finding_score += support_bonus
 
         # --- Distribution match ---
         matched_dist = [f for f in distribution if f in selected_findings]
-        distribution_score = 5 if matched_dist else 0
+        distribution_score = weights["distribution_bonus"] if matched_dist else 0
         finding_score += distribution_score
 
         # --- Against findings penalty ---
         matched_against = [f for f in against if f in selected_findings]
-        penalty = len(matched_against) * 8  # Her karşıt bulgu -8
+        penalty = len(matched_against) * weights["against_per_finding"]
         finding_score -= penalty
 
         # --- Clinical modifiers ---
@@ -344,53 +383,91 @@ class ILDDecisionEngine:
         ranked: List[PatternResult],
     ) -> tuple:
         """MDD gereksinimi değerlendir."""
+        code = self._mdd_reason_code(primary, ranked, self.mdd_thresholds)
+        return MDD_REASON_CODES[code], self.format_mdd_reason(code, primary, ranked)
+
+    @staticmethod
+    def _mdd_reason_code(
+        primary: Optional[PatternResult],
+        ranked: List[PatternResult],
+        thresholds: Optional[Dict] = None,
+    ) -> str:
+        """
+        MDD kararının gerekçe kodunu belirle (bkz. MDD_REASON_CODES).
+
+        thresholds: MDD_THRESHOLDS biçiminde eşikler (varsayılan MDD_THRESHOLDS)
+        """
+        t = MDD_THRESHOLDS if thresholds is None else thresholds
         if primary is None:
-            return False, "Yeterli bulgu seçilmediği için değerlendirme yapılamadı."
+            return "no_primary"
 
         # --- Karşıt bulgu kontrolü (tüm paternler için öncelikli) ---
         if len(primary.matched_against) > 0:
-            return True, (
-                f"Primer paternle uyumsuz bulgu(lar) mevcuttur: "
-                f"{', '.join(primary.matched_against)}. "
-                "Atipik özellikler nedeniyle MDD önerilir."
-            )
+            return "against_findings"
 
         # --- Kesin UIP ve yüksek güven → MDD gerekmez ---
         # (Yalnızca karşıt bulgu yoksa buraya ulaşılır)
-        if primary.pattern_key == "uip_definite" and primary.final_score >= 90:
-            return False, (
-                "Kesin UIP paterni yüksek güvenle saptanmıştır. "
-                "2025 ERS/ATS kılavuzuna göre, uygun klinik bağlamda "
-                "kesin UIP paterni IPF tanısı için yeterlidir."
-            )
+        if primary.pattern_key == "uip_definite" and primary.final_score >= t["uip_definite_high"]:
+            return "uip_definite_high"
 
         # İlk iki patern arası fark çok az → MDD önerilir
         if len(ranked) >= 2:
             diff = ranked[0].final_score - ranked[1].final_score
-            if diff < 15 and ranked[1].final_score > 20:
-                return True, (
-                    f"İlk iki patern arasındaki skor farkı düşüktür "
-                    f"({ranked[0].pattern_name}: %{ranked[0].final_score:.0f} vs "
-                    f"{ranked[1].pattern_name}: %{ranked[1].final_score:.0f}). "
-                    f"Ayırıcı tanı için MDD önerilir."
-                )
+            if diff < t["close_gap"] and ranked[1].final_score > t["close_second_min"]:
+                return "close_scores"
 
         # Düşük-orta güven → MDD önerilir
-        if primary.final_score < 70:
-            return True, (
-                f"Tanısal güven düzeyi orta-düşüktür (%{primary.final_score:.0f}). "
-                "Kesin tanı için MDD, serolojik tetkikler ve/veya biyopsi değerlendirilmelidir."
-            )
+        if primary.final_score < t["low_confidence"]:
+            return "low_confidence"
 
         # Olası UIP → MDD hâlâ faydalı olabilir
         if primary.pattern_key == "uip_probable":
-            return True, (
+            return "uip_probable"
+
+        return "confident"
+
+    @staticmethod
+    def format_mdd_reason(
+        code: str,
+        primary: Optional[PatternResult],
+        ranked: List[PatternResult],
+    ) -> str:
+        """Gerekçe kodundan MDD açıklama metnini oluştur."""
+        if code == "no_findings":
+            return "Bulgu seçilmediği için değerlendirme yapılamadı."
+        if code == "no_primary":
+            return "Yeterli bulgu seçilmediği için değerlendirme yapılamadı."
+        if code == "against_findings":
+            return (
+                f"Primer paternle uyumsuz bulgu(lar) mevcuttur: "
+                f"{', '.join(primary.matched_against)}. "
+                "Atipik özellikler nedeniyle MDD önerilir."
+            )
+        if code == "uip_definite_high":
+            return (
+                "Kesin UIP paterni yüksek güvenle saptanmıştır. "
+                "2025 ERS/ATS kılavuzuna göre, uygun klinik bağlamda "
+                "kesin UIP paterni IPF tanısı için yeterlidir."
+            )
+        if code == "close_scores":
+            return (
+                f"İlk iki patern arasındaki skor farkı düşüktür "
+                f"({ranked[0].pattern_name}: %{ranked[0].final_score:.0f} vs "
+                f"{ranked[1].pattern_name}: %{ranked[1].final_score:.0f}). "
+                f"Ayırıcı tanı için MDD önerilir."
+            )
+        if code == "low_confidence":
+            return (
+                f"Tanısal güven düzeyi orta-düşüktür (%{primary.final_score:.0f}). "
+                "Kesin tanı için MDD, serolojik tetkikler ve/veya biyopsi değerlendirilmelidir."
+            )
+        if code == "uip_probable":
+            return (
                 "Olası UIP paterni saptanmıştır. 2025 ERS/ATS kılavuzuna göre, "
                 "olası UIP durumunda IPF tanısı konulabilir; ancak belirsiz olgularda "
                 "MDD tanısal güveni artırabilir."
             )
-
-        return False, (
+        return (
             f"{primary.pattern_name} paterni yeterli güvenle saptanmıştır (%{primary.final_score:.0f}). "
             "Rutin MDD gerekmemekle birlikte, klinik şüphe durumunda değerlendirilebilir."
         )
@@ -12,10 +12,24 @@ Risk düzeyleri:
   - Düşük: <%5 tutulum, non-fibrotik
   - Orta: %5-15 veya subplevral non-fibrotik
   - Yüksek: Fibrotik bulgular veya >%15 tutulum
+
+Sonuç yalnızca (var mı, subplevral, fibrotik, yaygınlık bandı, >1 bulgu)
+girdilerine bağlıdır; bu girdiler yükleme sırasında ILA_DECISION_TABLE
+içinde hazır ILAResult şablonlarına derlenir.
+
+Tarama programları için classify_batch, çok sayıda vakayı NumPy ile
+tek geçişte sınıflandırır (bulgular ILA_FINDING_KEYS bit maskesi olarak).
 """
 
-from dataclasses import dataclass
-from typing import List
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+from itertools import product
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.findings_taxonomy import ILA_FINDING_KEYS
 
 
 # Fibrotik ILA bulguları
@@ -24,6 +38,106 @@ _FIBROTIC_ILA_FINDINGS = {
     "ila_honeycombing",
 }
 
+# Kategori anahtarı → Türkçe etiket
+ILA_CATEGORY_LABELS = {
+    "none": "ILA saptanmadı",
+    "non_subpleural": "Non-subplevral ILA",
+    "subpleural_nonfibrotic": "Subplevral Non-fibrotik ILA",
+    "subpleural_fibrotic": "Subplevral Fibrotik ILA",
+}
+
+# Risk düzeyleri (artan sırada)
+ILA_RISK_LEVELS = ("Düşük", "Orta", "Yüksek")
+
+# Kategori anahtarları (toplu sonuçlardaki kod sırası)
+ILA_CATEGORY_KEYS = tuple(ILA_CATEGORY_LABELS)
+
+# Takip önerisi kodu → metin ({extent} yer tutucusu tutulum yüzdesidir)
+ILA_FOLLOW_UP_TEXTS = {
+    "none": "ILA bulgusu yoktur. Rutin takip yeterlidir.",
+    "fibrotic_high": (
+        "Fibrotik ILA saptanmıştır — ILD'ye progresyon riski yüksektir. "
+        "Solunum fonksiyon testleri (SFT) ve 3-6 ay içinde kontrol YÇBT önerilir. "
+        "Semptomatik ise göğüs hastalıkları konsültasyonu ve MDD değerlendirilmelidir."
+    ),
+    "subpleural_moderate": (
+        "Subplevral non-fibrotik ILA saptanmıştır. "
+        "12 ay içinde kontrol YÇBT ile progresyon değerlendirmesi önerilir. "
+        "SFT bazal değerlendirme yapılmalıdır."
+    ),
+    "subpleural_low": (
+        "Minimal subplevral ILA saptanmıştır. "
+        "12-24 ay içinde kontrol YÇBT düşünülebilir. "
+        "Klinik semptomlar gelişirse erken kontrol önerilir."
+    ),
+    "non_subpleural_moderate": (
+        "Non-subplevral ILA saptanmıştır. "
+        "Etiyoloji araştırması (maruziyet öyküsü, otoimmün belirteçler) düşünülmelidir. "
+        "12 ay içinde kontrol YÇBT önerilir."
+    ),
+    "non_subpleural_low": (
+        "Minimal non-subplevral ILA saptanmıştır. "
+        "Klinik önemi belirsizdir; semptom gelişirse değerlendirilmelidir."
+    ),
+    # Yüksek risk genel
+    "high_risk": (
+        "ILA yaygınlığı %{extent:.0f} olup progresyon riski yüksektir. "
+        "SFT, göğüs hastalıkları konsültasyonu ve 3-6 ay içinde kontrol YÇBT önerilir."
+    ),
+    "general": "ILA saptanmıştır. Klinik değerlendirme ve takip önerilir.",
+}
+ILA_FOLLOW_UP_CODES = tuple(ILA_FOLLOW_UP_TEXTS)
+
+# (kategori, risk) → takip kodu; tabloda olmayan yüksek risk → high_risk, diğerleri → general
+_FOLLOW_UP_BY_KEY = {
+    ("subpleural_fibrotic", "Yüksek"): "fibrotic_high",
+    ("subpleural_nonfibrotic", "Orta"): "subpleural_moderate",
+    ("subpleural_nonfibrotic", "Düşük"): "subpleural_low",
+    ("non_subpleural", "Orta"): "non_subpleural_moderate",
+    ("non_subpleural", "Düşük"): "non_subpleural_low",
+}
+
+
+def _follow_up_code(category: str, risk_level: str) -> str:
+    if category == "none":
+        return "none"
+    if (category, risk_level) in _FOLLOW_UP_BY_KEY:
+        return _FOLLOW_UP_BY_KEY[(category, risk_level)]
+    return "high_risk" if risk_level == "Yüksek" else "general"
+
+
+# (kategori indeksi, risk indeksi) → ILA_FOLLOW_UP_CODES indeksi
+_FOLLOW_UP_TABLE = np.array(
+    [
+        [ILA_FOLLOW_UP_CODES.index(_follow_up_code(category, risk)) for risk in ILA_RISK_LEVELS]
+        for category in ILA_CATEGORY_KEYS
+    ],
+    dtype=np.int8,
+)
+
+# Yaygınlık bantlarının üst sınırları: ≤%5, %5-15, >%15
+ILA_EXTENT_BANDS = (5, 15)
+
+_FIBROTIC_ILA_MASK = sum(1 << ILA_FINDING_KEYS.index(key) for key in _FIBROTIC_ILA_FINDINGS)
+
+
+def follow_up_text(category: str, risk_level: str, extent: float) -> str:
+    """(kategori, risk) için takip önerisi metni."""
+    return ILA_FOLLOW_UP_TEXTS[_follow_up_code(category, risk_level)].format(extent=extent)
+
+
+def ila_extent_band(extent: float) -> int:
+    """Tutulum yüzdesinin ILA_EXTENT_BANDS içindeki bandı (0, 1, 2)."""
+    return bisect_left(ILA_EXTENT_BANDS, extent)
+
+
+def _ila_category(is_subpleural: bool, has_fibrotic: bool) -> str:
+    if has_fibrotic and is_subpleural:
+        return "subpleural_fibrotic"
+    elif is_subpleural:
+        return "subpleural_nonfibrotic"
+    return "non_subpleural"
+
 
 @dataclass
 class ILAResult:
@@ -39,6 +153,66 @@ class ILAResult:
     selected_findings: List[str]
 
 
+@dataclass
+class ILABatchResult:
+    """
+    Toplu ILA sınıflandırma sonucu. Tüm alanlar (N,) boyutunda dizilerdir;
+    kategori / risk / takip alanları ILA_CATEGORY_KEYS / ILA_RISK_LEVELS /
+    ILA_FOLLOW_UP_CODES indeksleridir.
+    """
+    ila_present: np.ndarray
+    category: np.ndarray
+    risk: np.ndarray
+    follow_up_code: np.ndarray
+    extent_percent: np.ndarray
+    has_fibrotic_features: np.ndarray
+    is_subpleural: np.ndarray
+    finding_mask: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.category)
+
+    def follow_up_texts(self) -> np.ndarray:
+        """Vaka başına takip önerisi metinleri."""
+        texts = np.array(list(ILA_FOLLOW_UP_TEXTS.values()), dtype=object)[self.follow_up_code]
+        # Yalnızca yaygınlık içeren şablon satır bazında doldurulur
+        templated = self.follow_up_code == ILA_FOLLOW_UP_CODES.index("high_risk")
+        texts[templated] = [
+            ILA_FOLLOW_UP_TEXTS["high_risk"].format(extent=e) for e in self.extent_percent[templated]
+        ]
+        return texts
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vaka başına özet tablo (kategori, risk, takip kodu)."""
+        return pd.DataFrame({
+            "ila_present": self.ila_present,
+            "ila_category": pd.Categorical.from_codes(self.category, categories=list(ILA_CATEGORY_KEYS)),
+            "ila_risk": pd.Categorical.from_codes(self.risk, categories=list(ILA_RISK_LEVELS)),
+            "ila_extent": self.extent_percent,
+            "ila_follow_up_code": pd.Categorical.from_codes(
+                self.follow_up_code, categories=list(ILA_FOLLOW_UP_CODES)
+            ),
+        })
+
+    def result(self, i: int) -> ILAResult:
+        """i. vakanın sonucunu ILAResult objesine çevir."""
+        category = ILA_CATEGORY_KEYS[self.category[i]]
+        extent = float(self.extent_percent[i])
+        code = ILA_FOLLOW_UP_CODES[self.follow_up_code[i]]
+        mask = int(self.finding_mask[i])
+        return ILAResult(
+            ila_present=bool(self.ila_present[i]),
+            category=category,
+            category_label=ILA_CATEGORY_LABELS[category],
+            risk_level=ILA_RISK_LEVELS[self.risk[i]],
+            extent_percent=extent,
+            has_fibrotic_features=bool(self.has_fibrotic_features[i]),
+            is_subpleural=bool(self.is_subpleural[i]),
+            follow_up=ILA_FOLLOW_UP_TEXTS[code].format(extent=extent),
+            selected_findings=[k for bit, k in enumerate(ILA_FINDING_KEYS) if mask >> bit & 1],
+        )
+
+
 class ILAClassifier:
     """
     ILA bulgularını sınıflandırır ve risk düzeyi belirler.
@@ -64,52 +238,36 @@ class ILAClassifier:
             ILAResult objesi
         """
         if not ila_present:
-            return ILAResult(
-                ila_present=False,
-                category="none",
-                category_label="ILA saptanmadı",
-                risk_level="Düşük",
-                extent_percent=0,
-                has_fibrotic_features=False,
-                is_subpleural=False,
-                follow_up="ILA bulgusu yoktur. Rutin takip yeterlidir.",
-                selected_findings=[],
-            )
+            return replace(ILA_DECISION_TABLE[_NO_ILA_KEY], selected_findings=[])
 
         # Fibrotik özellik var mı?
         has_fibrotic = bool(
             set(selected_ila_findings) & _FIBROTIC_ILA_FINDINGS
         )
 
-        # Kategori belirleme
-        if has_fibrotic and is_subpleural:
-            category = "subpleural_fibrotic"
-            category_label = "Subplevral Fibrotik ILA"
-        elif is_subpleural:
-            category = "subpleural_nonfibrotic"
-            category_label = "Subplevral Non-fibrotik ILA"
-        else:
-            category = "non_subpleural"
-            category_label = "Non-subplevral ILA"
-
-        # Risk düzeyi
-        risk_level = self._determine_risk(
-            category, extent_percent, has_fibrotic, len(selected_ila_findings)
+        key = (
+            True,
+            bool(is_subpleural),
+            has_fibrotic,
+            ila_extent_band(extent_percent),
+            len(selected_ila_findings) > 1,
         )
+        template = ILA_DECISION_TABLE[key]
+        follow_up = template.follow_up
+        if key in _EXTENT_TEMPLATED_KEYS:
+            follow_up = follow_up.format(extent=extent_percent)
 
-        # Takip önerisi
-        follow_up = self._generate_follow_up(category, risk_level, extent_percent)
-
+        # dataclasses.replace alan introspeksiyonu yapar; doğrudan kurulum daha hızlıdır
         return ILAResult(
-            ila_present=True,
-            category=category,
-            category_label=category_label,
-            risk_level=risk_level,
-            extent_percent=extent_percent,
-            has_fibrotic_features=has_fibrotic,
-            is_subpleural=is_subpleural,
-            follow_up=follow_up,
-            selected_findings=selected_ila_findings,
+            True,
+            template.category,
+            template.category_label,
+            template.risk_level,
+            extent_percent,
+            has_fibrotic,
+            is_subpleural,
+            follow_up,
+            selected_ila_findings,
         )
 
     def _determine_risk(
@@ -148,42 +306,158 @@ class ILAClassifier:
         extent: float,
     ) -> str:
         """Takip önerisi oluştur."""
-        recommendations = {
-            ("subpleural_fibrotic", "Yüksek"): (
-                "Fibrotik ILA saptanmıştır — ILD'ye progresyon riski yüksektir. "
-                "Solunum fonksiyon testleri (SFT) ve 3-6 ay içinde kontrol YÇBT önerilir. "
-                "Semptomatik ise göğüs hastalıkları konsültasyonu ve MDD değerlendirilmelidir."
-            ),
-            ("subpleural_nonfibrotic", "Orta"): (
-                "Subplevral non-fibrotik ILA saptanmıştır. "
-                "12 ay içinde kontrol YÇBT ile progresyon değerlendirmesi önerilir. "
-                "SFT bazal değerlendirme yapılmalıdır."
-            ),
-            ("subpleural_nonfibrotic", "Düşük"): (
-                "Minimal subplevral ILA saptanmıştır. "
-                "12-24 ay içinde kontrol YÇBT düşünülebilir. "
-                "Klinik semptomlar gelişirse erken kontrol önerilir."
-            ),
-            ("non_subpleural", "Orta"): (
-                "Non-subplevral ILA saptanmıştır. "
-                "Etiyoloji araştırması (maruziyet öyküsü, otoimmün belirteçler) düşünülmelidir. "
-                "12 ay içinde kontrol YÇBT önerilir."
-            ),
-            ("non_subpleural", "Düşük"): (
-                "Minimal non-subplevral ILA saptanmıştır. "
-                "Klinik önemi belirsizdir; semptom gelişirse değerlendirilmelidir."
+        return follow_up_text(category, risk_level, extent)
+
+    # =============================================
+    # TOPLU SINIFLANDIRMA
+    # =============================================
+    def classify_batch(
+        self,
+        ila_present,
+        is_subpleural,
+        extent_percent,
+        finding_mask,
+    ) -> ILABatchResult:
+        """
+        Çok sayıda vakayı tek geçişte sınıflandır (classify ile aynı kurallar).
+
+        Args:
+            ila_present: (N,) ILA bulgusu var mı
+            is_subpleural: (N,) Subplevral dağılım mevcut mu
+            extent_percent: (N,) Tutulum yüzdesi
+            finding_mask: (N,) ILA bulgu bit maskesi (bit sırası = ILA_FINDING_KEYS)
+
+        Returns:
+            ILABatchResult objesi
+        """
+        present = np.asarray(ila_present, dtype=bool)
+        n = present.shape[0]
+        mask = np.where(present, np.broadcast_to(np.asarray(finding_mask, dtype=np.int64), n), 0)
+        subpleural = present & np.broadcast_to(np.asarray(is_subpleural, dtype=bool), n)
+        extent = np.where(present, np.broadcast_to(np.asarray(extent_percent, dtype=np.float64), n), 0.0)
+
+        has_fibrotic = (mask & _FIBROTIC_ILA_MASK) != 0
+        finding_count = np.zeros(n, dtype=np.int64)
+        for bit in range(len(ILA_FINDING_KEYS)):
+            finding_count += (mask >> bit) & 1
+
+        # Derlenmiş karar tablosu: (var mı, subplevral, fibrotik, bant, >1 bulgu)
+        index = np.ravel_multi_index(
+            (
+                present,
+                subpleural,
+                has_fibrotic,
+                np.searchsorted(ILA_EXTENT_BANDS, extent, side="left"),
+                finding_count > 1,
             ),
-        }
+            _DECISION_CATEGORY.shape,
+        )
+        category = _DECISION_CATEGORY.ravel()[index]
+        risk = _DECISION_RISK.ravel()[index]
+
+        return ILABatchResult(
+            ila_present=present,
+            category=category,
+            risk=risk,
+            follow_up_code=_FOLLOW_UP_TABLE[category, risk],
+            extent_percent=extent,
+            has_fibrotic_features=has_fibrotic,
+            is_subpleural=subpleural,
+            finding_mask=mask,
+        )
+
+
+# =============================================
+# DERLENMİŞ KARAR TABLOSU
+# =============================================
+# Anahtar: (ila_present, is_subpleural, has_fibrotic, extent_band, multiple_findings)
+_NO_ILA_KEY = (False, False, False, 0, False)
+
+# Bant başına temsilci yaygınlık ve >1 bulgu durumuna göre temsilci bulgu sayısı
+_BAND_EXTENTS = (0.0, 10.0, 50.0)
+_MULTI_COUNTS = {False: 1, True: 2}
+
+
+def _compile_decision_table() -> Dict[Tuple, ILAResult]:
+    classifier = ILAClassifier()
+    table = {
+        _NO_ILA_KEY: ILAResult(
+            ila_present=False,
+            category="none",
+            category_label=ILA_CATEGORY_LABELS["none"],
+            risk_level="Düşük",
+            extent_percent=0,
+            has_fibrotic_features=False,
+            is_subpleural=False,
+            follow_up=ILA_FOLLOW_UP_TEXTS["none"],
+            selected_findings=[],
+        )
+    }
+    for subpleural, fibrotic, band, multi in product(
+        (False, True), (False, True), range(len(ILA_EXTENT_BANDS) + 1), (False, True)
+    ):
+        category = _ila_category(subpleural, fibrotic)
+        risk_level = classifier._determine_risk(
+            category, _BAND_EXTENTS[band], fibrotic, _MULTI_COUNTS[multi]
+        )
+        table[(True, subpleural, fibrotic, band, multi)] = ILAResult(
+            ila_present=True,
+            category=category,
+            category_label=ILA_CATEGORY_LABELS[category],
+            risk_level=risk_level,
+            extent_percent=_BAND_EXTENTS[band],
+            has_fibrotic_features=fibrotic,
+            is_subpleural=subpleural,
+            # Yaygınlık şablonu çağrı sırasında doldurulur
+            follow_up=ILA_FOLLOW_UP_TEXTS[_follow_up_code(category, risk_level)],
+            selected_findings=[],
+        )
+    return table
+
 
-        key = (category, risk_level)
-        if key in recommendations:
-            return recommendations[key]
+ILA_DECISION_TABLE = _compile_decision_table()
 
-        # Yüksek risk genel
-        if risk_level == "Yüksek":
-            return (
-                f"ILA yaygınlığı %{extent:.0f} olup progresyon riski yüksektir. "
-                "SFT, göğüs hastalıkları konsültasyonu ve 3-6 ay içinde kontrol YÇBT önerilir."
-            )
+_EXTENT_TEMPLATED_KEYS = frozenset(
+    key for key, template in ILA_DECISION_TABLE.items()
+    if template.follow_up == ILA_FOLLOW_UP_TEXTS["high_risk"]
+)
 
-        return "ILA saptanmıştır. Klinik değerlendirme ve takip önerilir."
+# classify_batch için aynı tablonun dizi karşılıkları (boyut: 2×2×2×3×2)
+_DECISION_CATEGORY = np.zeros((2, 2, 2, len(ILA_EXTENT_BANDS) + 1, 2), dtype=np.int8)
+_DECISION_RISK = np.zeros_like(_DECISION_CATEGORY)
+for _key, _template in ILA_DECISION_TABLE.items():
+    _index = tuple(int(part) for part in _key)
+    _DECISION_CATEGORY[_index] = ILA_CATEGORY_KEYS.index(_template.category)
+    _DECISION_RISK[_index] = ILA_RISK_LEVELS.index(_template.risk_level)
+# ILA yoksa diğer girdiler önemsizdir
+_DECISION_CATEGORY[0] = ILA_CATEGORY_KEYS.index("none")
+_DECISION_RISK[0] = ILA_RISK_LEVELS.index("Düşük")
+
+
+def check_ila_decision_table(
+    extents=(0, 2.5, 5, 5.01, 10, 14.99, 15, 15.01, 30, 100),
+    max_findings: int = len(ILA_FINDING_KEYS),
+) -> List[Tuple]:
+    """
+    ILA_DECISION_TABLE'ı _determine_risk ile karşılaştır.
+
+    Her tablo anahtarı için bandın içindeki tüm yaygınlık değerleri ve
+    bulgu sayıları denenir; tablo kapsamı eksikse veya bir girdide
+    _determine_risk farklı risk veriyorsa (anahtar, yaygınlık, bulgu
+    sayısı, beklenen, tablodaki) satırı döner. Boş liste = tam uyum.
+    """
+    classifier = ILAClassifier()
+    mismatches = []
+    for subpleural, fibrotic, extent, count in product(
+        (False, True), (False, True), extents, range(max_findings + 1)
+    ):
+        if fibrotic and count == 0:
+            continue
+        key = (True, subpleural, fibrotic, ila_extent_band(extent), count > 1)
+        category = _ila_category(subpleural, fibrotic)
+        expected = classifier._determine_risk(category, extent, fibrotic, count)
+        template = ILA_DECISION_TABLE.get(key)
+        actual = template.risk_level if template else None
+        if actual != expected or (template and template.category != category):
+            mismatches.append((key, extent, count, expected, actual))
+    return mismatches
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+ILA Tarama Kohortlarında Boylamsal Progresyon Analizi
+
+Her hastanın ardışık ILA değerlendirmeleri hasta kimliği ve tetkik
+tarihine göre tek bir sıralama (np.lexsort) ile birleştirilir; iç içe
+döngü kullanılmaz. Tüm hesaplar sıralı sütun dizileri üzerinde tek
+geçişte yapılır:
+
+  - Geçiş kayıtları: ardışık iki tetkik arasında kategori değişimi,
+    risk artışı, fibrotik dönüşüm, yaygınlık değişimi ve yıllık eğimi
+  - Hasta özeti: tetkik sayısı, ilk/son kategori, en küçük kareler
+    yaygınlık eğimi (%/yıl), takip işareti
+  - Geçiş matrisleri: kategori (4×4) ve risk düzeyi (3×3)
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from config.findings_taxonomy import ILA_FINDING_KEYS
+from modules.batch_engine import encode_key_column
+from modules.ila_classifier import (
+    ILABatchResult,
+    ILAClassifier,
+    ILA_CATEGORY_KEYS,
+    ILA_CATEGORY_LABELS,
+    ILA_RISK_LEVELS,
+)
+
+
+_DAYS_PER_YEAR = 365.25
+
+
+@dataclass
+class ILAProgressionResult:
+    """Kohort progresyon analizi sonucu."""
+    transitions: pd.DataFrame       # ardışık tetkik çifti başına bir satır
+    patients: pd.DataFrame          # hasta başına bir satır
+    category_matrix: pd.DataFrame   # önceki kategori × sonraki kategori
+    risk_matrix: pd.DataFrame       # önceki risk × sonraki risk
+
+    @property
+    def flagged_patients(self) -> pd.DataFrame:
+        """Fibrotik dönüşüm veya yaygınlık artışı nedeniyle işaretlenen hastalar."""
+        return self.patients[self.patients["follow_up_flag"]]
+
+
+def encode_ila_frame(df: pd.DataFrame) -> ILABatchResult:
+    """
+    Tarama tablosundaki ILA girdilerini toplu sınıflandır.
+
+    Beklenen sütunlar: ila_present, ila_subpleural, ila_extent ve
+    ila_finding_mask (bit sırası = ILA_FINDING_KEYS) veya ";" ile
+    ayrılmış ila_findings.
+    """
+    if "ila_finding_mask" in df.columns:
+        mask = df["ila_finding_mask"].fillna(0).astype(np.int64).to_numpy()
+    elif "ila_findings" in df.columns:
+        bits = encode_key_column(df["ila_findings"], ILA_FINDING_KEYS)
+        mask = bits.astype(np.int64) @ (1 << np.arange(len(ILA_FINDING_KEYS), dtype=np.int64))
+    else:
+        raise ValueError("ILA bulgu sütunu bulunamadı: 'ila_finding_mask' veya 'ila_findings' gereklidir.")
+    return ILAClassifier().classify_batch(
+        df["ila_present"].fillna(False).astype(bool).to_numpy(),
+        df["ila_subpleural"].fillna(False).astype(bool).to_numpy(),
+        df["ila_extent"].fillna(0).astype(np.float64).to_numpy(),
+        mask,
+    )
+
+
+class ILAProgressionAnalyzer:
+    """
+    Hasta bazlı ardışık ILA sonuçlarından geçiş kayıtları ve
+    geçiş matrisleri üretir.
+    """
+
+    def __init__(self, extent_slope_threshold: float = 0.0):
+        # Bu değerin üzerindeki yaygınlık eğimi (%/yıl) takip işareti oluşturur
+        self.extent_slope_threshold = extent_slope_threshold
+
+    def analyze_frame(self, df: pd.DataFrame) -> ILAProgressionResult:
+        """
+        patient_id, study_date ve ILA sütunlarını içeren tarama
+        tablosunu analiz et (bkz. encode_ila_frame).
+        """
+        return self.analyze(df["patient_id"], df["study_date"], encode_ila_frame(df))
+
+    def analyze(self, patient_ids, study_dates, ila: ILABatchResult) -> ILAProgressionResult:
+        """
+        Args:
+            patient_ids: (N,) hasta / protokol numaraları
+            study_dates: (N,) tetkik tarihleri (tarih veya ISO metin)
+            ila: N tetkikin toplu ILA sonucu (ILAClassifier.classify_batch)
+
+        Returns:
+            ILAProgressionResult objesi
+
+        Raises:
+            ValueError: Hasta kimliği boş olan tetkik varsa
+        """
+        ids = pd.Series(np.asarray(patient_ids, dtype=object))
+        missing = np.flatnonzero(ids.isna().to_numpy() | (ids.astype(str).str.strip() == "").to_numpy())
+        if len(missing):
+            rows = ", ".join(str(i + 1) for i in missing[:10])
+            more = f" (+{len(missing) - 10})" if len(missing) > 10 else ""
+            raise ValueError(f"Hasta kimliği boş tetkikler var (satır {rows}{more}).")
+        codes, uniques = pd.factorize(ids.to_numpy())
+        days = pd.to_datetime(np.asarray(study_dates)).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+        # Tek sıralama: hasta, sonra tarih (kararlı → aynı gün girişleri sırasını korur)
+        order = np.lexsort((days, codes))
+        pid = codes[order]
+        day = days[order]
+        category = ila.category[order].astype(np.int64)
+        risk = ila.risk[order].astype(np.int64)
+        extent = ila.extent_percent[order]
+        fibrotic = ila.has_fibrotic_features[order] & ila.ila_present[order]
+
+        transitions = self._transitions(uniques, pid, day, category, risk, extent, fibrotic)
+        patients = self._patients(uniques, pid, day, category, risk, extent, transitions)
+
+        n_cat, n_risk = len(ILA_CATEGORY_KEYS), len(ILA_RISK_LEVELS)
+        same = pid[1:] == pid[:-1]
+        category_matrix = np.bincount(
+            category[:-1][same] * n_cat + category[1:][same], minlength=n_cat * n_cat,
+        ).reshape(n_cat, n_cat)
+        risk_matrix = np.bincount(
+            risk[:-1][same] * n_risk + risk[1:][same], minlength=n_risk * n_risk,
+        ).reshape(n_risk, n_risk)
+        category_labels = [ILA_CATEGORY_LABELS[key] for key in ILA_CATEGORY_KEYS]
+
+        return ILAProgressionResult(
+            transitions=transitions,
+            patients=patients,
+            category_matrix=pd.DataFrame(category_matrix, index=category_labels, columns=category_labels),
+            risk_matrix=pd.DataFrame(risk_matrix, index=list(ILA_RISK_LEVELS), columns=list(ILA_RISK_LEVELS)),
+        )
+
+    # =============================================
+    # GEÇİŞ KAYITLARI
+    # =============================================
+    @staticmethod
+    def _transitions(uniques, pid, day, category, risk, extent, fibrotic) -> pd.DataFrame:
+        # Ardışık satırlar aynı hastaya aitse bir geçiştir
+        same = pid[1:] == pid[:-1]
+        prev = np.flatnonzero(same)
+        nxt = prev + 1
+
+        interval = day[nxt] - day[prev]
+        extent_delta = extent[nxt] - extent[prev]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(interval > 0, extent_delta / (interval / _DAYS_PER_YEAR), np.nan)
+
+        categories = list(ILA_CATEGORY_KEYS)
+        risks = list(ILA_RISK_LEVELS)
+        return pd.DataFrame({
+            "patient_id": uniques[pid[prev]],
+            "from_date": day[prev].astype("datetime64[D]"),
+            "to_date": day[nxt].astype("datetime64[D]"),
+            "from_category": pd.Categorical.from_codes(category[prev], categories=categories),
+            "to_category": pd.Categorical.from_codes(category[nxt], categories=categories),
+            "category_changed": category[prev] != category[nxt],
+            "from_risk": pd.Categorical.from_codes(risk[prev], categories=risks, ordered=True),
+            "to_risk": pd.Categorical.from_codes(risk[nxt], categories=risks, ordered=True),
+            "risk_escalation": risk[nxt] > risk[prev],
+            "fibrotic_conversion": ~fibrotic[prev] & fibrotic[nxt],
+            "extent_delta": extent_delta,
+            "extent_slope": slope,
+        })
+
+    # =============================================
+    # HASTA ÖZETİ
+    # =============================================
+    def _patients(self, uniques, pid, day, category, risk, extent, transitions) -> pd.DataFrame:
+        # Sıralı dizide her hastanın ilk satırı (0. satır her zaman bir başlangıçtır)
+        first = np.ones(len(pid), dtype=bool)
+        first[1:] = pid[1:] != pid[:-1]
+        starts = np.flatnonzero(first)
+        ends = np.append(starts[1:], len(pid))[:len(starts)] - 1
+        n = (ends - starts + 1).astype(np.float64)
+
+        # En küçük kareler eğimi: x = ilk tetkikten itibaren yıl
+        x = (day - np.repeat(day[starts], ends - starts + 1)) / _DAYS_PER_YEAR
+        sx = np.add.reduceat(x, starts)
+        sy = np.add.reduceat(extent, starts)
+        sxx = np.add.reduceat(x * x, starts)
+        sxy = np.add.reduceat(x * extent, starts)
+        denom = n * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(denom > 0, (n * sxy - sx * sy) / denom, np.nan)
+
+        # Hasta başına geçiş bayrakları (geçişler zaten hasta sırasında)
+        t_pid = pid[np.flatnonzero(pid[1:] == pid[:-1])]
+        n_patients = len(starts)
+        any_conversion = np.bincount(
+            t_pid, weights=transitions["fibrotic_conversion"].to_numpy(), minlength=len(uniques),
+        )[pid[starts]] > 0
+        any_escalation = np.bincount(
+            t_pid, weights=transitions["risk_escalation"].to_numpy(), minlength=len(uniques),
+        )[pid[starts]] > 0
+        extent_growth = np.nan_to_num(slope, nan=0.0) > self.extent_slope_threshold
+
+        categories = list(ILA_CATEGORY_KEYS)
+        risks = list(ILA_RISK_LEVELS)
+        return pd.DataFrame({
+            "patient_id": uniques[pid[starts]],
+            "n_exams": n.astype(np.int64),
+            "first_date": day[starts].astype("datetime64[D]"),
+            "last_date": day[ends].astype("datetime64[D]"),
+            "first_category": pd.Categorical.from_codes(category[starts], categories=categories),
+            "last_category": pd.Categorical.from_codes(category[ends], categories=categories),
+            "first_risk": pd.Categorical.from_codes(risk[starts], categories=risks, ordered=True),
+            "last_risk": pd.Categorical.from_codes(risk[ends], categories=risks, ordered=True),
+            "max_risk": pd.Categorical.from_codes(
+                np.maximum.reduceat(risk, starts), categories=risks, ordered=True,
+            ),
+            "first_extent": extent[starts],
+            "last_extent": extent[ends],
+            "extent_slope": slope,
+            "fibrotic_conversion": any_conversion,
+            "risk_escalation": any_escalation,
+            "follow_up_flag": any_conversion | extent_growth,
+        }, index=pd.RangeIndex(n_patients))
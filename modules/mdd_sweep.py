@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+MDD Eşik Taraması
+
+MDD kurulu, öneri eşikleri (MDD_THRESHOLDS) değiştiğinde iş yükünün
+nasıl değişeceğini görmek ister. Bu modül arşivlenmiş vakaları bir kez
+skorlar ve bir eşik ızgarasının tüm noktalarını tek geçişte değerlendirir:
+
+  - Skorlar eşiklerden bağımsızdır; her vaka için MDD girdileri
+    (erken gerekçe, ilk iki skor, primer UIP türü) bir kez hesaplanır
+  - Aynı girdili vakalar tekilleştirilip ağırlıklandırılır
+  - mdd_reason_codes (tekil girdi × ızgara noktası) matrisinde
+    yayınlanarak çalıştırılır; gerekçe kodları ızgara noktası başına sayılır
+
+Sonuç: ızgara noktası başına MDD sevk oranı ve gerekçe kodu dağılımı.
+"""
+
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config.pattern_definitions import MDD_THRESHOLDS
+from modules.batch_engine import (
+    MDD_CODES,
+    BatchDecisionEngine,
+    CompiledRuleset,
+    encode_case_frame,
+    mdd_reason_codes,
+    mdd_recommended,
+)
+
+
+# Yayınlanan kod matrisi parça boyutu (tekil girdi × ızgara noktası)
+SWEEP_BLOCK_SIZE = 4_000_000
+
+_INPUT_COLUMNS = ("early", "top_score", "second_score", "top_uip_definite", "top_uip_probable")
+
+
+def threshold_grid(ruleset: Optional[CompiledRuleset] = None, **values: Sequence[float]) -> pd.DataFrame:
+    """
+    Eşik ızgarası: verilen değer listelerinin tüm kombinasyonları.
+
+    Verilmeyen eşikler kural setindeki (varsayılan MDD_THRESHOLDS) değerde
+    sabit tutulur. Örn: threshold_grid(close_gap=[10, 15, 20], low_confidence=range(60, 81, 5))
+    """
+    current = ruleset.mdd_thresholds if ruleset is not None else MDD_THRESHOLDS
+    unknown = set(values) - set(current)
+    if unknown:
+        raise ValueError(f"Bilinmeyen MDD eşiği: {sorted(unknown)}")
+    axes = [list(values.get(key, [current[key]])) for key in current]
+    return pd.DataFrame(list(itertools.product(*axes)), columns=list(current), dtype=np.float64)
+
+
+@dataclass
+class MddSweepResult:
+    """Izgara noktası başına MDD iş yükü."""
+    n_cases: int
+    grid: pd.DataFrame              # eşikler + mdd_cases + mdd_rate
+    reason_counts: pd.DataFrame     # ızgara noktası × MDD_CODES
+    seconds: float
+
+    @property
+    def reason_rates(self) -> pd.DataFrame:
+        return self.reason_counts / max(self.n_cases, 1)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Eşikler, MDD oranı ve gerekçe kodu sayıları tek tabloda."""
+        return pd.concat([self.grid, self.reason_counts], axis=1)
+
+
+class MddThresholdSweep:
+    """
+    Kohort parçalarında eşik ızgarasını birlikte değerlendirir.
+
+    Args:
+        grid: threshold_grid çıktısı (sütunlar = MDD_THRESHOLDS anahtarları)
+        ruleset: Skorlama kural seti (varsayılan güncel tanımlar)
+    """
+
+    def __init__(self, grid: pd.DataFrame, ruleset: Optional[CompiledRuleset] = None):
+        self.engine = BatchDecisionEngine(ruleset)
+        missing = set(self.engine.ruleset.mdd_thresholds) - set(grid.columns)
+        if missing:
+            raise ValueError(f"Izgarada eksik MDD eşiği: {sorted(missing)}")
+        self.grid = grid.reset_index(drop=True)
+        self._thresholds = {
+            key: self.grid[key].to_numpy(dtype=np.float64)[None, :]
+            for key in self.engine.ruleset.mdd_thresholds
+        }
+        self.reset()
+
+    def reset(self) -> None:
+        self._counts = np.zeros((len(self.grid), len(MDD_CODES)), dtype=np.int64)
+        self._n = 0
+        self._seconds = 0.0
+
+    def add(self, cases: pd.DataFrame) -> None:
+        """Kohort parçasını değerlendir (encode_case_frame biçimi)."""
+        start = time.perf_counter()
+        engine = self.engine
+        X, C = encode_case_frame(cases)
+        has_findings = X.any(axis=1)
+        counts = engine.count_features(engine.expand(X))
+        scores = engine.score_counts(counts, has_findings, C)
+        inputs = engine.mdd_inputs(counts, has_findings, scores)
+
+        stacked = np.column_stack([inputs[name].astype(np.float64) for name in _INPUT_COLUMNS])
+        unique, weights = np.unique(stacked, axis=0, return_counts=True)
+        self._accumulate(unique, weights)
+        self._n += len(cases)
+        self._seconds += time.perf_counter() - start
+
+    def _accumulate(self, unique: np.ndarray, weights: np.ndarray) -> None:
+        n_grid, n_codes = self._counts.shape
+        offsets = np.arange(n_grid) * n_codes
+        block = max(1, SWEEP_BLOCK_SIZE // n_grid)
+        for lo in range(0, len(unique), block):
+            rows = unique[lo:lo + block]
+            codes = mdd_reason_codes(
+                early=rows[:, [0]].astype(np.int8),
+                top_score=rows[:, [1]],
+                second_score=rows[:, [2]],
+                top_uip_definite=rows[:, [3]].astype(bool),
+                top_uip_probable=rows[:, [4]].astype(bool),
+                thresholds=self._thresholds,
+            )
+            w = np.broadcast_to(weights[lo:lo + block, None], codes.shape)
+            self._counts += np.rint(
+                np.bincount((codes + offsets).ravel(), weights=w.ravel(), minlength=n_grid * n_codes)
+            ).astype(np.int64).reshape(n_grid, n_codes)
+
+    def result(self) -> MddSweepResult:
+        reason_counts = pd.DataFrame(self._counts.copy(), columns=list(MDD_CODES))
+        mdd_cases = self._counts[:, mdd_recommended(np.arange(len(MDD_CODES)))].sum(axis=1)
+        grid = self.grid.copy()
+        grid["mdd_cases"] = mdd_cases
+        grid["mdd_rate"] = mdd_cases / max(self._n, 1)
+        return MddSweepResult(
+            n_cases=self._n,
+            grid=grid,
+            reason_counts=reason_counts,
+            seconds=self._seconds,
+        )
+
+
+def sweep_mdd_thresholds(
+    cohort: Iterable[pd.DataFrame],
+    grid: Optional[pd.DataFrame] = None,
+    ruleset: Optional[CompiledRuleset] = None,
+) -> MddSweepResult:
+    """
+    Kohort parçaları (ör. CaseArchive.iter_cases) üzerinde eşik taraması.
+
+    grid verilmezse güncel eşikler etrafında varsayılan ızgara kullanılır.
+    Arşiv kayıtlarında sigara ve başvuru şekli tutulmaz; bu bağlam
+    özellikleri motor varsayılanlarıyla değerlendirilir.
+    """
+    if grid is None:
+        grid = threshold_grid(
+            ruleset,
+            close_gap=[5, 10, 15, 20, 25],
+            close_second_min=[10, 20, 30],
+            low_confidence=[50, 60, 70, 80],
+            uip_definite_high=[80, 85, 90, 95],
+        )
+    sweep = MddThresholdSweep(grid, ruleset)
+    for chunk in cohort:
+        sweep.add(chunk)
+    return sweep.result()
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+2025 Nomenklatur Göçü
+
+Eski sonuç dışa aktarımları ve arşiv kayıtları 2025 öncesi patern
+anahtarlarını (dip, hp_fibrotic, aip, nsip ...) ve görüntüleme adlarını
+taşır. Bu modül:
+
+  - Anahtar / ad sütunlarını kategorik kodlar üzerinden vektörize eşler
+    (her tekil değer bir kez çevrilir, satırlar kod dizisiyle yeniden kurulur)
+  - Büyük JSONL / Parquet sonuç arşivlerini tek geçişte, akış halinde
+    2025 anahtar ve adlarına yeniden yazar (migrate_result_archive)
+  - Her parçadan sonra kontrol noktası yazar; yarıda kalan göç aynı
+    komutla kaldığı yerden devam eder
+
+Eşlemeler: NOMENCLATURE_2025_MAP (anahtar), DISPLAY_NAME_MAP (ad).
+"""
+
+import copy
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.pattern_definitions import DISPLAY_NAME_MAP, NOMENCLATURE_2025_MAP
+
+
+# Sonuç tablolarında patern anahtarı / adı taşıyan alanlar
+PATTERN_KEY_FIELDS = ("primary_pattern", "second_pattern", "pattern_key")
+PATTERN_NAME_FIELDS = ("primary_name", "second_name", "pattern_name")
+
+ARCHIVE_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+def resolve_pattern_key(key: str) -> str:
+    """Eski patern anahtarını 2025 nomenklaturuna çevir."""
+    return NOMENCLATURE_2025_MAP.get(key, key)
+
+
+def resolve_display_name(name: str) -> str:
+    """Eski patern adını 2025 görüntüleme adına çevir."""
+    return DISPLAY_NAME_MAP.get(name, name)
+
+
+# =============================================
+# VEKTÖRİZE EŞLEME
+# =============================================
+def _remap_codes(codes: np.ndarray, categories: Sequence, mapping: Mapping) -> Tuple[np.ndarray, pd.Index]:
+    """Kategori başına bir kez eşle; birleşen kategorileri yeniden kodla."""
+    mapped = [mapping.get(c, c) for c in categories]
+    inverse, uniques = pd.factorize(np.array(mapped, dtype=object))
+    return np.where(codes >= 0, inverse[np.maximum(codes, 0)], -1), uniques
+
+
+def remap_values(values, mapping: Mapping) -> pd.Series:
+    """
+    Sütun değerlerini eşlemeyle çevir (eşlemede olmayanlar aynen kalır).
+
+    Kategorik sütunlar kategorik kalır (eski ve yeni anahtar birlikte
+    varsa tek kategoride birleşir); diğerleri object sütun olarak döner.
+    Eksik değerler korunur.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = _remap_codes(series.cat.codes.to_numpy(), series.cat.categories, mapping)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=series.index, name=series.name)
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    new_codes, new_uniques = _remap_codes(codes, uniques, mapping)
+    out = np.asarray(new_uniques, dtype=object)[np.maximum(new_codes, 0)]
+    out[codes < 0] = series.to_numpy(dtype=object)[codes < 0]
+    return pd.Series(out, index=series.index, name=series.name, dtype=object)
+
+
+def resolve_pattern_keys(values) -> pd.Series:
+    """Patern anahtarı sütununu 2025 nomenklaturuna çevir."""
+    return remap_values(values, NOMENCLATURE_2025_MAP)
+
+
+def resolve_display_names(values) -> pd.Series:
+    """Patern adı sütununu 2025 görüntüleme adlarına çevir."""
+    return remap_values(values, DISPLAY_NAME_MAP)
+
+
+def migrate_frame(
+    frame: pd.DataFrame,
+    key_fields: Sequence[str] = PATTERN_KEY_FIELDS,
+    name_fields: Sequence[str] = PATTERN_NAME_FIELDS,
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Tablodaki anahtar ve ad sütunlarını çevir.
+
+    İç içe sütunlar (ör. Parquet list<struct> ranked_patterns) JSONL
+    kayıtlarıyla aynı kuralla, migrate_records üzerinden çevrilir.
+
+    Returns:
+        (yeni tablo, değişen satır sayısı)
+    """
+    frame = frame.copy()
+    changed = np.zeros(len(frame), dtype=bool)
+    for fields, mapping in ((key_fields, NOMENCLATURE_2025_MAP), (name_fields, DISPLAY_NAME_MAP)):
+        for column in fields:
+            if column not in frame.columns:
+                continue
+            old = frame[column]
+            new = remap_values(old, mapping)
+            changed |= (old.astype(object).to_numpy() != new.astype(object).to_numpy()) & old.notna().to_numpy()
+            frame[column] = new
+    for column in frame.columns:
+        if not _is_nested(frame[column]):
+            continue
+        values = copy.deepcopy(frame[column].to_numpy(dtype=object))
+        changed |= migrate_records(values, key_fields, name_fields)
+        frame[column] = pd.Series(values, index=frame.index, dtype=object)
+    return frame, int(changed.sum())
+
+
+def _is_nested(series: pd.Series) -> bool:
+    """Sütun sözlük / liste değerleri taşıyor mu (ilk dolu değere göre)."""
+    if series.dtype != object:
+        return False
+    first = series.first_valid_index()
+    return first is not None and isinstance(series[first], (dict, list, np.ndarray))
+
+
+def _collect_fields(node, key_fields, name_fields, refs) -> None:
+    """JSON kaydındaki (iç içe dahil) anahtar / ad alanlarının konumları."""
+    if isinstance(node, dict):
+        for field, value in node.items():
+            if isinstance(value, str):
+                if field in key_fields:
+                    refs[0].append((node, field))
+                elif field in name_fields:
+                    refs[1].append((node, field))
+            elif isinstance(value, (dict, list, np.ndarray)):
+                _collect_fields(value, key_fields, name_fields, refs)
+    elif isinstance(node, (list, np.ndarray)):
+        for item in node:
+            if isinstance(item, (dict, list, np.ndarray)):
+                _collect_fields(item, key_fields, name_fields, refs)
+
+
+def migrate_records(
+    records: Sequence[Dict],
+    key_fields: Sequence[str] = PATTERN_KEY_FIELDS,
+    name_fields: Sequence[str] = PATTERN_NAME_FIELDS,
+) -> np.ndarray:
+    """
+    JSON kayıtlarını yerinde çevir (ör. ranked_patterns içindeki alanlar dahil).
+
+    Tüm kayıtların alan değerleri tek dizide toplanıp birlikte eşlenir.
+
+    Returns:
+        (N,) kayıt değişti mi
+    """
+    changed = np.zeros(len(records), dtype=bool)
+    key_fields, name_fields = set(key_fields), set(name_fields)
+    found = [], []
+    owners = [], []
+    for i, record in enumerate(records):
+        sizes = len(found[0]), len(found[1])
+        _collect_fields(record, key_fields, name_fields, found)
+        for k in (0, 1):
+            owners[k].extend([i] * (len(found[k]) - sizes[k]))
+    for refs, record_index, mapping in zip(found, owners, (NOMENCLATURE_2025_MAP, DISPLAY_NAME_MAP)):
+        if not refs:
+            continue
+        old = np.array([node[field] for node, field in refs], dtype=object)
+        new = remap_values(old, mapping).to_numpy()
+        for j in np.flatnonzero(old != new):
+            node, field = refs[j]
+            node[field] = new[j]
+            changed[record_index[j]] = True
+    return changed
+
+
+# =============================================
+# AKIŞ HALİNDE ARŞİV GÖÇÜ
+# =============================================
+@dataclass
+class MigrationSummary:
+    """Arşiv göçü özeti (devam eden göçlerde toplamlar kontrol noktasından)."""
+    source: str
+    destination: str
+    format: str
+    rows: int
+    changed_rows: int
+    chunks: int
+    resumed: bool
+    seconds: float
+
+
+def _source_signature(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "source_size": stat.st_size, "source_mtime": stat.st_mtime_ns}
+
+
+def _write_checkpoint(path: str, state: Dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _load_checkpoint(path: str, signature: Dict, fmt: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    if {k: state.get(k) for k in signature} != signature or state.get("format") != fmt:
+        raise ValueError(
+            f"Kontrol noktası farklı bir kaynak dosyaya ait: {path}. "
+            "Kaynak değiştiyse kontrol noktasını silip göçü yeniden başlatın."
+        )
+    return state
+
+
+def _migrate_jsonl(source, destination, state, save, chunk_size, key_fields, name_fields) -> None:
+    """Satır parçaları; değişmeyen satırlar bayt olarak aynen yazılır."""
+    mode = "r+b" if state["chunks"] else "wb"
+    with open(source, "rb") as src, open(destination, mode) as dst:
+        src.seek(state["input_offset"])
+        dst.seek(state["output_offset"])
+        dst.truncate()
+        while True:
+            lines = []
+            while len(lines) < chunk_size:
+                line = src.readline()
+                if not line:
+                    break
+                lines.append(line)
+            if not lines:
+                return
+            content = [i for i, line in enumerate(lines) if line.strip()]
+            records = [json.loads(lines[i]) for i in content]
+            changed = migrate_records(records, key_fields, name_fields)
+            for j in np.flatnonzero(changed):
+                line = lines[content[j]]
+                ending = line[len(line.rstrip(b"\r\n")):]
+                lines[content[j]] = json.dumps(records[j], ensure_ascii=False).encode("utf-8") + ending
+            dst.writelines(lines)
+            dst.flush()
+            os.fsync(dst.fileno())
+            state["rows"] += len(records)
+            state["changed_rows"] += int(changed.sum())
+            state["chunks"] += 1
+            state["input_offset"] = src.tell()
+            state["output_offset"] = dst.tell()
+            save(state)
+
+
+def _migrate_parquet(source, destination, state, save, chunk_size, key_fields, name_fields) -> None:
+    """
+    Satır grubu başına bir parça dosyası (destination/part-NNNNN.parquet).
+
+    Yarım kalan Parquet dosyası devam ettirilemediği için kontrol noktası
+    satır grubu sınırındadır; çıktı dizini pd.read_parquet ile okunur.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(source)
+    os.makedirs(destination, exist_ok=True)
+    for group in range(state["row_group"], parquet.num_row_groups):
+        part = os.path.join(destination, f"part-{group:05d}.parquet")
+        writer = None
+        try:
+            for batch in parquet.iter_batches(batch_size=chunk_size, row_groups=[group]):
+                frame, changed = migrate_frame(batch.to_pandas(), key_fields, name_fields)
+                table = pa.Table.from_pandas(frame, schema=batch.schema, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(part + ".tmp", table.schema)
+                writer.write_table(table)
+                state["rows"] += len(frame)
+                state["changed_rows"] += changed
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            os.replace(part + ".tmp", part)
+        state["row_group"] = group + 1
+        state["chunks"] += 1
+        save(state)
+
+
+def migrate_result_archive(
+    source: str,
+    destination: str,
+    checkpoint: Optional[str] = None,
+    chunk_size: int = 100_000,
+    key_fields: Sequence[str] = PATTERN_KEY_FIELDS,
+    name_fields: Sequence[str] = PATTERN_NAME_FIELDS,
+) -> MigrationSummary:
+    """
+    JSONL / Parquet sonuç arşivini 2025 anahtar ve adlarına yeniden yaz.
+
+    Args:
+        source: .jsonl / .ndjson / .parquet kaynak dosya
+        destination: JSONL için çıktı dosyası, Parquet için çıktı dizini
+        checkpoint: Kontrol noktası dosyası (varsayılan destination + ".checkpoint.json");
+            varsa göç kaldığı yerden devam eder, tamamlanınca silinir
+        chunk_size: Parça başına satır
+
+    Raises:
+        ValueError: Desteklenmeyen biçim veya kaynağı değişmiş kontrol noktası
+    """
+    fmt = ARCHIVE_FORMATS.get(os.path.splitext(source)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Desteklenmeyen arşiv biçimi: {source} (.jsonl, .ndjson, .parquet)")
+    checkpoint = checkpoint or destination.rstrip("/\\") + CHECKPOINT_SUFFIX
+    signature = _source_signature(source)
+    start = time.perf_counter()
+
+    state = _load_checkpoint(checkpoint, signature, fmt)
+    resumed = state is not None
+    if state is None:
+        state = {
+            **signature, "format": fmt, "rows": 0, "changed_rows": 0, "chunks": 0,
+            "input_offset": 0, "output_offset": 0, "row_group": 0,
+        }
+
+    migrate = _migrate_jsonl if fmt == "jsonl" else _migrate_parquet
+    migrate(
+        source, destination, state,
+        lambda s: _write_checkpoint(checkpoint, s),
+        chunk_size, key_fields, name_fields,
+    )
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return MigrationSummary(
+        source=source,
+        destination=destination,
+        format=fmt,
+        rows=state["rows"],
+        changed_rows=state["changed_rows"],
+        chunks=state["chunks"],
+        resumed=resumed,
+        seconds=time.perf_counter() - start,
+    )
+
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Yapısal Rapor Karşılaştırması
+
+Takip BT'lerinde güncel rapor modeli önceki rapor modeliyle metin
+olarak değil, bölüm bölüm ve alan alan karşılaştırılır: yeni / kaybolan
+bulgular, primer patern ve güven değişimi, MDD kararı ve ILA
+kategori / risk / yaygınlık değişimi.
+
+Model bölümleri değişmez demetler olduğundan eşit bölümler tek bir
+karşılaştırmayla atlanır; yalnızca farklı bölümlerin alanlarına
+bakılır. Sonuç ReportComparison olarak modele eklenir ve
+ReportGenerator tarafından "KARŞILAŞTIRMA" bölümü olarak yazılır.
+"""
+
+from dataclasses import replace
+from typing import Iterable, List, Optional
+
+from modules.report_model import (
+    ReportChange,
+    ReportComparison,
+    ReportModel,
+    compile_finding_index,
+)
+
+
+# Bu değerin altındaki skor / yaygınlık farkları (yuvarlanmış %) değişiklik sayılmaz
+MIN_PERCENT_CHANGE = 1
+
+_CLINICAL_FIELDS = ("indication", "presentation", "smoking", "pack_years", "exposure", "ctd")
+
+
+def _percent(value: float) -> str:
+    return f"%{value:.0f}"
+
+
+def _clinical_changes(prior, current, out: List[ReportChange]) -> None:
+    for i, name in enumerate(_CLINICAL_FIELDS):
+        if prior[i] != current[i]:
+            out.append(ReportChange("clinical", name, "changed", str(prior[i]), str(current[i])))
+
+
+def _finding_changes(prior_keys, current_keys, out: List[ReportChange]) -> None:
+    index = compile_finding_index()
+    prior_set, current_set = set(prior_keys), set(current_keys)
+    # Güncel / önceki sırası korunur (rapordaki bulgu sırası)
+    for key in current_keys:
+        if key not in prior_set and key in index:
+            out.append(ReportChange("findings", key, "added", "", index[key][1]))
+    for key in prior_keys:
+        if key not in current_set and key in index:
+            out.append(ReportChange("findings", key, "removed", index[key][1], ""))
+
+
+def _diagnosis_changes(prior, current, out: List[ReportChange]) -> None:
+    if prior is None or current is None:
+        if current is not None:
+            out.append(ReportChange("diagnosis", "primary", "added", "", current.primary.name))
+        else:
+            out.append(ReportChange("diagnosis", "primary", "removed", prior.primary.name, ""))
+        return
+
+    p, c = prior.primary, current.primary
+    if p.key != c.key:
+        out.append(ReportChange("diagnosis", "primary", "changed", p.name, c.name))
+    if abs(round(c.score) - round(p.score)) >= MIN_PERCENT_CHANGE:
+        out.append(ReportChange("diagnosis", "score", "changed", _percent(p.score), _percent(c.score)))
+    if p.confidence_label != c.confidence_label:
+        out.append(ReportChange("diagnosis", "confidence", "changed", p.confidence_label, c.confidence_label))
+
+
+def _mdd_changes(prior, current, out: List[ReportChange]) -> None:
+    before = "Önerilir" if prior and prior.recommended else "Gerekmez"
+    after = "Önerilir" if current and current.recommended else "Gerekmez"
+    if before != after:
+        out.append(ReportChange("mdd", "recommended", "changed", before, after))
+
+
+def _ila_changes(prior, current, out: List[ReportChange]) -> None:
+    if prior is None or current is None:
+        if current is not None:
+            out.append(ReportChange("ila", "ila", "added", "", f"{current.category_label} — Risk: {current.risk_level}"))
+        else:
+            out.append(ReportChange("ila", "ila", "removed", f"{prior.category_label} — Risk: {prior.risk_level}", ""))
+        return
+
+    if prior.category != current.category:
+        out.append(ReportChange("ila", "category", "changed", prior.category_label, current.category_label))
+    if prior.risk_level != current.risk_level:
+        out.append(ReportChange("ila", "risk_level", "changed", prior.risk_level, current.risk_level))
+    if abs(round(current.extent_percent) - round(prior.extent_percent)) >= MIN_PERCENT_CHANGE:
+        out.append(ReportChange(
+            "ila", "extent", "changed", _percent(prior.extent_percent), _percent(current.extent_percent),
+        ))
+    if prior.has_fibrotic_features != current.has_fibrotic_features:
+        out.append(ReportChange(
+            "ila", "fibrotic", "changed",
+            "Var" if prior.has_fibrotic_features else "Yok",
+            "Var" if current.has_fibrotic_features else "Yok",
+        ))
+
+
+def compare_reports(prior: ReportModel, current: ReportModel) -> ReportComparison:
+    """
+    İki rapor modelini bölüm bölüm karşılaştır.
+
+    Hasta kimliği ve rapor zamanı karşılaştırılmaz; değişiklik yoksa
+    changes boş demettir.
+    """
+    changes: List[ReportChange] = []
+    if prior.clinical != current.clinical:
+        _clinical_changes(prior.clinical, current.clinical, changes)
+    if prior.finding_keys != current.finding_keys:
+        _finding_changes(prior.finding_keys, current.finding_keys, changes)
+    if prior.diagnosis != current.diagnosis:
+        _diagnosis_changes(prior.diagnosis, current.diagnosis, changes)
+    if prior.mdd != current.mdd:
+        _mdd_changes(prior.mdd, current.mdd, changes)
+    if prior.ila != current.ila:
+        _ila_changes(prior.ila, current.ila, changes)
+    return ReportComparison(prior_time=prior.report_time, changes=tuple(changes))
+
+
+def with_comparison(current: ReportModel, prior: Optional[ReportModel]) -> ReportModel:
+    """Güncel modele önceki raporla karşılaştırmayı ekle (prior yoksa model aynen döner)."""
+    if prior is None:
+        return current
+    return replace(current, comparison=compare_reports(prior, current))
+
+
+def compare_report_series(models: Iterable[ReportModel]) -> List[ReportComparison]:
+    """
+    Bir hastanın tarih sırasındaki raporlarını ardışık çiftler halinde
+    karşılaştır (boylamsal kohortlar için); n rapor → n − 1 karşılaştırma.
+    """
+    comparisons = []
+    prior = None
+    for model in models:
+        if prior is not None:
+            comparisons.append(compare_reports(prior, model))
+        prior = model
+    return comparisons
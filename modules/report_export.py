@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Çok Biçimli Rapor Dışa Aktarımı
+
+Aynı ReportModel'den (modules/report_model.py) üç çıktı üretilir:
+
+  - Düz metin (PACS/RIS) — ReportGenerator.render
+  - FHIR R4 DiagnosticReport (JSON)
+  - HL7 v2.5 ORU^R01 mesajı
+
+Oluşturucular modeli yalnızca okur; skor, sıralama veya etiket
+yeniden hesaplanmaz. export_reports her modeli tek geçişte tüm açık
+hedeflere yazar; toplu dışa aktarımda raporlar bellekte biriktirilmez.
+"""
+
+import base64
+import json
+import re
+from typing import Dict, IO, Iterable, List, Optional
+
+from modules.report_generator import ReportGenerator
+from modules.report_model import FINDING_GROUPS, ReportModel
+
+
+# Metin dosyasında ardışık raporlar arasındaki ayırıcı
+REPORT_SEPARATOR = "\f\n"
+
+# LOINC 24627-2: Chest CT
+_LOINC_SYSTEM = "http://loinc.org"
+_LOINC_CHEST_CT = "24627-2"
+_LOINC_CHEST_CT_DISPLAY = "Chest CT"
+_DIAGNOSTIC_SERVICE_SYSTEM = "http://terminology.hl7.org/CodeSystem/v2-0074"
+
+# Yerel gözlem kodları (FHIR Observation.code / HL7 OBX-3)
+_LOCAL_SYSTEM = "urn:ild-report:observation"
+_OBSERVATIONS = {
+    "pattern": "Primer YÇBT paterni",
+    "confidence": "Tanısal güven",
+    "findings": "BT bulguları",
+    "mdd": "MDD önerisi",
+    "ila": "ILA kategorisi",
+    "ila_risk": "ILA risk düzeyi",
+}
+
+_HL7_SEX = {"Erkek": "M", "Kadın": "F"}
+
+# "Hasta Adı / Protokol No" alanı: rakam içeren tek parça değer protokol numarasıdır
+_PROTOCOL_NO = re.compile(r"(?=\S*\d)[\w./-]+")
+
+
+# =============================================
+# ORTAK GÖZLEMLER
+# =============================================
+def _observations(model: ReportModel) -> List[tuple]:
+    """
+    Modelden (kod, değer türü, değer, birim) gözlem listesi.
+    FHIR ve HL7 oluşturucuları aynı listeyi kullanır.
+    """
+    obs = []
+    if model.diagnosis:
+        primary = model.diagnosis.primary
+        obs.append(("pattern", "ST", primary.name, ""))
+        obs.append(("confidence", "NM", f"{primary.score:.0f}", "%"))
+    for group, labels in model.finding_groups:
+        obs.append(("findings", "ST", f"{FINDING_GROUPS[group][1]}: {', '.join(labels)}", ""))
+    if model.mdd:
+        obs.append(("mdd", "ST", f"{'Önerilir' if model.mdd.recommended else 'Gerekmez'} — {model.mdd.reason}", ""))
+    if model.ila:
+        obs.append(("ila", "ST", model.ila.category_label, ""))
+        obs.append(("ila_risk", "ST", model.ila.risk_level, ""))
+    return obs
+
+
+# =============================================
+# FHIR R4 DiagnosticReport
+# =============================================
+def render_fhir(model: ReportModel, text: Optional[str] = None, report_id: str = "") -> Dict:
+    """
+    FHIR R4 DiagnosticReport kaynağı (dict; json.dumps ile yazılır).
+
+    Args:
+        model: Rapor modeli
+        text: Düz metin rapor (verilirse presentedForm olarak eklenir)
+        report_id: Kaynak kimliği (opsiyonel)
+    """
+    issued = model.report_time.isoformat(timespec="seconds")
+    observations = []
+    for i, (code, value_type, value, unit) in enumerate(_observations(model), 1):
+        observation = {
+            "resourceType": "Observation",
+            "id": f"obs{i}",
+            "status": "final",
+            "code": {"coding": [{"system": _LOCAL_SYSTEM, "code": code, "display": _OBSERVATIONS[code]}]},
+        }
+        if value_type == "NM":
+            observation["valueQuantity"] = {"value": float(value), "unit": unit}
+        else:
+            observation["valueString"] = value
+        observations.append(observation)
+
+    report = {
+        "resourceType": "DiagnosticReport",
+        "status": "final",
+        "category": [{"coding": [{"system": _DIAGNOSTIC_SERVICE_SYSTEM, "code": "RAD"}]}],
+        "code": {"coding": [{"system": _LOINC_SYSTEM, "code": _LOINC_CHEST_CT, "display": _LOINC_CHEST_CT_DISPLAY}]},
+        "effectiveDateTime": issued,
+        "issued": issued,
+        "contained": observations,
+        "result": [{"reference": f"#{o['id']}"} for o in observations],
+        "conclusion": " ".join(model.conclusion),
+    }
+    if report_id:
+        report["id"] = report_id
+    if model.patient.name:
+        report["subject"] = {"display": model.patient.name}
+    if text is not None:
+        report["presentedForm"] = [{
+            "contentType": "text/plain; charset=utf-8",
+            "data": base64.b64encode(text.encode("utf-8")).decode("ascii"),
+        }]
+    return report
+
+
+# =============================================
+# HL7 v2.5 ORU^R01
+# =============================================
+def _hl7_escape(value) -> str:
+    """HL7 ayırıcılarını kaçış dizilerine çevir (kaçış karakteri önce)."""
+    return (
+        str(value)
+        .replace("\\", "\\E\\")
+        .replace("|", "\\F\\")
+        .replace("^", "\\S\\")
+        .replace("&", "\\T\\")
+        .replace("~", "\\R\\")
+        .replace("\r", "")
+        .replace("\n", "\\.br\\")
+    )
+
+
+def _hl7_patient_fields(name: str) -> tuple:
+    """
+    PID-3 (hasta kimliği) ve PID-5 (hasta adı, soyad^ad) alanları.
+
+    Form değeri her zaman PID-5'e yazılır; protokol numarası ise ayrıca
+    PID-3 kimliği olarak gönderilir.
+    """
+    name = name.strip()
+    identifier = _hl7_escape(name) if _PROTOCOL_NO.fullmatch(name) else ""
+    parts = name.split()
+    if len(parts) > 1:
+        person = f"{_hl7_escape(parts[-1])}^{_hl7_escape(' '.join(parts[:-1]))}"
+    else:
+        person = _hl7_escape(name)
+    return identifier, person
+
+
+def render_hl7(model: ReportModel, text: Optional[str] = None, message_id: str = "") -> str:
+    """
+    HL7 v2.5 ORU^R01 mesajı (segmentler "\\r" ile ayrılır).
+
+    Args:
+        model: Rapor modeli
+        text: Düz metin rapor (verilirse satır başına bir TX OBX segmenti eklenir)
+        message_id: MSH-10 mesaj kontrol kimliği
+    """
+    ts = model.report_time.strftime("%Y%m%d%H%M%S")
+    patient = model.patient
+    identifier, person = _hl7_patient_fields(patient.name)
+    segments = [
+        f"MSH|^~\\&|ILD_REPORT||||{ts}||ORU^R01|{_hl7_escape(message_id)}|P|2.5",
+        f"PID|1||{identifier}||{person}|||{_HL7_SEX.get(patient.sex, 'U')}",
+        f"OBR|1|||{_LOINC_CHEST_CT}^{_LOINC_CHEST_CT_DISPLAY}^LN|||{ts}|||||||||||||||{ts}||CT|F",
+    ]
+    set_id = 0
+    for code, value_type, value, unit in _observations(model):
+        set_id += 1
+        segments.append(
+            f"OBX|{set_id}|{value_type}|{code}^{_hl7_escape(_OBSERVATIONS[code])}^L||"
+            f"{_hl7_escape(value)}|{unit}|||||F"
+        )
+    for sentence in model.conclusion:
+        set_id += 1
+        segments.append(f"OBX|{set_id}|TX|conclusion^Sonuç^L||{_hl7_escape(sentence)}||||||F")
+    if text is not None:
+        for line in text.split("\n"):
+            set_id += 1
+            segments.append(f"OBX|{set_id}|TX|report^Rapor metni^L||{_hl7_escape(line)}||||||F")
+    return "\r".join(segments) + "\r"
+
+
+# =============================================
+# TEK GEÇİŞTE TOPLU DIŞA AKTARIM
+# =============================================
+def export_reports(
+    models: Iterable[ReportModel],
+    text_file: Optional[IO[str]] = None,
+    fhir_file: Optional[IO[str]] = None,
+    hl7_file: Optional[IO[str]] = None,
+    generator: Optional[ReportGenerator] = None,
+    id_prefix: str = "",
+) -> int:
+    """
+    Her modeli bir kez okuyup açık hedeflerin tümüne yaz.
+
+    Args:
+        models: ReportModel akışı (ör. build_report_model üreteci)
+        text_file: Düz metin raporlar (REPORT_SEPARATOR ile ayrılmış)
+        fhir_file: FHIR DiagnosticReport kaynakları (NDJSON, satır başına bir rapor)
+        hl7_file: HL7 ORU mesajları (art arda)
+        generator: Metin oluşturucu (varsayılan yeni ReportGenerator)
+        id_prefix: Rapor / mesaj kimliklerinin öneki (kimlik = önek + sıra no)
+
+    Returns:
+        Yazılan rapor sayısı
+    """
+    generator = generator or ReportGenerator()
+    count = 0
+    for model in models:
+        count += 1
+        report_id = f"{id_prefix}{count}"
+        # Metin bir kez oluşturulur; FHIR presentedForm ve HL7 TX segmentleri aynı metni kullanır
+        text = generator.render(model)
+        if text_file is not None:
+            if count > 1:
+                text_file.write(REPORT_SEPARATOR)
+            text_file.write(text)
+            text_file.write("\n")
+        if fhir_file is not None:
+            fhir_file.write(json.dumps(render_fhir(model, text, report_id), ensure_ascii=False))
+            fhir_file.write("\n")
+        if hl7_file is not None:
+            hl7_file.write(render_hl7(model, text, report_id))
+    return count
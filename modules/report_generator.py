@@ -2,30 +2,272 @@
 """
 ILD Yapısal Radyoloji Raporu Oluşturucu
 PACS/RIS uyumlu düz metin rapor formatı
+
+Rapor düzeni yükleme sırasında bir kez derlenir: sabit bölümler
+(başlık bandı, ayırıcılar, bölüm başlıkları, alt bilgi) hazır metin
+parçalarıdır; değişken bölümler slot fonksiyonlarıyla doldurulur ve
+rapor tek bir "\\n".join ile birleştirilir.
+
+Rapor zamanı dışarıdan verilebilir (clock / report_time); aynı girdiler
+ve aynı zaman her zaman aynı metni üretir. Slot çıktıları (bölüm
+girdileri, şablon sürümü) anahtarıyla önbelleğe alınır; tek bir girdi
+değiştiğinde yalnızca ondan etkilenen bölümler yeniden oluşturulur.
+
+Metin, modules/report_model.ReportModel ara modelinden oluşturulur;
+FHIR / HL7 çıktıları (modules/report_export.py) aynı modeli kullanır.
 """
 
-from typing import Dict, List, Optional
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
 from datetime import datetime
 
-from config.findings_taxonomy import (
-    DISTRIBUTION_FINDINGS,
-    FIBROTIC_FINDINGS,
-    NON_FIBROTIC_FINDINGS,
-    SPECIFIC_FINDINGS,
-    ILA_FINDINGS,
+from config.findings_taxonomy import TAXONOMY_VERSION
+from modules.report_model import FINDING_GROUPS, ReportModel, build_report_model
+
+
+# Şablon sürümü — rapor düzeni veya bölüm metinleri değiştiğinde artırılır.
+# Bölüm önbelleği anahtarlarına dahildir.
+REPORT_TEMPLATE_VERSION = 1
+
+# BT bulguları bölümündeki satır önekleri (FINDING_GROUPS sırasında)
+_FINDING_PREFIXES = tuple(f"  {title}: " for _, title in FINDING_GROUPS)
+
+
+# =============================================
+# SLOTLAR
+# =============================================
+# Her slot (satırlar, model) alır ve satırları listeye ekler.
+
+def _clinical_slot(out: List[str], model: ReportModel) -> None:
+    patient, clinical = model.patient, model.clinical
+    if patient.name:
+        out.append(f"  Hasta: {patient.name}")
+    out.append(f"  Yaş/Cinsiyet: {patient.age}/{patient.sex}")
+    out.append(f"  Endikasyon: {clinical.indication}")
+    out.append(f"  Prezentasyon: {clinical.presentation}")
+
+    if clinical.smoking != "Hiç içmemiş" and clinical.pack_years > 0:
+        out.append(f"  Sigara: {clinical.smoking} ({clinical.pack_years} paket-yıl)")
+    else:
+        out.append(f"  Sigara: {clinical.smoking}")
+
+    if clinical.exposure != "Yok":
+        out.append(f"  Maruziyet: {clinical.exposure}")
+    if clinical.ctd != "Yok":
+        out.append(f"  CTD: {clinical.ctd}")
+    out.append("")
+
+
+def _findings_slot(out: List[str], model: ReportModel) -> None:
+    if not model.finding_keys:
+        out.append("  İnterstisyel akciğer hastalığı ile uyumlu bulgu saptanmamıştır.")
+    else:
+        for group, labels in model.finding_groups:
+            out.append(_FINDING_PREFIXES[group] + ", ".join(labels))
+    out.append("")
+
+
+def _diagnosis_slot(out: List[str], model: ReportModel) -> None:
+    if model.diagnosis:
+        primary = model.diagnosis.primary
+        out.append(f"  Primer YÇBT paterni: {primary.name}")
+        out.append(f"  Tanısal güven: %{primary.score:.0f} — {primary.confidence_label}")
+        out.append("")
+
+        # Ayırıcı tanı
+        if model.diagnosis.differential:
+            out.append("  Ayırıcı tanı:")
+            for i, p in enumerate(model.diagnosis.differential, 1):
+                out.append(f"    {i}. {p.name} (%{p.score:.0f})")
+            out.append("")
+
+        # İlişkili klinik tanılar
+        if primary.associated_diagnoses:
+            out.append("  İlişkili klinik tanılar:")
+            for diag in primary.associated_diagnoses:
+                out.append(f"    - {diag}")
+            out.append("")
+    else:
+        out.append(_NO_PATTERN_DIAGNOSIS)
+
+
+def _ila_slot(out: List[str], model: ReportModel) -> None:
+    ila = model.ila
+    if ila:
+        out.append(_ILA_HEADER)
+        out.append(f"  Kategori: {ila.category_label}")
+        out.append(f"  Risk düzeyi: {ila.risk_level}")
+        out.append(f"  Tutulum yaygınlığı: %{ila.extent_percent:.0f}")
+        out.append(f"  Fibrotik özellik: {'Var' if ila.has_fibrotic_features else 'Yok'}")
+        out.append(f"  Takip: {ila.follow_up}")
+        out.append("")
+
+
+def _mdd_slot(out: List[str], model: ReportModel) -> None:
+    mdd = model.mdd
+    if mdd:
+        out.append(_MDD_HEADER)
+        if mdd.recommended:
+            out.append("  >> MDD ÖNERİLİR")
+        else:
+            out.append("  MDD rutin olarak gerekmemektedir.")
+        out.append(f"  Gerekçe: {mdd.reason}")
+        out.append("")
+
+
+def _comparison_slot(out: List[str], model: ReportModel) -> None:
+    comparison = model.comparison
+    if comparison:
+        out.append(_COMPARISON_HEADER)
+        out.append(f"  Önceki rapor: {comparison.prior_time.strftime('%d.%m.%Y')}")
+        lines = comparison.lines
+        if lines:
+            for line in lines:
+                out.append("  " + line)
+        else:
+            out.append("  Önceki rapora göre değişiklik saptanmamıştır.")
+        out.append("")
+
+
+def _conclusion_slot(out: List[str], model: ReportModel) -> None:
+    for sentence in model.conclusion:
+        out.append("  " + sentence)
+
+
+@lru_cache(maxsize=64)
+def _timestamp_line(minute: datetime) -> str:
+    return f"Rapor tarihi: {minute.strftime('%d.%m.%Y %H:%M')}"
+
+
+def _timestamp_slot(out: List[str], model: ReportModel) -> None:
+    # Satır dakika çözünürlüğündedir; aynı dakikadaki raporlar önbellekten alır
+    out.append(_timestamp_line(model.report_time.replace(second=0, microsecond=0)))
+
+
+# =============================================
+# BÖLÜM ÖNBELLEK ANAHTARLARI
+# =============================================
+# Anahtar yalnızca bölümün metne yazdığı model alanlarını içerir.
+# Önbelleğe alınan slotlar; listede olmayanlar (zaman damgası) her seferinde çalışır
+SECTION_KEYS: Dict[Callable, Callable[[ReportModel], Hashable]] = {
+    _clinical_slot: lambda m: (m.patient, m.clinical),
+    _findings_slot: lambda m: (TAXONOMY_VERSION, m.finding_keys),
+    _diagnosis_slot: lambda m: m.diagnosis,
+    _ila_slot: lambda m: m.ila,
+    _mdd_slot: lambda m: m.mdd,
+    _comparison_slot: lambda m: m.comparison,
+    _conclusion_slot: lambda m: (
+        m.diagnosis and m.diagnosis.primary,
+        m.mdd and m.mdd.recommended,
+        m.ila and (m.ila.category_label, m.ila.risk_level),
+    ),
+}
+
+
+# =============================================
+# DERLENMİŞ RAPOR ŞABLONU
+# =============================================
+def _lines(*lines: str) -> str:
+    return "\n".join(lines)
+
+
+def _section_header(title: str) -> str:
+    return _lines(title, "-" * 40)
+
+
+_ILA_HEADER = _section_header("ILA DEĞERLENDİRMESİ:")
+_MDD_HEADER = _section_header("MULTİDİSİPLİNER TARTIŞMA (MDD):")
+_COMPARISON_HEADER = _section_header("KARŞILAŞTIRMA:")
+_NO_PATTERN_DIAGNOSIS = _lines(
+    "  Spesifik bir YÇBT paterni tanımlanamamıştır.",
+    "  Klinik korelasyon ve ileri değerlendirme önerilir.",
+    "",
 )
 
+Fragment = Union[str, Callable[[List[str], ReportModel], None]]
+
+_MISSING = object()
 
-# Tüm bulgular tek sözlükte
-_ALL_FINDINGS = {}
-_ALL_FINDINGS.update(DISTRIBUTION_FINDINGS)
-_ALL_FINDINGS.update(FIBROTIC_FINDINGS)
-_ALL_FINDINGS.update(NON_FIBROTIC_FINDINGS)
-_ALL_FINDINGS.update(SPECIFIC_FINDINGS)
+
+def compile_report_template() -> Tuple[Fragment, ...]:
+    """
+    Rapor düzenini sabit metin parçaları ve slotlardan oluşan bir
+    şablona derle. Sabit parçalar birden çok satırı önceden birleştirir.
+    """
+    return (
+        # --- Başlık ---
+        _lines(
+            "=" * 60,
+            "YÜKSEK ÇÖZÜNÜRLÜKLÜ BT - İNTERSTİSYEL AKCİĞER HASTALIKLARI",
+            "YAPISAL RAPOR",
+            "=" * 60,
+            "",
+            _section_header("KLİNİK BİLGİ:"),
+        ),
+        _clinical_slot,
+        # --- BT Bulguları ---
+        _section_header("BT BULGULARI:"),
+        _findings_slot,
+        # --- Tanısal Değerlendirme ---
+        _section_header("TANISAL DEĞERLENDİRME:"),
+        _diagnosis_slot,
+        # --- ILA / MDD / Karşılaştırma (koşullu bölümler) ---
+        _ila_slot,
+        _mdd_slot,
+        _comparison_slot,
+        # --- Sonuç ---
+        _section_header("SONUÇ:"),
+        _conclusion_slot,
+        # --- Alt bilgi ---
+        _lines("", "=" * 60),
+        _timestamp_slot,
+        _lines(
+            "2025 ERS/ATS Kılavuzu uyumlu yapısal raporlama sistemi",
+            "Klinik karar desteği amaçlıdır, kesin tanı yerine geçmez.",
+            "=" * 60,
+        ),
+    )
+
+
+REPORT_TEMPLATE = compile_report_template()
 
 
 class ReportGenerator:
-    """Yapısal radyoloji raporu oluşturur."""
+    """
+    Yapısal radyoloji raporu oluşturur.
+
+    Args:
+        template: Derlenmiş rapor şablonu (varsayılan REPORT_TEMPLATE)
+        template_version: Şablonun sürümü (bölüm önbelleği anahtarında)
+        clock: Rapor zamanı kaynağı (varsayılan datetime.now)
+        section_cache_size: Önbellekte tutulacak en fazla bölüm; 0 = önbellek yok
+        section_keys: Slot → önbellek anahtarı fonksiyonu (varsayılan SECTION_KEYS)
+    """
+
+    def __init__(
+        self,
+        template: Optional[Tuple[Fragment, ...]] = None,
+        template_version: int = REPORT_TEMPLATE_VERSION,
+        clock: Callable[[], datetime] = datetime.now,
+        section_cache_size: int = 65536,
+        section_keys: Optional[Dict[Callable, Callable[[ReportModel], Hashable]]] = None,
+    ):
+        self.template = REPORT_TEMPLATE if template is None else template
+        self.template_version = template_version
+        self.clock = clock
+        self.section_cache_size = section_cache_size
+        section_keys = SECTION_KEYS if section_keys is None else section_keys
+        # (parça, önbellek anahtarı fonksiyonu) — sabit parçalar ve önbelleksiz slotlar için None
+        self._plan = tuple(
+            (fragment, section_keys.get(fragment) if section_cache_size and callable(fragment) else None)
+            for fragment in self.template
+        )
+        self._section_cache: Dict[tuple, Optional[str]] = {}
+        # Oturumlar arasında paylaşılabilir: ekleme / çıkarma kilit altında
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def generate_full_report(
         self,
@@ -34,6 +276,7 @@ class ReportGenerator:
         selected_findings: List[str],
         diagnostic_result,
         ila_result=None,
+        report_time: Optional[datetime] = None,
     ) -> str:
         """
         Tam yapısal rapor metni oluştur.
@@ -44,170 +287,63 @@ class ReportGenerator:
             selected_findings: Seçilen bulgu key listesi
             diagnostic_result: DiagnosticResult objesi
             ila_result: ILAResult objesi (opsiyonel)
+            report_time: Rapor zamanı (verilmezse clock() kullanılır)
 
         Returns:
             PACS/RIS'e kopyalanabilir rapor metni
         """
-        sections = []
-
-        # --- Başlık ---
-        sections.append("=" * 60)
-        sections.append("YÜKSEK ÇÖZÜNÜRLÜKLÜ BT - İNTERSTİSYEL AKCİĞER HASTALIKLARI")
-        sections.append("YAPISAL RAPOR")
-        sections.append("=" * 60)
-        sections.append("")
-
-        # --- Klinik Bilgi ---
-        sections.append("KLİNİK BİLGİ:")
-        sections.append("-" * 40)
-        name = patient_info.get("name", "")
-        if name:
-            sections.append(f"  Hasta: {name}")
-        sections.append(f"  Yaş/Cinsiyet: {patient_info.get('age', '')}/{patient_info.get('sex', '')}")
-        sections.append(f"  Endikasyon: {clinical_context.get('indication', '')}")
-        sections.append(f"  Prezentasyon: {clinical_context.get('presentation', '')}")
-
-        smoking = clinical_context.get("smoking", "Hiç içmemiş")
-        pack_years = clinical_context.get("pack_years", 0)
-        if smoking != "Hiç içmemiş" and pack_years > 0:
-            sections.append(f"  Sigara: {smoking} ({pack_years} paket-yıl)")
-        else:
-            sections.append(f"  Sigara: {smoking}")
-
-        exposure = clinical_context.get("exposure", "Yok")
-        if exposure != "Yok":
-            sections.append(f"  Maruziyet: {exposure}")
-
-        ctd = clinical_context.get("ctd", "Yok")
-        if ctd != "Yok":
-            sections.append(f"  CTD: {ctd}")
-        sections.append("")
+        model = build_report_model(
+            patient_info,
+            clinical_context,
+            selected_findings,
+            diagnostic_result,
+            ila_result,
+            self.clock() if report_time is None else report_time,
+        )
+        return self.render(model)
 
-        # --- BT Bulguları ---
-        sections.append("BT BULGULARI:")
-        sections.append("-" * 40)
+    def render(self, model: ReportModel) -> str:
+        """
+        Hazır rapor modelinden metni oluştur (bkz. build_report_model).
 
-        if not selected_findings:
-            sections.append("  İnterstisyel akciğer hastalığı ile uyumlu bulgu saptanmamıştır.")
-        else:
-            # Bulguları kategorilere göre grupla
-            dist_findings = []
-            fibrotic_findings = []
-            nonfibrotic_findings = []
-            specific_findings = []
-
-            for f_key in selected_findings:
-                info = _ALL_FINDINGS.get(f_key)
-                if not info:
-                    continue
-                cat = info.get("category", "")
-                label = info["label"]
-                if cat == "distribution":
-                    dist_findings.append(label)
-                elif cat == "fibrotic":
-                    fibrotic_findings.append(label)
-                elif cat == "non_fibrotic":
-                    nonfibrotic_findings.append(label)
-                elif cat == "specific":
-                    specific_findings.append(label)
-
-            if dist_findings:
-                sections.append(f"  Dağılım: {', '.join(dist_findings)}")
-            if fibrotic_findings:
-                sections.append(f"  Fibrotik bulgular: {', '.join(fibrotic_findings)}")
-            if nonfibrotic_findings:
-                sections.append(f"  Non-fibrotik bulgular: {', '.join(nonfibrotic_findings)}")
-            if specific_findings:
-                sections.append(f"  Spesifik bulgular: {', '.join(specific_findings)}")
-        sections.append("")
+        Toplu dışa aktarımda model bir kez oluşturulup metin, FHIR ve
+        HL7 oluşturucularına aynı nesne olarak verilir.
+        """
+        out: List[str] = []
+        cache = self._section_cache
+        for fragment, section_key in self._plan:
+            if section_key is None:
+                if fragment.__class__ is str:
+                    out.append(fragment)
+                else:
+                    fragment(out, model)
+                continue
 
-        # --- Tanısal Değerlendirme ---
-        sections.append("TANISAL DEĞERLENDİRME:")
-        sections.append("-" * 40)
-
-        if diagnostic_result and diagnostic_result.primary_pattern:
-            primary = diagnostic_result.primary_pattern
-            conf = primary.confidence_level
-
-            sections.append(f"  Primer YÇBT paterni: {primary.pattern_name}")
-            sections.append(f"  Tanısal güven: %{primary.final_score:.0f} — {conf['label']}")
-            sections.append("")
-
-            # Ayırıcı tanı
-            top = [
-                p for p in diagnostic_result.ranked_patterns[:3]
-                if p.final_score > 10 and p.pattern_key != primary.pattern_key
-            ]
-            if top:
-                sections.append("  Ayırıcı tanı:")
-                for i, p in enumerate(top, 1):
-                    sections.append(f"    {i}. {p.pattern_name} (%{p.final_score:.0f})")
-                sections.append("")
-
-            # İlişkili klinik tanılar
-            if primary.associated_diagnoses:
-                sections.append("  İlişkili klinik tanılar:")
-                for diag in primary.associated_diagnoses:
-                    sections.append(f"    - {diag}")
-                sections.append("")
-        else:
-            sections.append("  Spesifik bir YÇBT paterni tanımlanamamıştır.")
-            sections.append("  Klinik korelasyon ve ileri değerlendirme önerilir.")
-            sections.append("")
-
-        # --- ILA Değerlendirmesi ---
-        if ila_result and ila_result.ila_present:
-            sections.append("ILA DEĞERLENDİRMESİ:")
-            sections.append("-" * 40)
-            sections.append(f"  Kategori: {ila_result.category_label}")
-            sections.append(f"  Risk düzeyi: {ila_result.risk_level}")
-            sections.append(f"  Tutulum yaygınlığı: %{ila_result.extent_percent:.0f}")
-            sections.append(f"  Fibrotik özellik: {'Var' if ila_result.has_fibrotic_features else 'Yok'}")
-            sections.append(f"  Takip: {ila_result.follow_up}")
-            sections.append("")
-
-        # --- MDD Önerisi ---
-        if diagnostic_result:
-            sections.append("MULTİDİSİPLİNER TARTIŞMA (MDD):")
-            sections.append("-" * 40)
-            if diagnostic_result.mdd_recommended:
-                sections.append("  >> MDD ÖNERİLİR")
+            key = (fragment, self.template_version, section_key(model))
+            try:
+                section = cache.get(key, _MISSING)
+            except TypeError:
+                # Hash'lenemeyen alan (ör. liste içeren bağlam değeri) → önbelleksiz
+                fragment(out, model)
+                continue
+            if section is _MISSING:
+                lines: List[str] = []
+                fragment(lines, model)
+                section = "\n".join(lines) if lines else None
+                with self._cache_lock:
+                    if len(cache) >= self.section_cache_size:
+                        # En eski kayıt çıkarılır (ekleme sırası)
+                        del cache[next(iter(cache))]
+                    cache[key] = section
+                    self.cache_misses += 1
             else:
-                sections.append("  MDD rutin olarak gerekmemektedir.")
-            sections.append(f"  Gerekçe: {diagnostic_result.mdd_reason}")
-            sections.append("")
-
-        # --- Sonuç ---
-        sections.append("SONUÇ:")
-        sections.append("-" * 40)
-        if diagnostic_result and diagnostic_result.primary_pattern:
-            primary = diagnostic_result.primary_pattern
-            sections.append(
-                f"  YÇBT bulguları {primary.pattern_name} ile uyumludur "
-                f"(güven: %{primary.final_score:.0f})."
-            )
-            if diagnostic_result.mdd_recommended:
-                sections.append("  Multidisipliner tartışma (MDD) önerilmektedir.")
-        else:
-            sections.append("  Spesifik ILD paterni tanımlanamamıştır. Klinik korelasyon önerilir.")
-
-        if ila_result and ila_result.ila_present:
-            sections.append(
-                f"  ILA: {ila_result.category_label} — "
-                f"Risk: {ila_result.risk_level}"
-            )
-
-        sections.append("")
-        sections.append("=" * 60)
-        sections.append(
-            f"Rapor tarihi: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        )
-        sections.append(
-            "2025 ERS/ATS Kılavuzu uyumlu yapısal raporlama sistemi"
-        )
-        sections.append(
-            "Klinik karar desteği amaçlıdır, kesin tanı yerine geçmez."
-        )
-        sections.append("=" * 60)
+                self.cache_hits += 1
+            if section is not None:
+                out.append(section)
+        return "\n".join(out)
 
-        return "\n".join(sections)
+    def clear_cache(self):
+        """Bölüm önbelleğini temizle."""
+        with self._cache_lock:
+            self._section_cache.clear()
+            self.cache_hits = self.cache_misses = 0
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Yapısal Rapor Modeli
+
+DiagnosticResult / ILAResult ve hasta bilgilerinden bir kez oluşturulan,
+biçimden bağımsız ara rapor modeli. Düz metin (PACS), FHIR
+DiagnosticReport ve HL7 v2 ORU çıktıları aynı modeli okur; hiçbir
+oluşturucu skor, sıralama veya etiket eşlemesini yeniden hesaplamaz.
+
+Model alanları değişmez demetlerdir (NamedTuple); bölüm önbelleği
+anahtarı olarak doğrudan kullanılabilir.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config.findings_taxonomy import (
+    DISTRIBUTION_FINDINGS,
+    FIBROTIC_FINDINGS,
+    NON_FIBROTIC_FINDINGS,
+    SPECIFIC_FINDINGS,
+    TAXONOMY_VERSION,
+)
+
+
+# Tüm bulgular tek sözlükte
+_ALL_FINDINGS = {}
+_ALL_FINDINGS.update(DISTRIBUTION_FINDINGS)
+_ALL_FINDINGS.update(FIBROTIC_FINDINGS)
+_ALL_FINDINGS.update(NON_FIBROTIC_FINDINGS)
+_ALL_FINDINGS.update(SPECIFIC_FINDINGS)
+
+# Rapordaki bulgu grupları: (kategori, başlık) — rapor sırasında
+FINDING_GROUPS = (
+    ("distribution", "Dağılım"),
+    ("fibrotic", "Fibrotik bulgular"),
+    ("non_fibrotic", "Non-fibrotik bulgular"),
+    ("specific", "Spesifik bulgular"),
+)
+
+# Ayırıcı tanıya giren en fazla patern ve en düşük skor
+_DIFFERENTIAL_TOP_N = 3
+_DIFFERENTIAL_MIN_SCORE = 10
+
+
+@lru_cache(maxsize=None)
+def compile_finding_index(taxonomy_version: int = TAXONOMY_VERSION) -> Dict[str, Tuple[int, str]]:
+    """
+    Bulgu anahtarı → (FINDING_GROUPS indeksi, etiket) tablosu.
+
+    Taksonomi sürümü başına bir kez derlenir; rapora girmeyen
+    kategorilerdeki bulgular tabloda yer almaz.
+    """
+    group_index = {category: i for i, (category, _) in enumerate(FINDING_GROUPS)}
+    return {
+        key: (group_index[info.get("category", "")], info["label"])
+        for key, info in _ALL_FINDINGS.items()
+        if info.get("category", "") in group_index
+    }
+
+
+# =============================================
+# MODEL
+# =============================================
+class ReportPatient(NamedTuple):
+    name: str
+    age: object
+    sex: str
+
+
+class ReportClinical(NamedTuple):
+    indication: str
+    presentation: str
+    smoking: str
+    pack_years: object
+    exposure: str
+    ctd: str
+
+
+class ReportPattern(NamedTuple):
+    key: str
+    name: str
+    score: float
+    confidence_label: str
+    associated_diagnoses: Tuple[str, ...]
+
+
+class ReportDiagnosis(NamedTuple):
+    primary: ReportPattern
+    differential: Tuple[ReportPattern, ...]
+
+
+class ReportMDD(NamedTuple):
+    recommended: bool
+    reason: str
+    reason_code: str
+
+
+class ReportILA(NamedTuple):
+    category: str
+    category_label: str
+    risk_level: str
+    extent_percent: float
+    has_fibrotic_features: bool
+    follow_up: str
+
+
+class ReportChange(NamedTuple):
+    section: str        # "clinical", "findings", "diagnosis", "mdd", "ila"
+    field: str          # alan kodu (bulgu için bulgu anahtarı)
+    kind: str           # "added", "removed", "changed"
+    before: str         # görüntülenecek önceki değer ("" = yok)
+    after: str          # görüntülenecek güncel değer ("" = yok)
+
+
+# Değişiklik satırlarındaki alan adları
+CHANGE_FIELD_LABELS = {
+    "indication": "Endikasyon",
+    "presentation": "Prezentasyon",
+    "smoking": "Sigara",
+    "pack_years": "Paket-yıl",
+    "exposure": "Maruziyet",
+    "ctd": "CTD",
+    "primary": "Primer patern",
+    "score": "Tanısal güven",
+    "confidence": "Güven düzeyi",
+    "recommended": "MDD",
+    "ila": "ILA",
+    "category": "ILA kategorisi",
+    "risk_level": "ILA risk düzeyi",
+    "extent": "ILA yaygınlığı",
+    "fibrotic": "ILA fibrotik özellik",
+}
+_FINDING_CHANGE_LABEL = "Bulgu"
+_CHANGE_PREFIXES = {"added": "+", "removed": "-", "changed": "*"}
+
+
+class ReportComparison(NamedTuple):
+    prior_time: datetime
+    changes: Tuple[ReportChange, ...]
+
+    @property
+    def lines(self) -> List[str]:
+        """Değişiklik satırları (metin ve şablon çıktılarında ortak)."""
+        lines = []
+        for change in self.changes:
+            label = _FINDING_CHANGE_LABEL if change.section == "findings" else CHANGE_FIELD_LABELS[change.field]
+            if change.kind == "changed":
+                value = f"{change.before} → {change.after}"
+            else:
+                value = change.after if change.kind == "added" else change.before
+            lines.append(f"{_CHANGE_PREFIXES[change.kind]} {label}: {value}")
+        return lines
+
+
+@dataclass(frozen=True)
+class ReportModel:
+    """Tek bir raporun biçimden bağımsız içeriği."""
+    patient: ReportPatient
+    clinical: ReportClinical
+    finding_keys: Tuple[str, ...]
+    # (FINDING_GROUPS indeksi, etiketler) — yalnızca boş olmayan gruplar
+    finding_groups: Tuple[Tuple[int, Tuple[str, ...]], ...]
+    diagnosis: Optional[ReportDiagnosis]     # primer patern yoksa None
+    mdd: Optional[ReportMDD]                 # analiz sonucu yoksa None
+    ila: Optional[ReportILA]                 # ILA saptanmadıysa None
+    report_time: datetime
+    # Önceki raporla karşılaştırma (bkz. modules/report_diff.py)
+    comparison: Optional[ReportComparison] = None
+
+    @property
+    def conclusion(self) -> List[str]:
+        """Sonuç cümleleri (metin ve FHIR çıktılarında ortak)."""
+        sentences = []
+        if self.diagnosis:
+            primary = self.diagnosis.primary
+            sentences.append(
+                f"YÇBT bulguları {primary.name} ile uyumludur "
+                f"(güven: %{primary.score:.0f})."
+            )
+            if self.mdd and self.mdd.recommended:
+                sentences.append("Multidisipliner tartışma (MDD) önerilmektedir.")
+        else:
+            sentences.append("Spesifik ILD paterni tanımlanamamıştır. Klinik korelasyon önerilir.")
+        if self.ila:
+            sentences.append(f"ILA: {self.ila.category_label} — Risk: {self.ila.risk_level}")
+        return sentences
+
+
+def _report_pattern(pattern) -> ReportPattern:
+    return ReportPattern(
+        key=pattern.pattern_key,
+        name=pattern.pattern_name,
+        score=pattern.final_score,
+        confidence_label=pattern.confidence_level["label"],
+        associated_diagnoses=tuple(pattern.associated_diagnoses),
+    )
+
+
+def build_report_model(
+    patient_info: Dict,
+    clinical_context: Dict,
+    selected_findings: List[str],
+    diagnostic_result,
+    ila_result=None,
+    report_time: Optional[datetime] = None,
+) -> ReportModel:
+    """
+    Rapor modelini oluştur.
+
+    Args:
+        patient_info: Hasta bilgileri dict
+        clinical_context: Klinik bağlam dict
+        selected_findings: Seçilen bulgu key listesi
+        diagnostic_result: DiagnosticResult objesi
+        ila_result: ILAResult objesi (opsiyonel)
+        report_time: Rapor zamanı (verilmezse şimdiki zaman)
+
+    Returns:
+        ReportModel objesi
+    """
+    # Bulguları kategorilere göre grupla
+    index = compile_finding_index()
+    groups = [[] for _ in FINDING_GROUPS]
+    for f_key in selected_findings:
+        entry = index.get(f_key)
+        if entry:
+            groups[entry[0]].append(entry[1])
+
+    diagnosis = None
+    if diagnostic_result and diagnostic_result.primary_pattern:
+        primary = diagnostic_result.primary_pattern
+        diagnosis = ReportDiagnosis(
+            primary=_report_pattern(primary),
+            differential=tuple(
+                _report_pattern(p)
+                for p in diagnostic_result.ranked_patterns[:_DIFFERENTIAL_TOP_N]
+                if p.final_score > _DIFFERENTIAL_MIN_SCORE and p.pattern_key != primary.pattern_key
+            ),
+        )
+
+    return ReportModel(
+        patient=ReportPatient(
+            name=patient_info.get("name", ""),
+            age=patient_info.get("age", ""),
+            sex=patient_info.get("sex", ""),
+        ),
+        clinical=ReportClinical(
+            indication=clinical_context.get("indication", ""),
+            presentation=clinical_context.get("presentation", ""),
+            smoking=clinical_context.get("smoking", "Hiç içmemiş"),
+            pack_years=clinical_context.get("pack_years", 0),
+            exposure=clinical_context.get("exposure", "Yok"),
+            ctd=clinical_context.get("ctd", "Yok"),
+        ),
+        finding_keys=tuple(selected_findings),
+        finding_groups=tuple((i, tuple(labels)) for i, labels in enumerate(groups) if labels),
+        diagnosis=diagnosis,
+        mdd=ReportMDD(
+            recommended=diagnostic_result.mdd_recommended,
+            reason=diagnostic_result.mdd_reason,
+            reason_code=diagnostic_result.mdd_reason_code,
+        ) if diagnostic_result else None,
+        ila=ReportILA(
+            category=ila_result.category,
+            category_label=ila_result.category_label,
+            risk_level=ila_result.risk_level,
+            extent_percent=ila_result.extent_percent,
+            has_fibrotic_features=ila_result.has_fibrotic_features,
+            follow_up=ila_result.follow_up,
+        ) if ila_result and ila_result.ila_present else None,
+        report_time=datetime.now() if report_time is None else report_time,
+    )
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Akışlı Toplu Rapor Yazıcı
+
+Yeniden skorlanan kohortların raporları bellekte biriktirilmeden
+yazılır: write_reports bir ReportModel üretecini tek tek okur, her
+raporu oluşturup hemen hedefe (sink) aktarır. Hedefler:
+
+  - RotatingTextSink: boyut sınırında dönen düz metin dosyaları
+  - JSONLSink: satır başına bir rapor (JSON Lines)
+  - ArchiveSink: rapor başına bir üye içeren zip / tar arşivi
+
+Dosyalar büyük tamponlarla açılır (varsayılan 1 MiB); gzip / zip
+sıkıştırması isteğe bağlıdır. Her hedef yazılan rapor ve bayt
+sayısını tutar; write_reports süre ve hızları SinkStats olarak döndürür.
+"""
+
+import gzip
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from dataclasses import dataclass
+from typing import IO, Callable, Iterable, Optional
+
+from modules.report_export import REPORT_SEPARATOR
+from modules.report_generator import ReportGenerator
+from modules.report_model import ReportModel
+
+
+DEFAULT_BUFFER_SIZE = 1 << 20          # 1 MiB
+DEFAULT_ROTATE_BYTES = 64 << 20        # 64 MiB
+
+
+@dataclass
+class SinkStats:
+    """Toplu yazım özeti."""
+    reports: int
+    bytes_written: int      # sıkıştırma öncesi rapor baytları
+    seconds: float
+
+    @property
+    def reports_per_second(self) -> float:
+        return self.reports / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_written / self.seconds if self.seconds > 0 else 0.0
+
+
+def _open_buffered(path: str, compress: bool, buffer_size: int) -> IO[bytes]:
+    """Büyük tamponlu (ve isteğe bağlı gzip) ikili yazma akışı."""
+    if compress:
+        # Küçük yazmalar tamponda birikir; gzip'e büyük bloklar gider
+        return io.BufferedWriter(gzip.open(path, "wb", compresslevel=6), buffer_size)
+    return open(path, "wb", buffering=buffer_size)
+
+
+# =============================================
+# HEDEFLER
+# =============================================
+class ReportSink:
+    """Hedef temel sınıfı; with bloğuyla kullanılır."""
+
+    def __init__(self):
+        self.reports = 0
+        self.bytes_written = 0
+
+    def write(self, report_id: str, text: str, model: ReportModel) -> None:
+        data = self._encode(report_id, text, model)
+        self._write(report_id, data)
+        self.reports += 1
+        self.bytes_written += len(data)
+
+    def _encode(self, report_id: str, text: str, model: ReportModel) -> bytes:
+        return text.encode("utf-8")
+
+    def _write(self, report_id: str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RotatingTextSink(ReportSink):
+    """
+    Düz metin raporlar (REPORT_SEPARATOR ile ayrılmış); dosya max_bytes'ı
+    aştığında <prefix>_0002.txt[.gz] ile devam edilir.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "reports",
+        max_bytes: int = DEFAULT_ROTATE_BYTES,
+        compress: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ):
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.buffer_size = buffer_size
+        self.paths = []
+        self._file: Optional[IO[bytes]] = None
+        self._file_bytes = 0
+        self._separator = REPORT_SEPARATOR.encode("utf-8")
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        suffix = ".txt.gz" if self.compress else ".txt"
+        path = os.path.join(self.directory, f"{self.prefix}_{len(self.paths) + 1:04d}{suffix}")
+        self.paths.append(path)
+        self._file = _open_buffered(path, self.compress, self.buffer_size)
+        self._file_bytes = 0
+
+    def _write(self, report_id: str, data: bytes) -> None:
+        if self._file is None or self._file_bytes >= self.max_bytes:
+            self._rotate()
+        elif self._file_bytes:
+            self._file.write(self._separator)
+            self._file_bytes += len(self._separator)
+        self._file.write(data)
+        self._file.write(b"\n")
+        self._file_bytes += len(data) + 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JSONLSink(ReportSink):
+    """
+    Satır başına bir rapor: id, rapor zamanı, primer patern, skor, MDD,
+    ILA kategorisi ve rapor metni. ".gz" uzantısı gzip ile yazar.
+    """
+
+    def __init__(self, path: str, compress: Optional[bool] = None, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__()
+        self.path = path
+        self._file = _open_buffered(path, path.endswith(".gz") if compress is None else compress, buffer_size)
+
+    def _encode(self, report_id: str, text: str, model: ReportModel) -> bytes:
+        primary = model.diagnosis.primary if model.diagnosis else None
+        record = {
+            "id": report_id,
+            "report_time": model.report_time.isoformat(timespec="seconds"),
+            "primary_pattern": primary.key if primary else None,
+            "score": primary.score if primary else None,
+            "mdd_recommended": model.mdd.recommended if model.mdd else None,
+            "ila_category": model.ila.category if model.ila else None,
+            "text": text,
+        }
+        return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def _write(self, report_id: str, data: bytes) -> None:
+        self._file.write(data)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+class ArchiveSink(ReportSink):
+    """
+    Rapor başına bir üye (<id>.txt) içeren arşiv.
+
+    Args:
+        path: Arşiv yolu
+        fmt: "zip" veya "tar"
+        compress: zip → DEFLATE, tar → gzip akışı (w|gz)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: str = "zip",
+        compress: bool = True,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+    ):
+        super().__init__()
+        if fmt not in ("zip", "tar"):
+            raise ValueError(f"Desteklenmeyen arşiv biçimi: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self._file = open(path, "wb", buffering=buffer_size)
+        if fmt == "zip":
+            self._archive = zipfile.ZipFile(
+                self._file, "w",
+                compression=zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED,
+            )
+        else:
+            # Akış kipi: üyeler dosyaya sırayla yazılır, geri sarma yapılmaz
+            self._archive = tarfile.open(fileobj=self._file, mode="w|gz" if compress else "w|")
+        self._mtime = time.time()
+
+    def _write(self, report_id: str, data: bytes) -> None:
+        name = f"{report_id}.txt"
+        if self.fmt == "zip":
+            self._archive.writestr(zipfile.ZipInfo(name, time.localtime(self._mtime)[:6]), data,
+                                   compress_type=self._archive.compression)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self._mtime
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._archive.close()
+            self._file.close()
+
+
+# =============================================
+# AKIŞLI YAZIM
+# =============================================
+def write_reports(
+    models: Iterable[ReportModel],
+    sink: ReportSink,
+    generator: Optional[ReportGenerator] = None,
+    report_id: Optional[Callable[[int, ReportModel], str]] = None,
+    progress: Optional[Callable[[SinkStats], None]] = None,
+    progress_every: int = 10000,
+) -> SinkStats:
+    """
+    Modelleri tek tek oluşturup hedefe yaz; metinler biriktirilmez.
+
+    Args:
+        models: ReportModel üreteci
+        sink: Yazılacak hedef (çağıran kapatır)
+        generator: Metin oluşturucu (varsayılan yeni ReportGenerator;
+            TemplateReportGenerator da verilebilir)
+        report_id: (sıra no, model) → rapor kimliği (varsayılan 8 haneli sıra no)
+        progress: Her progress_every raporda ara istatistikle çağrılır
+
+    Returns:
+        SinkStats (bu çağrıda yazılan raporlar)
+    """
+    generator = generator or ReportGenerator()
+    render = generator.render
+    start_reports, start_bytes = sink.reports, sink.bytes_written
+    start = time.perf_counter()
+
+    def stats() -> SinkStats:
+        return SinkStats(
+            reports=sink.reports - start_reports,
+            bytes_written=sink.bytes_written - start_bytes,
+            seconds=time.perf_counter() - start,
+        )
+
+    for i, model in enumerate(models, 1):
+        sink.write(report_id(i, model) if report_id else f"{i:08d}", render(model), model)
+        if progress is not None and i % progress_every == 0:
+            progress(stats())
+    return stats()
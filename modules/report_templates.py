@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Jinja2 Rapor Şablonları (kurum bazlı düzen)
+
+Rapor düzeni config/report_templates/ altındaki Jinja2 şablonlarıyla
+tanımlanır. Varsayılan şablon (default.txt.j2) ReportGenerator ile aynı
+metni üretir; kurum şablonları ("<kurum>.txt.j2") onu genişletip başlık,
+bölüm sırası ve metinleri değiştirir.
+
+Şablon dizini başına tek bir Environment oluşturulur (lru_cache) ve
+şablonlar ilk kullanımda bir kez derlenir; auto_reload kapalıdır.
+bytecode_cache_dir verilirse derlenmiş şablon kodu diske yazılır;
+toplu işlem süreçleri ve yeniden başlatmalar şablonu yeniden derlemez.
+
+Her şablon bloğu ReportGenerator'ın bölüm önbelleğine bir slot olarak
+bağlanır. Önbellek anahtarı, bloğun şablon kaynağında okuduğu model
+alanlarından (model.<alan>) statik olarak çıkarılır; model bütün
+olarak kullanılıyorsa, blok self / super() çağırıyorsa veya modeli
+başka şablon üzerinden okuyabiliyorsa (include, import, makro / call
+çağrısı) tüm alanlar anahtara girer. Toplu üretimde Jinja yalnızca önbellekte olmayan
+bölümler için çalışır.
+"""
+
+import os
+import threading
+import time
+from dataclasses import fields
+from functools import lru_cache
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, StrictUndefined, nodes
+
+from modules.report_generator import ReportGenerator
+from modules.report_model import FINDING_GROUPS, ReportModel
+
+
+DEFAULT_TEMPLATE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "config", "report_templates",
+)
+DEFAULT_SITE = "default"
+TEMPLATE_SUFFIX = ".txt.j2"
+
+_FINDING_TITLES = tuple(title for _, title in FINDING_GROUPS)
+
+_MODEL_FIELDS = tuple(f.name for f in fields(ReportModel))
+# Türetilmiş model özellikleri → bağlı oldukları alanlar
+_DERIVED_FIELDS = {"conclusion": ("diagnosis", "mdd", "ila")}
+
+# Modeli bağlamdan (başka şablon / makro içinde) okuyabilen düğümler
+_OPAQUE_NODES = (nodes.Include, nodes.Import, nodes.FromImport, nodes.CallBlock)
+# Çağrıldığında makro olmayan kök adlar (model nesneleri ve Jinja globalleri)
+_NON_MACRO_CALL_ROOTS = frozenset((
+    "model", "loop", "finding_titles",
+    "range", "dict", "lipsum", "cycler", "joiner", "namespace",
+))
+
+
+@lru_cache(maxsize=8)
+def get_template_environment(
+    template_dir: str = DEFAULT_TEMPLATE_DIR,
+    bytecode_cache_dir: Optional[str] = None,
+) -> Environment:
+    """
+    Şablon dizini başına paylaşılan Jinja2 Environment.
+
+    Düz metin rapor olduğundan otomatik HTML kaçışı kapalıdır;
+    tanımsız değişkenler sessizce boş metne dönüşmez (StrictUndefined).
+    """
+    bytecode_cache = None
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    return Environment(
+        loader=FileSystemLoader(template_dir),
+        bytecode_cache=bytecode_cache,
+        autoescape=False,
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        undefined=StrictUndefined,
+        cache_size=-1,
+    )
+
+
+def available_sites(template_dir: str = DEFAULT_TEMPLATE_DIR) -> List[str]:
+    """Dizindeki kurum şablonlarının adları (varsayılan ilk sırada)."""
+    sites = sorted(
+        name[:-len(TEMPLATE_SUFFIX)]
+        for name in os.listdir(template_dir)
+        if name.endswith(TEMPLATE_SUFFIX)
+    )
+    if DEFAULT_SITE in sites:
+        sites.remove(DEFAULT_SITE)
+        sites.insert(0, DEFAULT_SITE)
+    return sites
+
+
+# =============================================
+# ŞABLON ÇÖZÜMLEME
+# =============================================
+def _calls_macro(block: nodes.Block) -> bool:
+    """Blok makro çağırıyor mu (kökü yerel değişken veya bilinen global olmayan çağrı)."""
+    local = {n.name for n in block.find_all(nodes.Name) if n.ctx in ("store", "param")}
+    for call in block.find_all(nodes.Call):
+        root = call.node
+        while isinstance(root, (nodes.Getattr, nodes.Getitem)):
+            root = root.node
+        if isinstance(root, nodes.Name) and root.name not in local and root.name not in _NON_MACRO_CALL_ROOTS:
+            return True
+    return False
+
+
+def _block_model_fields(block: nodes.Block) -> Tuple[str, ...]:
+    """Bloğun okuduğu model alanları (kaynak sırasıyla değil, model sırasıyla)."""
+    if any(True for _ in block.find_all(_OPAQUE_NODES)) or _calls_macro(block):
+        return _MODEL_FIELDS
+
+    model_names = sum(1 for n in block.find_all(nodes.Name) if n.name == "model")
+    attrs = [
+        g.attr for g in block.find_all(nodes.Getattr)
+        if isinstance(g.node, nodes.Name) and g.node.name == "model"
+    ]
+    uses_other_blocks = any(n.name in ("self", "super") for n in block.find_all(nodes.Name))
+    if model_names > len(attrs) or uses_other_blocks:
+        return _MODEL_FIELDS
+
+    used = set()
+    for attr in attrs:
+        used.update(_DERIVED_FIELDS.get(attr, (attr,)))
+    return tuple(f for f in _MODEL_FIELDS if f in used)
+
+
+def _template_chain(env: Environment, name: str) -> List[Tuple[str, nodes.Template]]:
+    """Şablon ve üst şablonlarının (ad, AST) listesi (en alttaki önce)."""
+    chain = []
+    while name:
+        source = env.loader.get_source(env, name)[0]
+        ast = env.parse(source, name)
+        chain.append((name, ast))
+        extends = ast.find(nodes.Extends)
+        name = extends.template.value if extends and isinstance(extends.template, nodes.Const) else None
+    return chain
+
+
+def _layout(chain: List[Tuple[str, nodes.Template]]) -> Tuple[str, ...]:
+    """
+    Bölüm sırası: zincirdeki ilk üst düzey `layout` ataması, yoksa kök
+    şablondaki üst düzey blokların sırası.
+    """
+    for _, ast in chain:
+        for node in ast.body:
+            if (
+                isinstance(node, nodes.Assign)
+                and isinstance(node.target, nodes.Name)
+                and node.target.name == "layout"
+            ):
+                return tuple(node.node.as_const())
+    return tuple(node.name for node in chain[-1][1].body if isinstance(node, nodes.Block))
+
+
+class _ContextMemo(threading.local):
+    """
+    İş parçacığı başına son modelin Jinja bağlamı.
+
+    Bir raporun önbellekte olmayan tüm blokları aynı bağlamla çalışır;
+    blok içi atamalar bağlama yazılmaz (blok yereldir).
+    """
+    model: Optional[ReportModel] = None
+    context = None
+
+
+def _block_slot(template, blocks: Dict[str, list], block_name: str, memo: _ContextMemo) -> Callable[[List[str], ReportModel], None]:
+    render_block = blocks[block_name][0]
+
+    def slot(out: List[str], model: ReportModel) -> None:
+        if memo.model is not model:
+            context = template.new_context(
+                {"model": model, "finding_titles": _FINDING_TITLES}, shared=True,
+            )
+            # Üst şablon blokları (super() için) — render sırasında değiştirilmez
+            context.blocks = blocks
+            memo.model, memo.context = model, context
+        text = "".join(render_block(memo.context))
+        if text:
+            # Blok satır sonuyla biter; satırlar "\n" ile birleştirilir
+            out.append(text[:-1] if text.endswith("\n") else text)
+
+    slot.__name__ = f"_{block_name}_block"
+    return slot
+
+
+def _no_fields(model: ReportModel) -> tuple:
+    return ()
+
+
+class TemplateReportGenerator(ReportGenerator):
+    """
+    Kurum şablonuyla yapısal rapor oluşturur (ReportGenerator ile aynı arayüz).
+
+    Args:
+        site: Şablon adı (config/report_templates/<site>.txt.j2)
+        template_dir: Şablon dizini
+        bytecode_cache_dir: Derlenmiş şablon kodu için disk önbelleği (opsiyonel)
+        clock: Rapor zamanı kaynağı (varsayılan datetime.now)
+        section_cache_size: Önbellekte tutulacak en fazla bölüm; 0 = önbellek yok
+    """
+
+    def __init__(
+        self,
+        site: str = DEFAULT_SITE,
+        template_dir: str = DEFAULT_TEMPLATE_DIR,
+        bytecode_cache_dir: Optional[str] = None,
+        clock: Callable[[], datetime] = datetime.now,
+        section_cache_size: int = 65536,
+    ):
+        env = get_template_environment(template_dir, bytecode_cache_dir)
+        template_name = site + TEMPLATE_SUFFIX
+        self.site = site
+        self.jinja_template = env.get_template(template_name)
+
+        chain = _template_chain(env, template_name)
+        # Alt şablondaki blok üst şablondakini geçersiz kılar
+        block_fields: Dict[str, Tuple[str, ...]] = {}
+        blocks: Dict[str, list] = {}
+        for name, ast in chain:
+            for block in ast.find_all(nodes.Block):
+                block_fields.setdefault(block.name, _block_model_fields(block))
+            for block_name, func in env.get_template(name).blocks.items():
+                blocks.setdefault(block_name, []).append(func)
+
+        self.layout = _layout(chain)
+        memo = _ContextMemo()
+        slots, section_keys = [], {}
+        for name in self.layout:
+            if name not in blocks:
+                raise ValueError(f"'{site}' şablonunda '{name}' bloğu tanımlı değil.")
+            slot = _block_slot(self.jinja_template, blocks, name, memo)
+            slots.append(slot)
+            used = block_fields[name]
+            section_keys[slot] = attrgetter(*used) if used else _no_fields
+
+        super().__init__(
+            template=tuple(slots),
+            template_version=0,
+            clock=clock,
+            section_cache_size=section_cache_size,
+            section_keys=section_keys,
+        )
+
+
+# =============================================
+# TOPLU İŞLEM HIZI
+# =============================================
+def report_throughput(generator, models: Sequence[ReportModel], repeat: int = 3, warm: bool = False) -> float:
+    """
+    Oluşturucunun toplu hızı (rapor/saniye, en iyi tekrar).
+
+    generator.render(model) arayüzünü kullanır; ReportGenerator ile
+    TemplateReportGenerator aynı model listesiyle karşılaştırılabilir.
+
+    warm=False: bölüm önbelleği her tekrardan önce boşaltılır (soğuk başlangıç).
+    warm=True: modeller bir kez oluşturulup önbellek doldurulur; tekrarlar
+    paylaşılan önbellekle sürekli toplu işlemi ölçer.
+    """
+    render = generator.render
+    generator.clear_cache()
+    if warm:
+        for model in models:
+            render(model)
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        if not warm:
+            generator.clear_cache()
+        start = time.perf_counter()
+        for model in models:
+            render(model)
+        best = min(best, time.perf_counter() - start)
+    return len(models) / best if best > 0 else float("inf")
+
+
+def check_template_throughput(
+    generator: TemplateReportGenerator,
+    models: Sequence[ReportModel],
+    reference: Optional[ReportGenerator] = None,
+    min_ratio: float = 0.95,
+    repeat: int = 5,
+) -> float:
+    """
+    Şablon oluşturucunun sürekli toplu hızını (dolu bölüm önbelleği)
+    elle yazılmış ReportGenerator ile karşılaştır.
+
+    Toplu raporlama paylaşılan bölüm önbelleğiyle çalışır; bu durumda
+    şablon yolu referansla aynı düzeyde olmalıdır. Varsayılan min_ratio
+    referanstan %5'ten fazla yavaşlamayı gerileme sayar.
+
+    Returns:
+        şablon hızı / referans hız
+
+    Raises:
+        RuntimeError: Oran min_ratio altındaysa
+    """
+    reference = reference or ReportGenerator()
+    ratio = (
+        report_throughput(generator, models, repeat, warm=True)
+        / report_throughput(reference, models, repeat, warm=True)
+    )
+    if ratio < min_ratio:
+        raise RuntimeError(
+            f"Şablon '{generator.site}' toplu rapor hızı referansın %{ratio * 100:.0f}'i "
+            f"(alt sınır %{min_ratio * 100:.0f})"
+        )
+    return ratio
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Kural Seti Karşılaştırması
+
+base_score, clinical_modifiers, skor ağırlıkları veya COOCCURRENCE_RULES
+değişikliğinin arşivlenmiş vakalara etkisini ölçer: iki derlenmiş kural
+seti aynı kohort matrisi üzerinde tek geçişte değerlendirilir.
+
+  - Bulgu / bağlam kodlaması ve çıkarım genişletmesi iki kural seti
+    için bir kez yapılır (çıkarım tabloları aynıysa)
+  - Doğrusal sayımlar birleştirilmiş sayım matrisiyle tek çarpımda
+    alınır; her kural seti yalnızca kendi skor adımını çalıştırır
+  - Kohort parça parça okunur; bellekte yalnızca özet tutulur
+
+Sonuç: primer patern karışıklık matrisi, skor farkı histogramları,
+primer paterni veya MDD kararı değişen vaka kimlikleri.
+
+Değiştirilmiş kural seti JSON dosyasından yüklenebilir (load_ruleset):
+
+    {
+      "patterns": {"uip_probable": {"base_score": 80,
+                                    "clinical_modifiers": {"age_over_60": 8}}},
+      "scoring_weights": {"against_per_finding": 10},
+      "mdd_thresholds": {"close_gap": 10},
+      "cooccurrence_rules": [...]
+    }
+
+"patterns" altındaki alanlar güncel tanımların üzerine yazılır
+(sözlük alanları anahtar bazında birleştirilir); "scoring_weights" ve
+"mdd_thresholds" SCORING_WEIGHTS / MDD_THRESHOLDS ile anahtar bazında
+birleştirilir; "implications" ve "cooccurrence_rules" verilirse tamamen
+değiştirilir.
+"""
+
+import copy
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.pattern_definitions import (
+    COOCCURRENCE_RULES,
+    FINDING_IMPLICATIONS,
+    PATTERN_CATEGORIES,
+    MDD_THRESHOLDS,
+    SCORING_WEIGHTS,
+)
+from modules.batch_engine import (
+    BatchDecisionEngine,
+    CompiledRuleset,
+    compile_ruleset,
+    encode_case_frame,
+    mdd_recommended,
+)
+
+
+# Skor farkı histogram sınırları (puan); [-1, 1) aralığı "değişmedi"
+SCORE_DELTA_BINS = np.array([-100, -50, -25, -15, -10, -5, -1, 1, 5, 10, 15, 25, 50, 100.001])
+
+NO_PRIMARY = "—"
+
+
+def _delta_labels():
+    edges = SCORE_DELTA_BINS
+    return [f"[{lo:g}, {min(hi, 100):g})" for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+# =============================================
+# KURAL SETİ YÜKLEME
+# =============================================
+def merge_ruleset(overrides: Dict) -> Dict:
+    """Güncel tanımlara değişiklikleri uygula → compile_ruleset argümanları."""
+    unknown = set(overrides) - {
+        "patterns", "implications", "cooccurrence_rules", "scoring_weights", "mdd_thresholds",
+    }
+    if unknown:
+        raise ValueError(f"Bilinmeyen kural seti alanı: {sorted(unknown)}")
+    unknown = set(overrides.get("scoring_weights", {})) - set(SCORING_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen skor ağırlığı: {sorted(unknown)}")
+    unknown = set(overrides.get("mdd_thresholds", {})) - set(MDD_THRESHOLDS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen MDD eşiği: {sorted(unknown)}")
+    patterns = copy.deepcopy(PATTERN_CATEGORIES)
+    for key, fields in overrides.get("patterns", {}).items():
+        target = patterns.setdefault(key, {})
+        for name, value in fields.items():
+            if isinstance(value, dict) and isinstance(target.get(name), dict):
+                target[name] = {**target[name], **value}
+            else:
+                target[name] = value
+    return {
+        "patterns": patterns,
+        "implications": overrides.get("implications", FINDING_IMPLICATIONS),
+        "cooccurrence_rules": overrides.get("cooccurrence_rules", COOCCURRENCE_RULES),
+        "scoring_weights": {**SCORING_WEIGHTS, **overrides.get("scoring_weights", {})},
+        "mdd_thresholds": {**MDD_THRESHOLDS, **overrides.get("mdd_thresholds", {})},
+    }
+
+
+def load_ruleset(path: str) -> CompiledRuleset:
+    """JSON değişiklik dosyasından kural seti derle (bkz. modül açıklaması)."""
+    with open(path, encoding="utf-8") as f:
+        return compile_ruleset(**merge_ruleset(json.load(f)))
+
+
+# =============================================
+# KARŞILAŞTIRMA
+# =============================================
+@dataclass
+class RulesetComparison:
+    """İki kural setinin kohort üzerindeki farkı (A = mevcut, B = yeni)."""
+    n_cases: int
+    confusion: pd.DataFrame             # satır = A primer patern, sütun = B primer patern
+    primary_score_delta: np.ndarray     # histogram sayıları (SCORE_DELTA_BINS)
+    pattern_score_delta: pd.DataFrame   # ortak paternler × histogram aralığı
+    changed_primary_ids: np.ndarray
+    changed_mdd_ids: np.ndarray
+    mdd_gained: int                     # A'da gerekmez, B'de önerilir
+    mdd_lost: int
+    seconds: float
+
+    @property
+    def changed_primary(self) -> int:
+        return len(self.changed_primary_ids)
+
+    @property
+    def changed_mdd(self) -> int:
+        return len(self.changed_mdd_ids)
+
+    @property
+    def delta_labels(self):
+        return _delta_labels()
+
+
+class RulesetComparator:
+    """
+    İki kural setini aynı kohort parçalarında birlikte değerlendirir.
+
+    Args:
+        ruleset_a: Mevcut kural seti (varsayılan güncel tanımlar)
+        ruleset_b: Karşılaştırılacak kural seti
+    """
+
+    def __init__(self, ruleset_b: CompiledRuleset, ruleset_a: Optional[CompiledRuleset] = None):
+        self.engine_a = BatchDecisionEngine(ruleset_a)
+        self.engine_b = BatchDecisionEngine(ruleset_b)
+        rs_a, rs_b = self.engine_a.ruleset, self.engine_b.ruleset
+        self._shared_expansion = np.array_equal(rs_a.implications, rs_b.implications)
+        # Birleştirilmiş sayım matrisi: tek çarpım, iki kural seti
+        self._count_matrix = np.hstack([self.engine_a.count_matrix, self.engine_b.count_matrix])
+        self._split = self.engine_a.count_matrix.shape[1]
+        labels_a = list(rs_a.pattern_keys) + [NO_PRIMARY]
+        labels_b = list(rs_b.pattern_keys) + [NO_PRIMARY]
+        self._confusion = np.zeros((len(labels_a), len(labels_b)), dtype=np.int64)
+        self._labels = (labels_a, labels_b)
+        self._common = [k for k in rs_a.pattern_keys if k in rs_b.pattern_index]
+        self._common_a = np.array([rs_a.pattern_index[k] for k in self._common], dtype=np.intp)
+        self._common_b = np.array([rs_b.pattern_index[k] for k in self._common], dtype=np.intp)
+        self.reset()
+
+    def reset(self) -> None:
+        self._confusion[:] = 0
+        self._primary_delta = np.zeros(len(SCORE_DELTA_BINS) - 1, dtype=np.int64)
+        self._pattern_delta = np.zeros((len(self._common), len(SCORE_DELTA_BINS) - 1), dtype=np.int64)
+        self._changed_primary, self._changed_mdd = [], []
+        self._mdd_gained = self._mdd_lost = 0
+        self._n = 0
+        self._seconds = 0.0
+
+    def add(self, cases: pd.DataFrame) -> None:
+        """
+        Kohort parçasını değerlendir.
+
+        cases: encode_case_frame biçimi (finding_mask / findings / bulgu
+        sütunları + bağlam sütunları) ve "id" sütunu (yoksa satır sırası).
+        """
+        start = time.perf_counter()
+        X, C = encode_case_frame(cases)
+        has_findings = X.any(axis=1)
+        ids = cases["id"].to_numpy() if "id" in cases.columns else np.arange(self._n, self._n + len(cases))
+
+        E_a = self.engine_a.expand(X)
+        if self._shared_expansion:
+            counts = E_a.astype(np.float64) @ self._count_matrix
+            counts_a, counts_b = counts[:, :self._split], counts[:, self._split:]
+        else:
+            counts_a = self.engine_a.count_features(E_a)
+            counts_b = self.engine_b.count_features(self.engine_b.expand(X))
+        a = self.engine_a.score_counts(counts_a, has_findings, C)
+        b = self.engine_b.score_counts(counts_b, has_findings, C)
+        self._accumulate(ids, a, b)
+        self._n += len(cases)
+        self._seconds += time.perf_counter() - start
+
+    def _accumulate(self, ids: np.ndarray, a: Dict, b: Dict) -> None:
+        rows = np.arange(len(ids))
+        n_a, n_b = len(self._labels[0]), len(self._labels[1])
+        # Primer yok (-1) son satır / sütuna düşer
+        primary_a = np.where(a["primary"] >= 0, a["primary"], n_a - 1)
+        primary_b = np.where(b["primary"] >= 0, b["primary"], n_b - 1)
+        self._confusion += np.bincount(primary_a * n_b + primary_b, minlength=n_a * n_b).reshape(n_a, n_b)
+
+        score_a = np.where(a["primary"] >= 0, a["final_score"][rows, a["order"][:, 0]], 0.0)
+        score_b = np.where(b["primary"] >= 0, b["final_score"][rows, b["order"][:, 0]], 0.0)
+        self._primary_delta += np.histogram(score_b - score_a, SCORE_DELTA_BINS)[0]
+        if len(self._common):
+            delta = b["final_score"][:, self._common_b] - a["final_score"][:, self._common_a]
+            bins = np.clip(np.searchsorted(SCORE_DELTA_BINS, delta, side="right") - 1, 0, len(SCORE_DELTA_BINS) - 2)
+            n_bins = len(SCORE_DELTA_BINS) - 1
+            flat = np.arange(len(self._common)) * n_bins + bins
+            self._pattern_delta += np.bincount(flat.ravel(), minlength=len(self._common) * n_bins).reshape(-1, n_bins)
+
+        # Patern anahtarıyla karşılaştırılır (kural setlerinde sıra farklı olabilir)
+        keys_a = np.array(self._labels[0], dtype=object)[primary_a]
+        keys_b = np.array(self._labels[1], dtype=object)[primary_b]
+        self._changed_primary.append(ids[keys_a != keys_b])
+        mdd_a = mdd_recommended(a["mdd_code"])
+        mdd_b = mdd_recommended(b["mdd_code"])
+        self._changed_mdd.append(ids[mdd_a != mdd_b])
+        self._mdd_gained += int((~mdd_a & mdd_b).sum())
+        self._mdd_lost += int((mdd_a & ~mdd_b).sum())
+
+    def result(self) -> RulesetComparison:
+        labels_a, labels_b = self._labels
+        empty = np.empty(0, dtype=np.int64)
+        return RulesetComparison(
+            n_cases=self._n,
+            confusion=pd.DataFrame(self._confusion.copy(), index=labels_a, columns=labels_b),
+            primary_score_delta=self._primary_delta.copy(),
+            pattern_score_delta=pd.DataFrame(
+                self._pattern_delta.copy(),
+                index=self._common,
+                columns=_delta_labels(),
+            ),
+            changed_primary_ids=np.concatenate(self._changed_primary) if self._changed_primary else empty,
+            changed_mdd_ids=np.concatenate(self._changed_mdd) if self._changed_mdd else empty,
+            mdd_gained=self._mdd_gained,
+            mdd_lost=self._mdd_lost,
+            seconds=self._seconds,
+        )
+
+
+def compare_rulesets(
+    ruleset_b: CompiledRuleset,
+    cohort: Iterable[pd.DataFrame],
+    ruleset_a: Optional[CompiledRuleset] = None,
+) -> RulesetComparison:
+    """
+    Kohort parçaları (ör. CaseArchive.iter_cases) üzerinde iki kural setini karşılaştır.
+
+    Arşiv kayıtlarında sigara ve başvuru şekli tutulmaz; bu bağlam
+    özellikleri motor varsayılanlarıyla değerlendirilir.
+    """
+    comparator = RulesetComparator(ruleset_b, ruleset_a)
+    for chunk in cohort:
+        comparator.add(chunk)
+    return comparator.result()
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Kural Seti Kalite Kontrolü — Gray Kodu ile Kapsamlı Tarama
+
+Ağırlık değişikliği yayına alınmadan önce seçilen bulgu alt kümesinin
+TÜM kombinasyonları her klinik bağlam sınıfı için skorlanır ve
+anomaliler akış halinde raporlanır:
+
+  - tie: ilk iki patern skoru arasındaki fark ≤ tie_margin puan
+  - uip_outranked: uip_definite tetiklenmişken karşıt bulgulu bir
+    patern primer olmuş
+  - unreachable: taramanın hiçbir kombinasyonunda primer olmayan patern
+    (tüm parçalar bittikten sonra raporlanır)
+
+Kombinasyonlar Gray kodu sırasında gezilir: ardışık iki adım yalnızca
+bir bulguda farklıdır. Her adımda bulgu başına "kapsam sayısı"
+(seçili bit + onu ima eden seçili bulgular) tek bir satır eklenerek /
+çıkarılarak güncellenir; genişletilmiş bulgu kümesi kapsam > 0'dır.
+Sayımlar da yalnızca değişen genişletilmiş bulguların sayım satırları
+(bulgu başına O(P)) eklenerek güncellenir. Adımlar parçalar halinde
+NumPy ile (cumsum) işlenir; parçalar süreç havuzunda paralel skorlanır.
+"""
+
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.findings_taxonomy import FINDING_KEYS
+from modules.batch_engine import BatchDecisionEngine, CompiledRuleset, encode_context_dicts
+from modules.state_codec import decode_findings
+
+
+# Varsayılan klinik bağlam sınıfları (ILDDecisionEngine bağlam dict'leri)
+CONTEXT_CLASSES = {
+    "Varsayılan": {},
+    "Yaşlı erkek, sigara": {"age": 70, "sex": "Erkek", "smoking": "Eski içici"},
+    "Genç kadın, CTD": {"age": 45, "sex": "Kadın", "ctd": "Romatoid artrit"},
+    "Maruziyet, subakut": {"age": 55, "exposure": "Kuş", "presentation": "Subakut (1-3 ay)"},
+}
+
+ANOMALY_KINDS = ("tie", "uip_outranked", "unreachable")
+
+DEFAULT_CHUNK_BITS = 14
+
+
+@dataclass
+class RulesetAnomaly:
+    """Tek bir anomali."""
+    kind: str                       # ANOMALY_KINDS
+    context: str                    # bağlam sınıfı adı ("" = tüm tarama)
+    finding_mask: int               # seçili bulgular (unreachable için 0)
+    pattern: str                    # primer (veya ulaşılamayan) patern
+    other: Optional[str] = None     # ikinci patern / uip_definite
+    score: float = 0.0
+    other_score: float = 0.0
+
+    @property
+    def findings(self) -> List[str]:
+        return decode_findings(self.finding_mask)
+
+
+@dataclass
+class EnumerationSummary:
+    """Tarama özeti (run tamamlandığında dolar)."""
+    combinations: int = 0
+    seconds: float = 0.0
+    anomaly_counts: Dict[str, int] = field(default_factory=dict)
+    primary_counts: Dict[str, int] = field(default_factory=dict)   # "" = primer yok
+
+    @property
+    def combinations_per_second(self) -> float:
+        return self.combinations / self.seconds if self.seconds > 0 else 0.0
+
+
+# =============================================
+# GRAY KODU PARÇA SKORLAYICI
+# =============================================
+def _trailing_zeros(values: np.ndarray) -> np.ndarray:
+    return np.bitwise_count((values & -values) - 1)
+
+
+class _GrayScorer:
+    """Bir Gray kodu aralığını artımlı sayımlarla skorlar (süreç başına bir kopya)."""
+
+    def __init__(
+        self,
+        ruleset: CompiledRuleset,
+        finding_index: np.ndarray,
+        base_mask: int,
+        contexts: np.ndarray,
+        tie_margin: float,
+    ):
+        self.engine = BatchDecisionEngine(ruleset)
+        self.finding_index = finding_index
+        self.base_mask = base_mask
+        self.contexts = contexts
+        self.tie_margin = tie_margin
+        F = len(FINDING_KEYS)
+        # Kapsam: bulgu kendisini ve ima ettiklerini kapsar
+        # (kapsam sayıları küçük tamsayılardır; int8 birikimli toplam en hızlısı)
+        self.closure = (np.eye(F) + ruleset.implications > 0).astype(np.int8)
+        self.count_matrix = self.engine.count_matrix
+        self.bit_masks = np.left_shift(np.int64(1), finding_index.astype(np.int64))
+        idx = ruleset.pattern_index
+        self.uip_definite = idx.get("uip_definite", -1)
+        base_bits = (np.int64(base_mask) >> np.arange(F, dtype=np.int64)) & 1
+        self.base_coverage = (base_bits[:, None] * self.closure).sum(axis=0).astype(np.int8)
+
+    def _masks(self, gray: np.ndarray) -> np.ndarray:
+        bits = (gray[:, None] >> np.arange(len(self.finding_index), dtype=np.int64)) & 1
+        return np.int64(self.base_mask) | (bits * self.bit_masks).sum(axis=1)
+
+    def score(self, context: int, start: int, stop: int):
+        steps = np.arange(start, stop, dtype=np.int64)
+        gray = steps ^ (steps >> 1)
+
+        # Başlangıç durumu doğrudan, sonraki adımlar tek bulgu farkıyla
+        first_bits = (gray[0] >> np.arange(len(self.finding_index), dtype=np.int64)) & 1
+        coverage0 = self.base_coverage + (first_bits[:, None] * self.closure[self.finding_index]).sum(axis=0).astype(np.int8)
+        if len(steps) > 1:
+            flipped = _trailing_zeros(steps[1:]).astype(np.intp)
+            sign = np.where((gray[1:] >> flipped) & 1, 1, -1).astype(np.int8)
+            delta = self.closure[self.finding_index[flipped]] * sign[:, None]
+            coverage = np.vstack([coverage0, coverage0 + np.cumsum(delta, axis=0, dtype=np.int8)])
+        else:
+            coverage = coverage0[None, :]
+        expanded = coverage > 0
+
+        # Sayımlar: ilk satır tam, sonrası yalnızca değişen genişletilmiş bulgular
+        # (değişim satırı seyrek: adım başına en fazla 1 + ima edilen bulgu sayısı)
+        changed = np.diff(expanded.astype(np.int8), axis=0).astype(np.float64)
+        counts = np.vstack([
+            expanded[:1].astype(np.float64) @ self.count_matrix,
+            changed @ self.count_matrix,
+        ]).cumsum(axis=0)
+        has_findings = (gray != 0) | bool(self.base_mask)
+        result = self.engine.score_counts(counts, has_findings, self.contexts[context:context + 1])
+        return self._anomalies(context, gray, result, has_findings)
+
+    def _anomalies(self, context: int, gray: np.ndarray, result: Dict, has_findings: np.ndarray):
+        final = result["final_score"]
+        order = result["order"]
+        primary = result["primary"]
+        rows = np.arange(len(primary))
+        top_score = final[rows, order[:, 0]]
+        second_score = final[rows, order[:, 1]]
+
+        found = []
+        tie = (primary >= 0) & (second_score > 0) & (top_score - second_score <= self.tie_margin)
+        if self.uip_definite >= 0:
+            # Karşıt bulgu cezası almış primer patern uip_definite'in önüne geçmiş
+            outranked = (
+                (primary >= 0)
+                & (primary != self.uip_definite)
+                & result["triggered"][:, self.uip_definite]
+                & (result["penalty_score"][rows, np.maximum(primary, 0)] > 0)
+            )
+        else:
+            outranked = np.zeros(len(primary), dtype=bool)
+
+        for kind, flags, other in (
+            ("tie", tie, order[:, 1]),
+            ("uip_outranked", outranked, np.full(len(primary), self.uip_definite)),
+        ):
+            hit = np.flatnonzero(flags)
+            if len(hit):
+                found.append((
+                    kind, context, self._masks(gray[hit]), primary[hit], other[hit],
+                    top_score[hit], final[hit, other[hit]],
+                ))
+        primary_counts = np.bincount(primary + 1, minlength=final.shape[1] + 1)
+        return found, primary_counts, len(primary)
+
+
+_worker_scorer: Optional[_GrayScorer] = None
+
+
+def _init_worker(*args) -> None:
+    global _worker_scorer
+    _worker_scorer = _GrayScorer(*args)
+
+
+def _score_in_worker(task: Tuple[int, int, int]):
+    return _worker_scorer.score(*task)
+
+
+# =============================================
+# TARAMA
+# =============================================
+class GrayCodeEnumerator:
+    """
+    Bulgu alt kümesinin tüm kombinasyonlarını bağlam sınıfları için tara.
+
+    Args:
+        findings: Taranacak bulgular (2^len kombinasyon)
+        contexts: Bağlam sınıfı adı → klinik bağlam dict'i
+        base_findings: Tüm kombinasyonlarda sabit seçili bulgular
+        ruleset: Derlenmiş kural seti (varsayılan güncel tanımlar)
+        tie_margin: Bu puan farkına kadar ilk iki patern "eşit" sayılır
+        chunk_bits: Parça başına 2^chunk_bits kombinasyon
+    """
+
+    def __init__(
+        self,
+        findings: Sequence[str],
+        contexts: Optional[Dict[str, Dict]] = None,
+        base_findings: Sequence[str] = (),
+        ruleset: Optional[CompiledRuleset] = None,
+        tie_margin: float = 1.0,
+        chunk_bits: int = DEFAULT_CHUNK_BITS,
+    ):
+        index = {key: i for i, key in enumerate(FINDING_KEYS)}
+        unknown = [k for k in (*findings, *base_findings) if k not in index]
+        if unknown:
+            raise ValueError(f"Bilinmeyen bulgu anahtarı: {unknown}")
+        overlap = set(findings) & set(base_findings)
+        if overlap:
+            raise ValueError(f"Bulgu hem taranan hem sabit: {sorted(overlap)}")
+        if len(findings) > 40:
+            raise ValueError("En fazla 40 bulgu taranabilir")
+
+        self.findings = tuple(findings)
+        self.contexts = dict(CONTEXT_CLASSES if contexts is None else contexts)
+        self.ruleset = ruleset or BatchDecisionEngine().ruleset
+        self.tie_margin = tie_margin
+        self.chunk_bits = chunk_bits
+        self.base_mask = sum(1 << index[k] for k in base_findings)
+        self.summary = EnumerationSummary()
+        self._scorer_args = (
+            self.ruleset,
+            np.array([index[k] for k in self.findings], dtype=np.intp),
+            self.base_mask,
+            encode_context_dicts(list(self.contexts.values())),
+            tie_margin,
+        )
+
+    @property
+    def combinations(self) -> int:
+        return (1 << len(self.findings)) * len(self.contexts)
+
+    def _tasks(self) -> List[Tuple[int, int, int]]:
+        total = 1 << len(self.findings)
+        size = 1 << self.chunk_bits
+        return [
+            (c, start, min(start + size, total))
+            for c in range(len(self.contexts))
+            for start in range(0, total, size)
+        ]
+
+    def run(self, processes: Optional[int] = None) -> Iterator[RulesetAnomaly]:
+        """
+        Taramayı çalıştır; anomalileri bulundukça üret (parça sırası garanti değil).
+
+        Args:
+            processes: Süreç sayısı (varsayılan CPU sayısı); 1 = aynı süreçte
+        """
+        pattern_keys = self.ruleset.pattern_keys
+        context_names = list(self.contexts)
+        summary = EnumerationSummary(anomaly_counts=dict.fromkeys(ANOMALY_KINDS, 0))
+        primary_counts = np.zeros(len(pattern_keys) + 1, dtype=np.int64)
+        start = time.perf_counter()
+
+        if processes == 1:
+            scorer = _GrayScorer(*self._scorer_args)
+            results = (scorer.score(*task) for task in self._tasks())
+            pool = None
+        else:
+            pool = Pool(processes, initializer=_init_worker, initargs=self._scorer_args)
+            results = pool.imap_unordered(_score_in_worker, self._tasks())
+        try:
+            for found, counts, n in results:
+                primary_counts += counts
+                summary.combinations += n
+                for kind, context, masks, primary, other, score, other_score in found:
+                    summary.anomaly_counts[kind] += len(masks)
+                    for i in range(len(masks)):
+                        yield RulesetAnomaly(
+                            kind=kind,
+                            context=context_names[context],
+                            finding_mask=int(masks[i]),
+                            pattern=pattern_keys[primary[i]],
+                            other=pattern_keys[other[i]],
+                            score=float(score[i]),
+                            other_score=float(other_score[i]),
+                        )
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        for p, key in enumerate(pattern_keys):
+            if primary_counts[p + 1] == 0:
+                summary.anomaly_counts["unreachable"] += 1
+                yield RulesetAnomaly(kind="unreachable", context="", finding_mask=0, pattern=key)
+        summary.seconds = time.perf_counter() - start
+        summary.primary_counts = {
+            (pattern_keys[i - 1] if i else ""): int(c) for i, c in enumerate(primary_counts)
+        }
+        self.summary = summary
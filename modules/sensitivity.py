@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Bulgu Duyarlılık Analizi ("what-if")
+
+Sınırda kalan bulgular (bal peteği, traksiyon bronşektazisi vb.) için
+tek bir vakada her bulgunun tek başına eklenmesi / çıkarılması
+durumundaki sonuç hesaplanır. 33 ayrı analyze() çağrısı yerine vaka
+satırı ve 33 tek-bit değişimi (F + 1, F) matriste üst üste konur ve
+BatchDecisionEngine ile tek geçişte skorlanır.
+
+Primer paterni, güven düzeyini veya MDD kararını değiştiren değişimler
+"karar açısından kritik bulgular" olarak raporlanır.
+
+reader_uncertainty okuyucular arası değişkenliği Monte Carlo ile
+taklit eder: bulgu başına düşme / ekleme olasılıklarıyla
+(config/reader_variability.py) binlerce bozulmuş bulgu kümesi
+örneklenir. Örneklerin çoğu birbirinin aynısı olduğundan yalnızca
+benzersiz bulgu maskeleri skorlanır ve sonuçlar tekrar sayılarıyla
+ağırlıklandırılır; 10.000 örnek birkaç milisaniyede değerlendirilir.
+"""
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.findings_taxonomy import ALL_FINDING_GROUPS, FINDING_KEYS
+from config.reader_variability import (
+    CONFUSION_PAIRS,
+    DEFAULT_ADD_PROBABILITY,
+    DEFAULT_DROP_PROBABILITY,
+    FLIP_PROBABILITIES,
+)
+from modules.batch_engine import (
+    MDD_CODES,
+    BatchDecisionEngine,
+    BatchResult,
+    confidence_band,
+    encode_context_dicts,
+    encode_finding_masks,
+    finding_masks,
+)
+from modules.decision_engine import CONFIDENCE_LEVELS
+
+
+_FINDING_LABELS = {
+    key: info["label"]
+    for group in ALL_FINDING_GROUPS.values()
+    for key, info in group.items()
+}
+
+
+@lru_cache(maxsize=1)
+def default_batch_engine() -> BatchDecisionEngine:
+    """Süreç genelinde paylaşılan toplu motor (kural seti bir kez derlenir)."""
+    return BatchDecisionEngine()
+
+
+@dataclass
+class CaseOutcome:
+    """Tek satırın karar özeti."""
+    primary_pattern: Optional[str]      # patern anahtarı, None = primer patern yok
+    primary_score: float
+    confidence_band: int                # CONFIDENCE_LEVELS indeksi, -1 = yok
+    mdd_recommended: bool
+    mdd_reason_code: str
+
+    @property
+    def confidence_label(self) -> str:
+        return CONFIDENCE_LEVELS[self.confidence_band][1]["label"] if self.confidence_band >= 0 else "—"
+
+
+@dataclass
+class FindingToggle:
+    """Tek bir bulgunun eklenmesi / çıkarılması sonucu."""
+    finding_key: str
+    label: str
+    added: bool                         # True = bulgu eklendi, False = çıkarıldı
+    outcome: CaseOutcome
+    changes_primary: bool
+    changes_confidence: bool
+    changes_mdd: bool
+
+    @property
+    def critical(self) -> bool:
+        return self.changes_primary or self.changes_confidence or self.changes_mdd
+
+
+@dataclass
+class SensitivityResult:
+    """Vaka ve tüm tek-bulgu değişimleri (FINDING_KEYS sırasında)."""
+    baseline: CaseOutcome
+    toggles: List[FindingToggle]
+    batch: BatchResult = field(repr=False)   # satır 0 = vaka, satır i + 1 = i. bulgu değişimi
+
+    @property
+    def critical(self) -> List[FindingToggle]:
+        """Kararı değiştiren değişimler (önce seçili bulguların çıkarılması)."""
+        return sorted(
+            (t for t in self.toggles if t.critical),
+            key=lambda t: (t.added, -t.changes_primary, -t.changes_mdd),
+        )
+
+
+def _outcomes(batch: BatchResult) -> Dict[str, np.ndarray]:
+    scores = batch.primary_score
+    has_primary = batch.primary >= 0
+    return {
+        "primary": batch.primary,
+        "score": scores,
+        "band": np.where(has_primary, confidence_band(scores), -1),
+        "mdd": batch.mdd_recommended,
+        "code": batch.mdd_code,
+    }
+
+
+def _outcome(batch: BatchResult, values: Dict[str, np.ndarray], i: int) -> CaseOutcome:
+    p = values["primary"][i]
+    return CaseOutcome(
+        primary_pattern=batch.ruleset.pattern_keys[p] if p >= 0 else None,
+        primary_score=float(values["score"][i]),
+        confidence_band=int(values["band"][i]),
+        mdd_recommended=bool(values["mdd"][i]),
+        mdd_reason_code=MDD_CODES[values["code"][i]],
+    )
+
+
+def finding_sensitivity(
+    finding_mask: int,
+    clinical_context: Optional[Dict] = None,
+    engine: Optional[BatchDecisionEngine] = None,
+) -> SensitivityResult:
+    """
+    Vaka için her bulgunun tek başına değiştirildiği sonuçları hesapla.
+
+    Args:
+        finding_mask: Seçilen bulguların bit maskesi (state_codec.encode_findings)
+        clinical_context: ILDDecisionEngine.analyze ile aynı klinik bağlam dict'i
+        engine: Toplu motor (varsayılan paylaşılan motor)
+    """
+    engine = engine or default_batch_engine()
+    base = encode_finding_masks([finding_mask])[0]
+    n_findings = len(FINDING_KEYS)
+    # Satır 0 vaka; satır i + 1'de yalnızca i. bulgu tersine çevrilir
+    X = np.vstack([base, base ^ np.eye(n_findings, dtype=bool)])
+    C = np.repeat(encode_context_dicts([clinical_context or {}]), n_findings + 1, axis=0)
+    batch = engine.analyze(X, C)
+
+    values = _outcomes(batch)
+    changed_primary = values["primary"][1:] != values["primary"][0]
+    changed_band = values["band"][1:] != values["band"][0]
+    changed_mdd = values["mdd"][1:] != values["mdd"][0]
+    toggles = [
+        FindingToggle(
+            finding_key=key,
+            label=_FINDING_LABELS[key],
+            added=not base[i],
+            outcome=_outcome(batch, values, i + 1),
+            changes_primary=bool(changed_primary[i]),
+            changes_confidence=bool(changed_band[i]),
+            changes_mdd=bool(changed_mdd[i]),
+        )
+        for i, key in enumerate(FINDING_KEYS)
+    ]
+    return SensitivityResult(baseline=_outcome(batch, values, 0), toggles=toggles, batch=batch)
+
+
+# =============================================
+# OKUYUCU DEĞİŞKENLİĞİ (MONTE CARLO)
+# =============================================
+@dataclass
+class UncertaintyResult:
+    """
+    Monte Carlo örneklerinin özeti.
+
+    score_quantiles: (P, 3) — her patern için alt sınır, medyan, üst sınır
+    (kural setindeki patern sırasında; tetiklenmeyen örneklerde skor 0).
+    """
+    n_samples: int
+    unique_samples: int
+    interval: float
+    pattern_keys: tuple
+    primary_probability: Dict[Optional[str], float]   # None = primer patern yok
+    score_quantiles: np.ndarray
+    primary_score_quantiles: Tuple[float, float, float]
+    mdd_probability: float
+
+    def score_interval(self, pattern_key: str) -> Tuple[float, float]:
+        lo, _, hi = self.score_quantiles[self.pattern_keys.index(pattern_key)]
+        return float(lo), float(hi)
+
+    def ranked_primary(self) -> List[Tuple[Optional[str], float]]:
+        """Primer patern olasılıkları (azalan)."""
+        return sorted(self.primary_probability.items(), key=lambda item: -item[1])
+
+
+def _finding_probabilities(values: Dict[str, Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    unknown = set(values) - set(FINDING_KEYS)
+    if unknown:
+        raise ValueError(f"Bilinmeyen bulgu anahtarı: {sorted(unknown)}")
+    drop = np.array([values.get(k, (DEFAULT_DROP_PROBABILITY, 0))[0] for k in FINDING_KEYS])
+    add = np.array([values.get(k, (0, DEFAULT_ADD_PROBABILITY))[1] for k in FINDING_KEYS])
+    return drop, add
+
+
+def _confusion_arrays(pairs: Sequence[Tuple[str, str, float]]):
+    index = {key: i for i, key in enumerate(FINDING_KEYS)}
+    unknown = {k for a, b, _ in pairs for k in (a, b)} - set(index)
+    if unknown:
+        raise ValueError(f"Bilinmeyen bulgu anahtarı: {sorted(unknown)}")
+    return (
+        np.array([index[a] for a, _, _ in pairs], dtype=np.intp),
+        np.array([index[b] for _, b, _ in pairs], dtype=np.intp),
+        np.array([p for _, _, p in pairs], dtype=np.float64),
+    )
+
+
+@lru_cache(maxsize=1)
+def _default_flip_tables():
+    return _finding_probabilities(FLIP_PROBABILITIES), _confusion_arrays(CONFUSION_PAIRS)
+
+
+def sample_findings(
+    finding_mask: int,
+    n_samples: int,
+    rng: np.random.Generator,
+    flip_probabilities: Optional[Dict[str, Tuple[float, float]]] = None,
+    confusion_pairs: Optional[Sequence[Tuple[str, str, float]]] = None,
+) -> np.ndarray:
+    """Vaka bulgularından bozulmuş (n_samples, F) bulgu matrisi örnekle."""
+    if flip_probabilities is None and confusion_pairs is None:
+        (drop, add), (src, dst, swap_p) = _default_flip_tables()
+    else:
+        drop, add = _finding_probabilities(FLIP_PROBABILITIES if flip_probabilities is None else flip_probabilities)
+        src, dst, swap_p = _confusion_arrays(CONFUSION_PAIRS if confusion_pairs is None else confusion_pairs)
+    base = encode_finding_masks([finding_mask])[0]
+    # Yalnızca seçili kaynak bulgulu çiftler örneklenir
+    active = base[src]
+    src, dst, swap_p = src[active], dst[active], swap_p[active]
+
+    draws = rng.random((n_samples, len(FINDING_KEYS) + len(src)))
+    X = base ^ (draws[:, :len(FINDING_KEYS)] < np.where(base, drop, add))
+    if len(src):
+        swap = (draws[:, len(FINDING_KEYS):] < swap_p) & X[:, src]
+        for j in range(len(src)):
+            X[swap[:, j], src[j]] = False
+            X[swap[:, j], dst[j]] = True
+    return X
+
+
+def _weighted_quantiles(values: np.ndarray, weights: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """Sütun bazında ağırlıklı kantiller (ters dağılım fonksiyonu): (U, P) → (P, len(qs))."""
+    order = np.argsort(values, axis=0, kind="stable")
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    cumulative = np.cumsum(weights[order], axis=0)
+    total = cumulative[-1]
+    result = np.empty((values.shape[1], len(qs)))
+    for j, q in enumerate(qs):
+        pos = (cumulative >= q * total).argmax(axis=0)
+        result[:, j] = sorted_values[pos, np.arange(values.shape[1])]
+    return result
+
+
+def reader_uncertainty(
+    finding_mask: int,
+    clinical_context: Optional[Dict] = None,
+    n_samples: int = 10_000,
+    interval: float = 0.90,
+    seed: Optional[int] = 0,
+    engine: Optional[BatchDecisionEngine] = None,
+    flip_probabilities: Optional[Dict[str, Tuple[float, float]]] = None,
+    confusion_pairs: Optional[Sequence[Tuple[str, str, float]]] = None,
+) -> UncertaintyResult:
+    """
+    Okuyucular arası değişkenlik altında skor aralıkları ve primer patern olasılıkları.
+
+    Args:
+        finding_mask: Seçilen bulguların bit maskesi
+        clinical_context: ILDDecisionEngine.analyze ile aynı klinik bağlam dict'i
+        n_samples: Örnek sayısı
+        interval: Skor aralığı kapsamı (0.90 → %5–%95 kantilleri)
+        seed: Rastgele tohum (aynı vaka için kararlı gösterim; None = rastgele)
+        flip_probabilities: Bulgu → (drop, add) (varsayılan FLIP_PROBABILITIES)
+        confusion_pairs: (kaynak, hedef, olasılık) (varsayılan CONFUSION_PAIRS)
+    """
+    engine = engine or default_batch_engine()
+    rng = np.random.default_rng(seed)
+    X = sample_findings(finding_mask, n_samples, rng, flip_probabilities, confusion_pairs)
+
+    # Benzersiz bulgu kümeleri bir kez skorlanır
+    unique_masks, counts = np.unique(finding_masks(X), return_counts=True)
+    C = np.repeat(encode_context_dicts([clinical_context or {}]), len(unique_masks), axis=0)
+    batch = engine.analyze(encode_finding_masks(unique_masks), C)
+
+    weights = counts.astype(np.float64)
+    pattern_keys = batch.ruleset.pattern_keys
+    primary_counts = np.bincount(batch.primary + 1, weights=weights, minlength=len(pattern_keys) + 1)
+    primary_probability = {
+        (pattern_keys[i - 1] if i else None): float(c / n_samples)
+        for i, c in enumerate(primary_counts) if c
+    }
+    tail = (1 - interval) / 2
+    qs = (tail, 0.5, 1 - tail)
+    primary_q = _weighted_quantiles(batch.primary_score[:, None], weights, qs)[0]
+    return UncertaintyResult(
+        n_samples=n_samples,
+        unique_samples=len(unique_masks),
+        interval=interval,
+        pattern_keys=pattern_keys,
+        primary_probability=primary_probability,
+        score_quantiles=_weighted_quantiles(batch.final_score, weights, qs),
+        primary_score_quantiles=tuple(float(v) for v in primary_q),
+        mdd_probability=float(weights[batch.mdd_recommended].sum() / n_samples),
+    )
+
+
+# =============================================
+# SONRAKİ EN İYİ BULGU (BEKLENEN BİLGİ KAZANCI)
+# =============================================
+@dataclass
+class FindingPriors:
+    """Arşivden tahmin edilen bulgu olasılıkları (kural seti patern sırasında)."""
+    pattern_keys: tuple
+    likelihood: np.ndarray      # (P, F) P(bulgu | primer patern)
+    marginal: np.ndarray        # (F,) P(bulgu)
+    n_cases: int
+
+
+def finding_priors(
+    counts,
+    pattern_keys: Sequence[str],
+    smoothing: float = 2.0,
+) -> FindingPriors:
+    """
+    CaseArchive.finding_counts tablosundan bulgu olasılıkları.
+
+    Patern koşullu sıklıklar az vakalı paternlerde genel sıklığa doğru
+    çekilir: (sayı + smoothing × P(bulgu)) / (vaka + smoothing).
+    Genel sıklık Laplace düzeltmelidir; boş arşivde tüm olasılıklar 0.5 olur.
+    """
+    findings = list(FINDING_KEYS)
+    totals = counts[findings].to_numpy(dtype=np.float64).sum(axis=0) if len(counts) else np.zeros(len(findings))
+    n_cases = int(counts["cases"].sum()) if len(counts) else 0
+    marginal = (totals + 1) / (n_cases + 2)
+
+    likelihood = np.tile(marginal, (len(pattern_keys), 1))
+    index = {key: i for i, key in enumerate(pattern_keys)}
+    for row in counts.itertuples(index=False):
+        p = index.get(row.primary_pattern)
+        if p is None:
+            continue
+        seen = np.array([getattr(row, key) for key in findings], dtype=np.float64)
+        likelihood[p] = (seen + smoothing * marginal) / (row.cases + smoothing)
+    return FindingPriors(
+        pattern_keys=tuple(pattern_keys),
+        likelihood=likelihood,
+        marginal=marginal,
+        n_cases=n_cases,
+    )
+
+
+@dataclass
+class FindingSuggestion:
+    """Değerlendirilmesi önerilen bulgu."""
+    finding_key: str
+    label: str
+    expected_gain: float        # beklenen entropi azalması (bit)
+    probability_present: float  # odak paternler altında bulgunun görülme olasılığı
+    outcome: CaseOutcome        # bulgu doğrulanırsa sonuç
+
+
+def _entropy(p: np.ndarray) -> np.ndarray:
+    """Satır bazında Shannon entropisi (bit)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, -p * np.log2(p), 0.0)
+    return terms.sum(axis=-1)
+
+
+# Skorlardan patern olasılıklarına geçişte softmax sıcaklığı (skor puanı);
+# MDD "yakın skor" eşiği (15 puan) ≈ 0.8 / 0.2 olasılık
+SCORE_TEMPERATURE = 10.0
+
+
+def _softmax(scores: np.ndarray, temperature: float) -> np.ndarray:
+    z = scores / temperature
+    z = np.exp(z - z.max(axis=-1, keepdims=True))
+    return z / z.sum(axis=-1, keepdims=True)
+
+
+def next_best_findings(
+    finding_mask: int,
+    clinical_context: Optional[Dict] = None,
+    priors: Optional[FindingPriors] = None,
+    focus: int = 2,
+    top_k: int = 3,
+    temperature: float = SCORE_TEMPERATURE,
+    engine: Optional[BatchDecisionEngine] = None,
+) -> List[FindingSuggestion]:
+    """
+    İlk paternleri en iyi ayıracak, henüz seçilmemiş bulgular.
+
+    Belirsizlik ilk `focus` paternin skorlarından softmax ile oluşturulan
+    dağılımın entropisidir. Her seçilmemiş bulgu vakaya eklenmiş satırlar tek
+    geçişte skorlanır. Bulgu doğrulanırsa (olasılık q) dağılım yeni
+    skorlardan hesaplanır; doğrulanmazsa motor açısından vaka değişmez.
+    Beklenen kazanç = q × (H₀ − H₊); q arşiv olasılıklarının odak
+    paternlerin ağırlıklarıyla ortalamasıdır.
+
+    Returns:
+        Kazancı pozitif olan en iyi top_k öneri (azalan)
+    """
+    engine = engine or default_batch_engine()
+    rs = engine.ruleset
+    base = encode_finding_masks([finding_mask])[0]
+    candidates = np.flatnonzero(~base)
+    if not base.any() or not len(candidates):
+        return []
+
+    X = np.vstack([base, base | np.eye(len(FINDING_KEYS), dtype=bool)[candidates]])
+    C = np.repeat(encode_context_dicts([clinical_context or {}]), len(X), axis=0)
+    batch = engine.analyze(X, C)
+
+    focus_idx = batch.order[0, :focus]
+    focus_idx = focus_idx[batch.final_score[0, focus_idx] > 0]
+    if len(focus_idx) < 2:
+        return []
+    belief = _softmax(batch.final_score[0, focus_idx], temperature)
+    posterior = _softmax(batch.final_score[1:, focus_idx], temperature)
+    gain_if_present = _entropy(belief) - _entropy(posterior)
+
+    if priors is None:
+        priors = finding_priors_uniform(rs.pattern_keys)
+    elif priors.pattern_keys != rs.pattern_keys:
+        raise ValueError("Bulgu olasılıkları farklı bir kural setine ait")
+    q = belief @ priors.likelihood[focus_idx][:, candidates]
+    gain = q * gain_if_present
+
+    values = _outcomes(batch)
+    best = np.argsort(-gain, kind="stable")[:top_k]
+    return [
+        FindingSuggestion(
+            finding_key=FINDING_KEYS[candidates[j]],
+            label=_FINDING_LABELS[FINDING_KEYS[candidates[j]]],
+            expected_gain=float(gain[j]),
+            probability_present=float(q[j]),
+            outcome=_outcome(batch, values, j + 1),
+        )
+        for j in best if gain[j] > 1e-9
+    ]
+
+
+def finding_priors_uniform(pattern_keys: Sequence[str]) -> FindingPriors:
+    """Arşiv yokken kullanılan bilgisiz olasılıklar (tüm bulgular 0.5)."""
+    marginal = np.full(len(FINDING_KEYS), 0.5)
+    return FindingPriors(
+        pattern_keys=tuple(pattern_keys),
+        likelihood=np.tile(marginal, (len(pattern_keys), 1)),
+        marginal=marginal,
+        n_cases=0,
+    )
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+Kompakt Session State Kodlaması
+
+Yüksek eşzamanlı oturum sayısında oturum başına bellek kullanımını
+azaltmak için:
+  - Bulgu seçimleri tamsayı bit maskesi olarak tutulur
+    (bit konumu = FINDING_KEYS / ILA_FINDING_KEYS sırası)
+  - DiagnosticResult ve ILAResult, struct ile paketlenmiş bayt
+    kayıtlarına dönüştürülür; zengin nesneler yalnızca ekrana
+    basılırken yeniden oluşturulur
+  - Rapor metni zlib ile sıkıştırılmış olarak saklanır
+
+Ayrıca vaka girdileri, paylaşılabilir kısa bir base64url belirtecine
+(URL'de ?case=...) kodlanabilir.
+"""
+
+import base64
+import struct
+import zlib
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from config.findings_taxonomy import FINDING_KEYS, ILA_FINDING_KEYS, SEVERITY_OPTIONS
+from config.pattern_definitions import PATTERN_CATEGORIES, RULESET_VERSION
+from config.turkish_templates import PATIENT_FORM
+from modules.decision_engine import (
+    DiagnosticResult,
+    ILDDecisionEngine,
+    MDD_REASON_CODES,
+    PatternResult,
+)
+from modules.ila_classifier import (
+    ILAClassifier,
+    ILAResult,
+    ILA_CATEGORY_LABELS,
+    ILA_RISK_LEVELS,
+    follow_up_text,
+)
+
+
+_FINDING_INDEX = {key: i for i, key in enumerate(FINDING_KEYS)}
+_ILA_FINDING_INDEX = {key: i for i, key in enumerate(ILA_FINDING_KEYS)}
+
+_PATTERN_KEYS = tuple(PATTERN_CATEGORIES)
+_PATTERN_INDEX = {key: i for i, key in enumerate(_PATTERN_KEYS)}
+_MDD_CODES = tuple(MDD_REASON_CODES)
+_MDD_CODE_INDEX = {code: i for i, code in enumerate(_MDD_CODES)}
+_ILA_CATEGORIES = tuple(ILA_CATEGORY_LABELS)
+_ILA_CATEGORY_INDEX = {key: i for i, key in enumerate(_ILA_CATEGORIES)}
+_ILA_RISK_INDEX = {level: i for i, level in enumerate(ILA_RISK_LEVELS)}
+
+# Kayıt düzenleri (little-endian, hizalamasız)
+#   Başlık: seçili bulgu maskesi, primer var mı, MDD, gerekçe kodu, patern sayısı
+#   Patern: indeks, 6 skor bileşeni, required/supportive/against maskeleri
+_RESULT_HEADER = struct.Struct("<Q?BBB")
+_PATTERN_RECORD = struct.Struct("<B6d3Q")
+#   ILA: var mı, kategori, risk, yaygınlık, fibrotik, subplevral, bulgu maskesi
+_ILA_RECORD = struct.Struct("<?BBd??Q")
+
+
+# =============================================
+# BULGU MASKELERİ
+# =============================================
+def _encode(keys: Iterable[str], index: dict) -> int:
+    mask = 0
+    for key in keys:
+        mask |= 1 << index[key]
+    return mask
+
+
+def _decode(mask: int, order: tuple) -> List[str]:
+    return [key for i, key in enumerate(order) if mask >> i & 1]
+
+
+def encode_findings(keys: Iterable[str]) -> int:
+    """BT bulgu anahtarlarını bit maskesine çevir."""
+    return _encode(keys, _FINDING_INDEX)
+
+
+def decode_findings(mask: int) -> List[str]:
+    """Bit maskesinden BT bulgu anahtarlarını (taksonomi sırasında) çıkar."""
+    return _decode(mask, FINDING_KEYS)
+
+
+def encode_ila_findings(keys: Iterable[str]) -> int:
+    """ILA bulgu anahtarlarını bit maskesine çevir."""
+    return _encode(keys, _ILA_FINDING_INDEX)
+
+
+def decode_ila_findings(mask: int) -> List[str]:
+    """Bit maskesinden ILA bulgu anahtarlarını çıkar."""
+    return _decode(mask, ILA_FINDING_KEYS)
+
+
+def finding_bit(key: str) -> int:
+    """Tek bir BT bulgusunun maske biti."""
+    return 1 << _FINDING_INDEX[key]
+
+
+def ila_finding_bit(key: str) -> int:
+    """Tek bir ILA bulgusunun maske biti."""
+    return 1 << _ILA_FINDING_INDEX[key]
+
+
+# =============================================
+# TANISAL SONUÇ KAYDI
+# =============================================
+def _decode_required(pattern_def: dict, mask: int) -> List[str]:
+    """
+    matched_required listesini orijinal sırasıyla geri kur.
+
+    Birincil required yolu eşleştiyse liste required sırasındadır;
+    aksi halde maske, tetikleyen alternatif setin tamamına eşittir.
+    """
+    required = [
+        f for f in pattern_def.get("required_findings", [])
+        if mask >> _FINDING_INDEX[f] & 1
+    ]
+    if required or not mask:
+        return required
+    for alt_set in pattern_def.get("alternative_required_sets", []):
+        if encode_findings(alt_set) == mask:
+            return list(alt_set)
+    return decode_findings(mask)
+
+
+def _ordered(keys: List[str], mask: int) -> List[str]:
+    return [f for f in keys if mask >> _FINDING_INDEX[f] & 1]
+
+
+def encode_diagnostic_result(result: Optional[DiagnosticResult]) -> Optional[bytes]:
+    """DiagnosticResult objesini kompakt bayt kaydına çevir."""
+    if result is None:
+        return None
+    parts = [
+        _RESULT_HEADER.pack(
+            encode_findings(result.selected_findings),
+            result.primary_pattern is not None,
+            result.mdd_recommended,
+            _MDD_CODE_INDEX[result.mdd_reason_code],
+            len(result.ranked_patterns),
+        )
+    ]
+    for p in result.ranked_patterns:
+        parts.append(
+            _PATTERN_RECORD.pack(
+                _PATTERN_INDEX[p.pattern_key],
+                p.base_score,
+                p.finding_score,
+                p.distribution_score,
+                p.clinical_modifier_score,
+                p.penalty_score,
+                p.final_score,
+                encode_findings(p.matched_required),
+                encode_findings(p.matched_supportive),
+                encode_findings(p.matched_against),
+            )
+        )
+    return b"".join(parts)
+
+
+def decode_diagnostic_result(record: Optional[bytes]) -> Optional[DiagnosticResult]:
+    """Bayt kaydından DiagnosticResult objesini yeniden oluştur."""
+    if record is None:
+        return None
+    selected_mask, has_primary, mdd, code_idx, count = _RESULT_HEADER.unpack_from(record)
+    ranked = []
+    offset = _RESULT_HEADER.size
+    for _ in range(count):
+        (idx, base, finding, dist, clinical, penalty, final,
+         req_mask, sup_mask, against_mask) = _PATTERN_RECORD.unpack_from(record, offset)
+        offset += _PATTERN_RECORD.size
+        key = _PATTERN_KEYS[idx]
+        pattern_def = PATTERN_CATEGORIES[key]
+        ranked.append(PatternResult(
+            pattern_key=key,
+            pattern_name=pattern_def["name"],
+            base_score=base,
+            finding_score=finding,
+            distribution_score=dist,
+            clinical_modifier_score=clinical,
+            penalty_score=penalty,
+            final_score=final,
+            matched_required=_decode_required(pattern_def, req_mask),
+            matched_supportive=_ordered(pattern_def.get("supportive_findings", []), sup_mask),
+            matched_against=_ordered(pattern_def.get("against_findings", []), against_mask),
+            associated_diagnoses=pattern_def.get("associated_diagnoses", []),
+        ))
+    primary = ranked[0] if has_primary and ranked else None
+    code = _MDD_CODES[code_idx]
+    return DiagnosticResult(
+        primary_pattern=primary,
+        ranked_patterns=ranked,
+        mdd_recommended=mdd,
+        mdd_reason=ILDDecisionEngine.format_mdd_reason(code, primary, ranked),
+        selected_findings=decode_findings(selected_mask),
+        mdd_reason_code=code,
+    )
+
+
+# =============================================
+# ILA SONUÇ KAYDI
+# =============================================
+def encode_ila_result(result: Optional[ILAResult]) -> Optional[bytes]:
+    """ILAResult objesini kompakt bayt kaydına çevir."""
+    if result is None:
+        return None
+    return _ILA_RECORD.pack(
+        result.ila_present,
+        _ILA_CATEGORY_INDEX[result.category],
+        _ILA_RISK_INDEX[result.risk_level],
+        result.extent_percent,
+        result.has_fibrotic_features,
+        result.is_subpleural,
+        encode_ila_findings(result.selected_findings),
+    )
+
+
+def decode_ila_result(record: Optional[bytes]) -> Optional[ILAResult]:
+    """Bayt kaydından ILAResult objesini yeniden oluştur."""
+    if record is None:
+        return None
+    (present, cat_idx, risk_idx, extent, fibrotic,
+     subpleural, findings_mask) = _ILA_RECORD.unpack(record)
+    if not present:
+        return ILAClassifier().classify(False, False, 0, [])
+    category = _ILA_CATEGORIES[cat_idx]
+    risk_level = ILA_RISK_LEVELS[risk_idx]
+    return ILAResult(
+        ila_present=True,
+        category=category,
+        category_label=ILA_CATEGORY_LABELS[category],
+        risk_level=risk_level,
+        extent_percent=extent,
+        has_fibrotic_features=fibrotic,
+        is_subpleural=subpleural,
+        follow_up=follow_up_text(category, risk_level, extent),
+        selected_findings=decode_ila_findings(findings_mask),
+    )
+
+
+# =============================================
+# RAPOR METNİ
+# =============================================
+def compress_text(text: str) -> bytes:
+    """Rapor metnini sıkıştır."""
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(blob: bytes) -> str:
+    """Sıkıştırılmış rapor metnini aç."""
+    return zlib.decompress(blob).decode("utf-8") if blob else ""
+
+
+# =============================================
+# PAYLAŞILABİLİR VAKA BELİRTECİ
+# =============================================
+# Hasta adı ve serbest metin alanları (kişisel veri) belirtece dahil edilmez.
+# Seçenek alanları, ilgili seçenek listesindeki indeksleriyle kodlanır.
+_TOKEN_FORMAT = 1
+_TOKEN_OPTION_FIELDS = (
+    ("patient_sex", PATIENT_FORM["sex_options"]),
+    ("smoking", PATIENT_FORM["smoking_options"]),
+    ("exposure", PATIENT_FORM["exposure_options"]),
+    ("ctd", PATIENT_FORM["ctd_options"]),
+    ("presentation", PATIENT_FORM["presentation_options"]),
+    ("indication", PATIENT_FORM["indication_options"]),
+    ("extent", SEVERITY_OPTIONS["extent"]["options"]),
+    ("progression", SEVERITY_OPTIONS["progression"]["options"]),
+)
+#   Biçim, kural seti, yaş, paket-yıl, 8 seçenek indeksi, bulgu maskesi,
+#   ILA var mı, ILA subplevral, ILA yaygınlık, ILA bulgu maskesi
+_CASE_TOKEN = struct.Struct("<BHBB8BQ??BB")
+
+
+def encode_case_token(state: Mapping) -> str:
+    """Vaka girdilerini kısa bir base64url belirtecine kodla."""
+    option_indices = [
+        options.index(state[name]) if state[name] in options else 0
+        for name, options in _TOKEN_OPTION_FIELDS
+    ]
+    payload = _CASE_TOKEN.pack(
+        _TOKEN_FORMAT,
+        RULESET_VERSION,
+        int(state["patient_age"]),
+        int(state["pack_years"]),
+        *option_indices,
+        state["finding_mask"],
+        bool(state["ila_present"]),
+        bool(state["ila_subpleural"]),
+        int(state["ila_extent"]),
+        state["ila_finding_mask"],
+    )
+    payload += bytes([zlib.crc32(payload) & 0xFF])
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_case_token(token: str) -> Dict:
+    """
+    Belirteci session state değerlerine çöz.
+
+    Returns:
+        Session state anahtar → değer dict'i; ayrıca belirtecin
+        oluşturulduğu kural seti sürümü "ruleset_version" altında döner.
+
+    Raises:
+        ValueError: Belirteç bozuk veya desteklenmeyen biçimde ise
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Geçersiz vaka belirteci.") from exc
+    if len(raw) != _CASE_TOKEN.size + 1 or zlib.crc32(raw[:-1]) & 0xFF != raw[-1]:
+        raise ValueError("Geçersiz vaka belirteci.")
+
+    values = _CASE_TOKEN.unpack(raw[:-1])
+    if values[0] != _TOKEN_FORMAT:
+        raise ValueError(f"Desteklenmeyen belirteç biçimi: {values[0]}")
+    n_options = len(_TOKEN_OPTION_FIELDS)
+    option_indices = values[4:4 + n_options]
+    finding_mask, ila_present, ila_subpleural, ila_extent, ila_mask = values[4 + n_options:]
+
+    if finding_mask >> len(FINDING_KEYS) or ila_mask >> len(ILA_FINDING_KEYS):
+        raise ValueError("Geçersiz vaka belirteci.")
+    state = {
+        "ruleset_version": values[1],
+        "patient_age": values[2],
+        "pack_years": values[3],
+        "finding_mask": finding_mask,
+        "ila_present": ila_present,
+        "ila_subpleural": ila_subpleural,
+        "ila_extent": ila_extent,
+        "ila_finding_mask": ila_mask,
+    }
+    for (name, options), idx in zip(_TOKEN_OPTION_FIELDS, option_indices):
+        if idx >= len(options):
+            raise ValueError("Geçersiz vaka belirteci.")
+        state[name] = options[idx]
+    return state
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Serbest Metin YÇBT Raporu Ayrıştırıcı
+
+Yapısal rapor aracından önceki anlatı raporlarını ILDDecisionEngine ile
+skorlayabilmek için rapor metnini findings_taxonomy bulgu anahtarlarına
+çevirir.
+
+  - Metin tek bir str.translate ile Türkçe katlanır (İ/I/ı → i, aksanlar
+    kaldırılır); karakter sayısı değişmez.
+  - Bulgu etiketleri, eş anlamlılar, İngilizce terimler ve olumsuzlama /
+    onaylama ipuçları tek bir sıkıştırılmış önek ağacına (trie) eklenir
+    ve tek bir düzenli ifadeye derlenir; metin C düzeyinde tek geçişte
+    taranır, her konumda en uzun ifade eşleşir.
+  - Olumsuzlama cümlecik (clause) kapsamındadır: Türkçe raporlarda
+    bulgudan sonraki ilk yüklem ipucu ("izlenmedi" / "izlendi"),
+    İngilizce raporlarda bulgudan önceki ipucu ("no ...") belirleyicidir.
+    Noktalama ve karşıtlık bağlaçları kapsamı keser.
+
+parse_stream çok sayıda raporu süreç havuzunda (multiprocessing)
+sırayı koruyarak ayrıştırır.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.findings_taxonomy import ALL_FINDING_GROUPS, FINDING_KEYS
+from config.finding_lexicon import (
+    AFFIRMATION_CUES,
+    CLAUSE_BREAKS,
+    FINDING_SYNONYMS,
+    LEXICON_VERSION,
+    POST_NEGATION_CUES,
+    PRE_NEGATION_CUES,
+)
+from modules.state_codec import encode_findings
+
+
+# Türkçe büyük/küçük harf + aksan katlaması (1 karakter → 1 karakter).
+# İ ve I önce çevrilir: str.lower("İ") iki karakter ("i̇") üretir.
+_FOLD_UPPER = str.maketrans({"İ": "i", "I": "i"})
+_FOLD_ACCENTS = str.maketrans("ıçğöşüâîû", "icgosuaiu")
+
+# Sözlük girdisi türleri
+_FINDING, _POST_NEG, _PRE_NEG, _AFFIRM, _BREAK = range(5)
+
+
+def fold_text(text: str) -> str:
+    """Türkçe katlama: 'İzlenmedİ, BAL PETEĞİ' → 'izlenmedi, bal petegi'."""
+    return text.translate(_FOLD_UPPER).lower().translate(_FOLD_ACCENTS)
+
+
+@dataclass
+class ParsedReport:
+    """Tek bir rapor metninin ayrıştırma sonucu."""
+    findings: List[str]          # olumlu bulgular (taksonomi sırasında)
+    negated: List[str]           # yalnızca olumsuz geçen bulgular
+    finding_mask: int            # findings bit maskesi (state_codec)
+
+
+# =============================================
+# SÖZLÜK DERLEME
+# =============================================
+def _label_terms() -> Dict[str, str]:
+    """Etiketlerin parantez dışı kısmı → bulgu anahtarı (çakışan etiketler hariç)."""
+    owners: Dict[str, set] = {}
+    for group in ALL_FINDING_GROUPS.values():
+        for key, info in group.items():
+            term = re.sub(r"\s*\([^)]*\)", "", info["label"]).strip()
+            owners.setdefault(fold_text(term), set()).add(key)
+    return {term: keys.pop() for term, keys in owners.items() if len(keys) == 1}
+
+
+def build_lexicon() -> Dict[str, Tuple[int, Optional[str]]]:
+    """Katlanmış ifade → (tür, bulgu anahtarı)."""
+    lexicon: Dict[str, Tuple[int, Optional[str]]] = {}
+    for term, key in _label_terms().items():
+        lexicon[term] = (_FINDING, key)
+    # Elle yazılmış eş anlamlılar otomatik etiketlerin önüne geçer
+    for key, synonyms in FINDING_SYNONYMS.items():
+        if key not in FINDING_KEYS:
+            raise ValueError(f"Sözlükte bilinmeyen bulgu anahtarı: {key}")
+        for term in synonyms:
+            lexicon[fold_text(term)] = (_FINDING, key)
+    for kind, cues in (
+        (_POST_NEG, POST_NEGATION_CUES),
+        (_PRE_NEG, PRE_NEGATION_CUES),
+        (_AFFIRM, AFFIRMATION_CUES),
+        (_BREAK, CLAUSE_BREAKS),
+    ):
+        for cue in cues:
+            lexicon[fold_text(cue)] = (kind, None)
+    return lexicon
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """
+    İfadelerden önek ağacı kurup tek bir düzenli ifadeye çevir.
+    Ortak önekler bir kez yazılır; isteğe bağlı devamlar açgözlüdür
+    (en uzun eşleşme önce denenir).
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return body + "?" if len(branches) == 1 and len(branches[0]) == 1 else f"(?:{body})?"
+        return body
+
+    return emit(trie)
+
+
+@lru_cache(maxsize=4)
+def _compile(lexicon_version: int = LEXICON_VERSION):
+    lexicon = build_lexicon()
+    # Noktalama kapsamı keser; ifadeler kelime başında eşleşir
+    pattern = re.compile(r"([.;!?\n])|(?<![a-z0-9])(" + _trie_pattern(lexicon) + ")")
+    return pattern, lexicon
+
+
+# =============================================
+# AYRIŞTIRICI
+# =============================================
+class ReportTextParser:
+    """Serbest metin YÇBT raporunu bulgu anahtarlarına çevirir."""
+
+    _FINDING_INDEX = {key: i for i, key in enumerate(FINDING_KEYS)}
+
+    def __init__(self):
+        self._pattern, self._lexicon = _compile()
+
+    def parse(self, text: str) -> ParsedReport:
+        positive, negative = self._scan(fold_text(text))
+        negated_only = negative - positive
+        findings = sorted(positive, key=self._FINDING_INDEX.__getitem__)
+        return ParsedReport(
+            findings=findings,
+            negated=sorted(negated_only, key=self._FINDING_INDEX.__getitem__),
+            finding_mask=encode_findings(findings),
+        )
+
+    def _scan(self, folded: str) -> Tuple[set, set]:
+        positive, negative = set(), set()
+        lexicon = self._lexicon
+        pending: List[str] = []      # yüklemi beklenen bulgular
+        pre_negated = False          # cümlecikte "no ..." görüldü
+
+        for punct, term in self._pattern.findall(folded):
+            if punct:
+                kind = _BREAK
+            else:
+                kind, key = lexicon[term]
+                if kind == _FINDING:
+                    pending.append(key)
+                    continue
+
+            if kind == _POST_NEG or (pre_negated and kind in (_BREAK, _AFFIRM)):
+                negative.update(pending)
+            else:
+                positive.update(pending)
+            pending.clear()
+            # Yeni "no" ipucu cümleciğin kalanını olumsuzlar; diğer ipuçları kapsamı kapatır
+            pre_negated = kind == _PRE_NEG
+
+        if pre_negated:
+            negative.update(pending)
+        else:
+            positive.update(pending)
+        return positive, negative
+
+    def parse_stream(
+        self,
+        texts: Iterable[str],
+        processes: Optional[int] = None,
+        chunksize: int = 256,
+    ) -> Iterator[ParsedReport]:
+        """
+        Rapor metinlerini süreç havuzunda ayrıştır (giriş sırası korunur).
+
+        Args:
+            texts: Rapor metni akışı (ör. dosya / veritabanı imleci)
+            processes: Süreç sayısı (varsayılan CPU sayısı); 1 = aynı süreçte
+            chunksize: Sürece tek seferde gönderilen rapor sayısı
+        """
+        if processes == 1:
+            yield from map(self.parse, texts)
+            return
+        with Pool(processes) as pool:
+            yield from pool.imap(_parse_in_worker, texts, chunksize=chunksize)
+
+
+@lru_cache(maxsize=1)
+def _worker_parser() -> ReportTextParser:
+    return ReportTextParser()
+
+
+def _parse_in_worker(text: str) -> ParsedReport:
+    return _worker_parser().parse(text)
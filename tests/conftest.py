@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""Ortak pytest ayarları: duvar saati ölçen testler yalnızca --perf ile çalışır."""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--perf", action="store_true", help="Hız (perf) testlerini de çalıştır")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: duvar saati ölçen hız testi (yalnızca --perf ile)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf"):
+        return
+    skip = pytest.mark.skip(reason="hız testi; çalıştırmak için --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
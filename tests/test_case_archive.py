@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Vaka arşivi: tetkik kayıtlarının sürümlü saklanması ve eski kayıtların göçü."""
+
+import sqlite3
+
+from modules import case_archive, state_codec
+from modules.case_archive import CaseArchive
+from modules.decision_engine import ILDDecisionEngine
+from modules.ila_classifier import ILAClassifier
+
+FINDINGS = ["honeycombing", "traction_bronchiectasis", "basal_predominant"]
+
+
+def _result():
+    return ILDDecisionEngine().analyze(FINDINGS, {"age": 60})
+
+
+def test_study_record_does_not_depend_on_code_order(tmp_path, monkeypatch):
+    archive = CaseArchive(str(tmp_path / "archive.sqlite3"))
+    result = _result()
+    ila = ILAClassifier().classify(True, True, 5, [])
+    archive.store_study("P1", "2024-01-01", state_codec.encode_findings(FINDINGS), result, ila)
+
+    # Patern / MDD kod sırası değişse de kayıt aynı sonuca çözülür
+    monkeypatch.setattr(state_codec, "_PATTERN_KEYS", state_codec._PATTERN_KEYS[::-1])
+    monkeypatch.setattr(state_codec, "_MDD_CODES", state_codec._MDD_CODES[::-1])
+    study = archive.prior_study("P1")
+    assert study.diagnostic_result == result
+    assert study.ila_result == ila
+    assert sorted(study.findings) == sorted(FINDINGS)
+
+
+def test_legacy_packed_records_are_migrated(tmp_path):
+    path = str(tmp_path / "legacy.sqlite3")
+    conn = sqlite3.connect(path)
+    for script in case_archive._MIGRATIONS[:3]:
+        conn.executescript(script)
+    result = _result()
+    conn.execute(
+        "INSERT INTO studies (patient_id, study_date, stored_at, finding_mask, ila_finding_mask, "
+        "primary_pattern, primary_score, diagnostic_record, ila_record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        ("P1", "2024-01-01", "2024-01-01T00:00:00", state_codec.encode_findings(FINDINGS), 0,
+         result.primary_pattern.pattern_key, result.primary_pattern.final_score,
+         state_codec.encode_diagnostic_result(result), None),
+    )
+    conn.execute("PRAGMA user_version = 3")
+    conn.commit()
+    conn.close()
+
+    study = CaseArchive(path).prior_study("P1")
+    assert study.diagnostic_result.ranked_patterns == result.ranked_patterns
+    assert study.finding_mask == state_codec.encode_findings(FINDINGS)
+    assert study.ila_result is None
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Benzer vaka indeksi: eşzamanlı yenileme ve tutarlı görünüm."""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from modules.case_index import CaseIndex, _build_lsh
+
+ROWS = pd.DataFrame({
+    "id": [1, 2, 3],
+    "finding_mask": [1, 3, 7],
+    "ctd": [None] * 3,
+    "exposure": [None] * 3,
+    "primary_pattern": ["uip", "nsip", "uip"],
+    "primary_score": [80.0, 70.0, 60.0],
+    "final_diagnosis": [None] * 3,
+})
+
+
+class _SlowArchive:
+    """Sorgusu yavaş arşiv: yenilemelerin üst üste binmesini zorlar."""
+
+    def index_rows(self, after_id=0):
+        time.sleep(0.05)
+        return ROWS[ROWS["id"] > after_id]
+
+
+def test_concurrent_refresh_adds_rows_once():
+    index = CaseIndex()
+    threads = [threading.Thread(target=index.refresh, args=(_SlowArchive(),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(index.ids) == [1, 2, 3]
+    assert len(index.masks) == len(index.final_diagnosis) == 3
+
+
+def test_add_frame_skips_known_ids_and_keeps_order():
+    index = CaseIndex()
+    assert index.add_frame(ROWS) == 3
+    assert index.add_frame(ROWS) == 0
+    assert index.add_frame(ROWS.assign(id=[5, 4, 4])) == 2
+    assert list(index.ids) == [1, 2, 3, 4, 5]
+
+    index.set_final_diagnosis(4, "IPF")
+    assert list(index.final_diagnosis) == [None, None, None, "IPF", None]
+    hits = {case.analysis_id: case.final_diagnosis for case in index.search(3, None, None, k=5)}
+    assert hits[4] == "IPF"
+
+
+def test_lsh_tables_are_extended_on_append():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    frame = ROWS.iloc[:0].reindex(range(n)).assign(
+        id=np.arange(1, n + 1),
+        finding_mask=rng.integers(0, 1 << 33, n) & rng.integers(0, 1 << 33, n),
+        primary_pattern="uip",
+        primary_score=50.0,
+    )
+    index = CaseIndex()
+    index.add_frame(frame.iloc[:1_500])
+    index.build_lsh()
+    index.add_frame(frame.iloc[1_500:])
+
+    extended = index._snapshot.lsh
+    rebuilt = _build_lsh(index.masks)
+    assert np.array_equal(extended.sorted_keys, rebuilt.sorted_keys)
+    assert np.array_equal(extended.order, rebuilt.order)
+    assert index.search(int(index.masks[-1]), k=1, mode="lsh")[0].analysis_id == n
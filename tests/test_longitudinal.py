@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""ILA progresyon analizi: hasta gruplama ve eksik hasta kimliği."""
+
+import pandas as pd
+import pytest
+
+from modules.longitudinal import ILAProgressionAnalyzer
+
+
+def _screening(patient_ids):
+    return pd.DataFrame({
+        "patient_id": patient_ids,
+        "study_date": ["2020-01-01", "2021-01-01", "2020-05-05", "2019-01-01", "2022-01-01"],
+        "ila_present": [True] * 5,
+        "ila_subpleural": [True, True, False, True, True],
+        "ila_extent": [3, 6, 2, 4, 8],
+        "ila_finding_mask": [0, 1, 0, 0, 3],
+    })
+
+
+@pytest.mark.parametrize("blank", [None, "", "  "])
+def test_blank_patient_id_is_rejected(blank):
+    with pytest.raises(ValueError, match="satır 3"):
+        ILAProgressionAnalyzer().analyze_frame(_screening(["A", "A", blank, "B", "B"]))
+
+
+def test_patients_are_grouped_once():
+    result = ILAProgressionAnalyzer().analyze_frame(_screening(["A", "A", "C", "B", "B"]))
+    assert result.patients.set_index("patient_id")["n_exams"].to_dict() == {"A": 2, "C": 1, "B": 2}
+    assert len(result.transitions) == 2
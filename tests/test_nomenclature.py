@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""2025 nomenklatur göçü: JSONL ve Parquet çıktıları aynı sonucu verir."""
+
+import json
+
+import pandas as pd
+import pytest
+
+from modules.nomenclature import migrate_result_archive
+
+RECORDS = [
+    {
+        "id": 1,
+        "primary_pattern": "dip",
+        "primary_name": "DIP",
+        "ranked_patterns": [
+            {"pattern_key": "dip", "pattern_name": "DIP", "score": 70.0},
+            {"pattern_key": "uip", "pattern_name": "UIP", "score": 40.0},
+        ],
+    },
+    {
+        "id": 2,
+        "primary_pattern": "uip",
+        "primary_name": "UIP",
+        "ranked_patterns": [
+            {"pattern_key": "uip", "pattern_name": "UIP", "score": 80.0},
+            {"pattern_key": "hp_fibrotic", "pattern_name": "Fibrotik HP", "score": 50.0},
+        ],
+    },
+    {
+        "id": 3,
+        "primary_pattern": "uip",
+        "primary_name": "UIP",
+        "ranked_patterns": [{"pattern_key": "uip", "pattern_name": "UIP", "score": 90.0}],
+    },
+]
+
+
+def _normalize(frame):
+    frame = frame.sort_values("id").reset_index(drop=True)
+    frame["ranked_patterns"] = frame["ranked_patterns"].map(lambda items: [dict(item) for item in items])
+    return frame.to_dict("records")
+
+
+def test_jsonl_and_parquet_migrations_agree(tmp_path):
+    pytest.importorskip("pyarrow")
+    jsonl = tmp_path / "results.jsonl"
+    jsonl.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in RECORDS), encoding="utf-8")
+    parquet = tmp_path / "results.parquet"
+    pd.DataFrame(RECORDS).to_parquet(parquet, index=False)
+
+    jsonl_summary = migrate_result_archive(str(jsonl), str(tmp_path / "out.jsonl"))
+    parquet_summary = migrate_result_archive(str(parquet), str(tmp_path / "out_parquet"))
+
+    assert jsonl_summary.changed_rows == parquet_summary.changed_rows == 2
+    migrated_jsonl = _normalize(pd.read_json(tmp_path / "out.jsonl", lines=True))
+    migrated_parquet = _normalize(pd.read_parquet(tmp_path / "out_parquet"))
+    assert migrated_parquet == migrated_jsonl
+    assert migrated_parquet[1]["ranked_patterns"][1] == {
+        "pattern_key": "bip_fibrotic",
+        "pattern_name": "Fibrotik BIP (Bronşiyolosentrik İnterstisyel Pnömoni)",
+        "score": 50.0,
+    }
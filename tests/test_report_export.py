@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""HL7 v2 dışa aktarımı: PID segmentinde hasta adı ve protokol numarası."""
+
+from datetime import datetime
+
+import pytest
+
+from modules.decision_engine import ILDDecisionEngine
+from modules.report_export import render_hl7
+from modules.report_model import build_report_model
+
+FINDINGS = ["honeycombing", "basal_predominant"]
+
+
+def _pid(name):
+    result = ILDDecisionEngine().analyze(FINDINGS, {"age": 60})
+    model = build_report_model(
+        {"name": name, "age": 60, "sex": "Kadın"},
+        {"indication": "ILD değerlendirme", "presentation": "Kronik (>3 ay)"},
+        FINDINGS, result, None, datetime(2026, 1, 2, 3, 4),
+    )
+    segment = next(s for s in render_hl7(model).split("\r") if s.startswith("PID|"))
+    return segment.split("|")
+
+
+@pytest.mark.parametrize("name, pid3, pid5", [
+    ("Ayşe Yılmaz", "", "Yılmaz^Ayşe"),
+    ("P-2024/0153", "P-2024/0153", "P-2024/0153"),
+    ("", "", ""),
+])
+def test_pid_carries_name_and_protocol_number(name, pid3, pid5):
+    fields = _pid(name)
+    assert fields[3] == pid3
+    assert fields[5] == pid5
+    assert fields[8] == "F"
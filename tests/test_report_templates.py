@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Kurum şablonlu rapor oluşturucu: bölüm önbelleği anahtarları ve toplu hız."""
+
+import itertools
+import shutil
+from datetime import datetime
+
+import pytest
+
+from modules.decision_engine import ILDDecisionEngine
+from modules.report_model import build_report_model
+from modules.report_templates import (
+    DEFAULT_TEMPLATE_DIR,
+    TemplateReportGenerator,
+    check_template_throughput,
+)
+
+REPORT_TIME = datetime(2026, 1, 2, 3, 4)
+FINDINGS = ["honeycombing", "traction_bronchiectasis", "basal_predominant", "ground_glass"]
+
+
+def _model(name, findings=FINDINGS, age=60):
+    result = ILDDecisionEngine().analyze(findings, {"age": age})
+    return build_report_model(
+        {"name": name, "age": age, "sex": "Erkek"},
+        {"indication": "ILD değerlendirme", "presentation": "Kronik (>3 ay)"},
+        findings, result, None, REPORT_TIME,
+    )
+
+
+@pytest.fixture
+def site_dir(tmp_path):
+    shutil.copy(f"{DEFAULT_TEMPLATE_DIR}/default.txt.j2", tmp_path / "default.txt.j2")
+    return tmp_path
+
+
+@pytest.mark.parametrize("site, files", [
+    ("include", {
+        "part.j2": "Hasta: {{ model.patient.name }}\n",
+        "include.txt.j2": '{% extends "default.txt.j2" %}\n'
+                          '{% block header %}{% include "part.j2" %}{% endblock %}\n',
+    }),
+    ("macro", {
+        "macros.j2": "{% macro patient_line() %}Hasta: {{ model.patient.name }}\n{% endmacro %}\n",
+        "macro.txt.j2": '{% extends "default.txt.j2" %}\n'
+                        '{% block header %}{% from "macros.j2" import patient_line with context %}'
+                        "{{ patient_line() }}{% endblock %}\n",
+    }),
+])
+def test_block_reading_model_through_other_template_is_not_cached_across_models(site_dir, site, files):
+    for name, source in files.items():
+        (site_dir / name).write_text(source, encoding="utf-8")
+    generator = TemplateReportGenerator(site, str(site_dir))
+
+    first = generator.render(_model("Ayşe Yılmaz"))
+    second = generator.render(_model(""))
+
+    assert "Hasta: Ayşe Yılmaz" in first
+    assert "Ayşe Yılmaz" not in second
+    assert "Hasta: \n" in second or second.startswith("Hasta: ")
+
+
+def test_default_template_matches_hand_coded_generator():
+    from modules.report_generator import ReportGenerator
+
+    reference = ReportGenerator(section_cache_size=0)
+    generator = TemplateReportGenerator()
+    for name in ("", "Ali"):
+        model = _model(name)
+        assert generator.render(model) == reference.render(model)
+
+
+@pytest.mark.perf
+def test_batch_throughput_relative_to_hand_coded_generator():
+    finding_sets = [
+        list(combo)
+        for size in (1, 2, 3)
+        for combo in itertools.combinations(FINDINGS + ["mosaic_attenuation", "consolidation"], size)
+    ]
+    models = [
+        _model(name, findings, age)
+        for name, findings, age in itertools.product(("", "Ali"), finding_sets, (45, 70))
+    ]
+    # Sürekli toplu işlemde (dolu bölüm önbelleği) referanstan en fazla %5 yavaş
+    assert check_template_throughput(TemplateReportGenerator(), models, min_ratio=0.95) >= 0.95